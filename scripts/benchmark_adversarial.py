@@ -0,0 +1,76 @@
+"""Worst-case matching time of the analyzers on adversarial inputs.
+
+Compares the previous backtracking regexes with the linear matchers in
+``src.analyzers.linear_patterns`` while doubling the input length. Linear
+growth shows up as a per-doubling ratio near 2; quadratic backtracking as a
+ratio near 4.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_adversarial.py``.
+"""
+
+from __future__ import annotations
+
+import gc
+import re
+import statistics
+import time
+from typing import Callable
+
+from src.analyzers.constraint_detector import ConstraintDetector
+from src.analyzers.structure_analyzer import StructureAnalyzer
+
+LEGACY_JSON = re.compile(r"json|\{\s*\".*\"\s*:\s*", re.IGNORECASE)
+LEGACY_TEMPLATE = re.compile(r"\{\{.*?\}\}|\[[A-Z_]+\]")
+SIZES = [1_000, 2_000, 4_000, 8_000, 16_000, 32_000]
+LEGACY_MAX_SIZE = 16_000
+
+ADVERSARIAL_INPUTS: dict[str, Callable[[int], str]] = {
+    "json_open_quotes": lambda n: '{"' * (n // 2),
+    "json_spaced_braces": lambda n: '{ "a" ' * (n // 6),
+    "template_open_braces": lambda n: "{{" * (n // 2),
+    "placeholder_runs": lambda n: ("[" + "A" * 30) * (n // 31),
+    "digit_runs": lambda n: ("1" * 50 + " ") * (n // 51),
+}
+
+
+def median_time_ms(func: Callable[[str], object], text: str, repeats: int = 7) -> float:
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func(text)
+            samples.append((time.perf_counter() - start) * 1000)
+    finally:
+        gc.enable()
+    return statistics.median(samples)
+
+
+def main() -> int:
+    constraint = ConstraintDetector()
+    structure = StructureAnalyzer()
+
+    def current(text: str) -> None:
+        constraint.analyze(text)
+        structure.analyze(text)
+
+    def legacy(text: str) -> None:
+        LEGACY_JSON.search(text)
+        LEGACY_TEMPLATE.search(text)
+
+    for name, build in ADVERSARIAL_INPUTS.items():
+        print(f"\n{name}")
+        print(f"{'chars':>8} {'legacy_ms':>10} {'linear_ms':>10} {'linear_ratio':>13}")
+        previous = None
+        for size in SIZES:
+            text = build(size)
+            legacy_ms = median_time_ms(legacy, text, repeats=1) if size <= LEGACY_MAX_SIZE else float("nan")
+            linear_ms = median_time_ms(current, text)
+            ratio = f"{linear_ms / previous:.2f}" if previous else "-"
+            print(f"{len(text):>8} {legacy_ms:>10.2f} {linear_ms:>10.3f} {ratio:>13}")
+            previous = linear_ms
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
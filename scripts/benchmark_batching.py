@@ -0,0 +1,87 @@
+"""Throughput of concurrent single analyses with and without micro-batching.
+
+Runs closed-loop clients, each sending the labeled outputs one at a time
+through ``ReverseEngineeringService.reverse`` in standard mode with the
+near-duplicate cache off, so every call is analyzed. As in production, the
+executor uses its thread pool and every call holds a fair-scheduler slot,
+built from the settings, with the clients spread over ``TENANTS`` tenants on
+the ``pro`` plan; the batcher is fitted to the slots as the API does. Each
+row reports calls per second, latency quantiles and, with batching, the
+batch-size and queue-wait histograms from ``MicroBatcher.stats()``. With one
+client batching should neither help nor hurt. As clients grow, batches grow
+up to the slot count and each executor hop is shared by more calls.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_batching.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from pathlib import Path
+
+from src.config import get_settings
+from src.models.schemas import AnalysisMode
+from src.services.analytics import TDigest
+from src.services.executor import AdaptiveExecutor
+from src.services.fair_scheduler import FairScheduler
+from src.services.reverse_engineering_service import ReverseEngineeringService
+
+DATASET = Path(__file__).resolve().parent / "data" / "labeled_outputs.jsonl"
+CLIENTS = [1, 8, 64, 256]
+CALLS_PER_CLIENT = 200
+TENANTS = 8
+
+
+async def run(texts: list[str], clients: int, batching: bool) -> dict[str, float]:
+    # No inline budget: every call pays the thread-pool hop that batching amortizes.
+    executor = AdaptiveExecutor(inline_budget_ms=0.0, thread_workers=4)
+    service = ReverseEngineeringService(near_duplicate_cache=None, executor=executor, micro_batching=batching)
+    settings = get_settings()
+    scheduler = FairScheduler(
+        concurrency=settings.fair_scheduler_concurrency,
+        plan_weights=settings.plan_weights,
+        plan_concurrency=settings.plan_concurrency,
+        tenant_plans={f"tenant-{number}": "pro" for number in range(TENANTS)},
+        quantum_chars=settings.fair_scheduler_quantum_chars,
+        max_queue_per_tenant=CALLS_PER_CLIENT * max(CLIENTS),
+    )
+    if service.batcher is not None:
+        service.batcher.limit_to(scheduler.concurrency)
+    latency_ms = TDigest()
+
+    async def client(offset: int) -> None:
+        tenant = f"tenant-{offset % TENANTS}"
+        for number in range(CALLS_PER_CLIENT):
+            text = texts[(offset + number) % len(texts)]
+            started = time.perf_counter()
+            await service.reverse(text, AnalysisMode.standard, slot=scheduler.slot(tenant, len(text)))
+            latency_ms.add((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(clients)))
+    elapsed = time.perf_counter() - started
+    executor.shutdown()
+    row = {
+        "calls_per_s": round(clients * CALLS_PER_CLIENT / elapsed),
+        "p50_ms": round(latency_ms.quantile(0.5), 2),
+        "p99_ms": round(latency_ms.quantile(0.99), 2),
+    }
+    if service.batcher is not None:
+        stats = service.batcher.stats()
+        for key in ("mean_batch_size", "batch_size_p99", "queue_wait_p50_ms", "queue_wait_p99_ms"):
+            row[key] = stats[key]
+    return row
+
+
+async def main() -> None:
+    texts = [json.loads(line)["output_text"] for line in DATASET.read_text(encoding="utf-8").splitlines() if line]
+    for clients in CLIENTS:
+        for batching in (False, True):
+            row = await run(texts, clients, batching)
+            print(json.dumps({"clients": clients, "batching": batching, **row}))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
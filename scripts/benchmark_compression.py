@@ -0,0 +1,99 @@
+"""CPU cost versus bytes on the wire for response and upload compression.
+
+Builds a ``/reverse/batch`` response and a jobs JSONL upload from the labeled
+dataset, then times every codec and level with the same streaming
+``Deflater`` and ``Inflater`` the middleware uses, under the inflated-size
+limits the server enforces. ``total_ms`` adds compression, transfer at each
+link speed and decompression, so the best row per link shows where CPU spent
+on compression pays for itself. On slow cross-region links the higher
+levels win; on fast links zstd-3, the default, costs least.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_compression.py``.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+
+from src.config import get_settings
+from src.models.schemas import AnalysisMode, BatchReverseResponse
+from src.services.executor import AdaptiveExecutor
+from src.services.reverse_engineering_service import ReverseEngineeringService
+from src.utils.compression import Deflater, Inflater, supported_encodings
+
+DATASET = Path(__file__).resolve().parent / "data" / "labeled_outputs.jsonl"
+CHUNK_BYTES = 64 * 1024
+REPEATS = 5
+LINKS_MBIT = [10, 100, 1000]
+LEVELS = {"gzip": [1, 6, 9], "zstd": [1, 3, 9, 19]}
+
+
+def payloads() -> dict[str, tuple[bytes, int]]:
+    """Return each payload with the inflated-size limit the server applies to it."""
+
+    settings = get_settings()
+    service = ReverseEngineeringService(near_duplicate_cache=None, executor=AdaptiveExecutor(thread_workers=0))
+    records = [json.loads(line) for line in DATASET.read_text(encoding="utf-8").splitlines() if line.strip()]
+    results = [service._analyze(record["output_text"], AnalysisMode.standard, None) for record in records]
+    upload = "".join(json.dumps({"output_text": record["output_text"]}) + "\n" for record in records)
+    return {
+        "batch_response": (
+            BatchReverseResponse(results=results).model_dump_json().encode(),
+            settings.max_request_bytes,
+        ),
+        "jobs_upload": (upload.encode() * 10, settings.jobs_max_upload_bytes),
+    }
+
+
+def fastest_ms(func, repeats: int = REPEATS) -> float:
+    fastest = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        fastest = min(fastest, time.perf_counter() - started)
+    return fastest * 1000
+
+
+def encode(data: bytes, encoding: str, level: int) -> bytes:
+    deflater = Deflater(encoding, gzip_level=level, zstd_level=level)
+    chunks = [deflater.compress(data[i : i + CHUNK_BYTES]) for i in range(0, len(data), CHUNK_BYTES)]
+    return b"".join(chunks) + deflater.finish()
+
+
+def decode(data: bytes, encoding: str, limit: int) -> bytes:
+    inflater = Inflater(encoding, limit)
+    return b"".join(inflater.feed(data[i : i + CHUNK_BYTES]) for i in range(0, len(data), CHUNK_BYTES))
+
+
+def transfer_ms(size: int, mbit: int) -> float:
+    return size * 8 / (mbit * 1000)
+
+
+def main() -> int:
+    header = f"{'codec':<8} {'ratio':>6} {'enc_MB/s':>9} {'dec_MB/s':>9}" + "".join(
+        f" {f'total_ms@{mbit}M':>14}" for mbit in LINKS_MBIT
+    )
+    for name, (data, limit) in payloads().items():
+        print(f"\n{name}: {len(data) / 1e6:.2f} MB")
+        print(header)
+        rows = [("identity", len(data), 0.0, 0.0)]
+        for encoding in supported_encodings():
+            for level in LEVELS[encoding]:
+                encoded = encode(data, encoding, level)
+                assert decode(encoded, encoding, limit) == data
+                encode_ms = fastest_ms(lambda: encode(data, encoding, level))
+                decode_ms = fastest_ms(lambda: decode(encoded, encoding, limit))
+                rows.append((f"{encoding}-{level}", len(encoded), encode_ms, decode_ms))
+        for codec, size, encode_ms, decode_ms in rows:
+            speeds = [len(data) / 1000 / ms if ms else float("inf") for ms in (encode_ms, decode_ms)]
+            totals = "".join(
+                f" {encode_ms + transfer_ms(size, mbit) + decode_ms:>14.1f}" for mbit in LINKS_MBIT
+            )
+            print(f"{codec:<8} {len(data) / size:>6.1f} {speeds[0]:>9.0f} {speeds[1]:>9.0f}{totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,91 @@
+"""Goodput under overload with and without admission control.
+
+Simulates a backend whose per-request latency grows once more than
+``CAPACITY`` requests run at the same time, then offers it a multiple of its
+capacity. Goodput counts requests that finish within ``SLO_MS``; shed
+requests count as fast failures, not goodput.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_overload.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+from src.services.admission import AdmissionController, Overloaded
+
+CAPACITY = 8
+SERVICE_MS = 20.0
+SLO_MS = 500.0
+DURATION_S = 3.0
+OFFERED_MULTIPLES = [0.5, 1.0, 2.0, 4.0]
+
+
+class SaturatingBackend:
+    def __init__(self) -> None:
+        self.in_flight = 0
+
+    async def handle(self) -> None:
+        self.in_flight += 1
+        try:
+            slowdown = max(1.0, self.in_flight / CAPACITY)
+            await asyncio.sleep(SERVICE_MS / 1000 * slowdown)
+        finally:
+            self.in_flight -= 1
+
+
+async def run(offered_multiple: float, controller: AdmissionController | None) -> dict[str, float]:
+    backend = SaturatingBackend()
+    rate = offered_multiple * CAPACITY / (SERVICE_MS / 1000)
+    good = shed = late = 0
+
+    async def one() -> None:
+        nonlocal good, shed, late
+        started = time.perf_counter()
+        try:
+            if controller is None:
+                await backend.handle()
+            else:
+                async with controller.admit():
+                    await backend.handle()
+        except Overloaded:
+            shed += 1
+            return
+        if (time.perf_counter() - started) * 1000 <= SLO_MS:
+            good += 1
+        else:
+            late += 1
+
+    tasks = []
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < DURATION_S:
+        due = int((time.perf_counter() - started) * rate)
+        for _ in range(due - sent):
+            tasks.append(asyncio.create_task(one()))
+        sent = max(sent, due)
+        await asyncio.sleep(0.001)
+    await asyncio.gather(*tasks)
+    return {"goodput_rps": good / DURATION_S, "late": late, "shed": shed}
+
+
+async def main() -> int:
+    capacity_rps = CAPACITY / (SERVICE_MS / 1000)
+    print(f"capacity ~{capacity_rps:.0f} rps, SLO {SLO_MS:.0f} ms")
+    print(f"{'offered':>8} {'mode':>10} {'goodput_rps':>12} {'late':>6} {'shed':>6}")
+    for multiple in OFFERED_MULTIPLES:
+        for name, controller in (
+            ("none", None),
+            ("admission", AdmissionController(initial_limit=CAPACITY, target_delay_ms=20, max_wait_ms=SLO_MS / 2)),
+        ):
+            result = await run(multiple, controller)
+            print(
+                f"{multiple:>7.1f}x {name:>10} {result['goodput_rps']:>12.1f} "
+                f"{result['late']:>6} {result['shed']:>6}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
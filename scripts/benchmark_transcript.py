@@ -0,0 +1,73 @@
+"""Cost of one ``/reverse/transcript`` call against one ``/reverse`` call per turn.
+
+Builds transcripts of alternating user and assistant turns from the labeled
+outputs and sends them through the app in process, over httpx's ASGI
+transport: once as a single transcript, and once split client-side into a
+``/reverse`` call per assistant turn, as clients do today. Each row reports
+milliseconds per transcript for both, and the cost of one standard-mode
+``_analyze`` over the concatenated transcript as the single-scan floor.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_transcript.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+
+from src.app import app
+from src.models.schemas import AnalysisMode
+from src.server import api
+
+DATASET = Path(__file__).resolve().parent / "data" / "labeled_outputs.jsonl"
+TURNS = [10, 50, 200]
+REPEATS = 20
+
+
+async def main() -> None:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    texts = [json.loads(line)["output_text"] for line in DATASET.read_text(encoding="utf-8").splitlines() if line]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        for count in TURNS:
+            turns = [
+                {"role": "user" if number % 2 else "assistant", "content": f"{texts[number % len(texts)]} #{number}"}
+                for number in range(count)
+            ]
+            assistant = [turn["content"] for turn in turns if turn["role"] == "assistant"]
+            body = {"turns": turns, "include_trace": False}
+
+            started = time.perf_counter()
+            for _ in range(REPEATS):
+                (await client.post("/reverse/transcript", json=body)).raise_for_status()
+            transcript_ms = (time.perf_counter() - started) * 1000 / REPEATS
+
+            started = time.perf_counter()
+            for repeat in range(REPEATS):
+                for content in assistant:
+                    # A fresh text per repeat, so the result store cannot answer instead of the pipeline.
+                    request = {"output_text": f"{content} r{repeat}", "include_trace": False}
+                    (await client.post("/reverse", json=request)).raise_for_status()
+            split_ms = (time.perf_counter() - started) * 1000 / REPEATS
+
+            joined = "\n\n".join(turn["content"] for turn in turns)
+            started = time.perf_counter()
+            for _ in range(REPEATS):
+                api.service._analyze(joined, AnalysisMode.standard, None, False)
+            scan_ms = (time.perf_counter() - started) * 1000 / REPEATS
+
+            row = {
+                "turns": count,
+                "transcript_ms": round(transcript_ms, 2),
+                "split_reverse_ms": round(split_ms, 2),
+                "single_scan_ms": round(scan_ms, 2),
+            }
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""Per-request overhead of ``POST /reverse`` against pipelined ``/ws/reverse``.
+
+Starts the app under uvicorn on a free local port and sends the same small
+outputs in fast mode, so transport cost dominates the analysis. HTTP runs
+over one keep-alive connection, first sequentially and then with
+``WINDOW`` requests in flight on a connection pool. The WebSocket client
+keeps ``WINDOW`` tagged frames outstanding on a single connection. Each
+row reports calls per second and the wall time per call minus the
+in-process cost of ``ReverseEngineeringService.reverse`` for the same
+texts, which is what the transport and framing add.
+
+Run from the repository root: ``PYTHONPATH=. python scripts/benchmark_websocket.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+from src.models.schemas import AnalysisMode
+from src.services.reverse_engineering_service import ReverseEngineeringService
+
+CALLS = 2000
+WINDOW = 32
+TEXTS = [
+    f"Request {number}: you are a helpful assistant. Return three bullet points in JSON with a short summary."
+    for number in range(64)
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def in_process_ms() -> float:
+    service = ReverseEngineeringService(near_duplicate_cache=None)
+    started = time.perf_counter()
+    for number in range(CALLS):
+        await service.reverse(TEXTS[number % len(TEXTS)], AnalysisMode.fast)
+    return (time.perf_counter() - started) * 1000 / CALLS
+
+
+def _body(number: int) -> dict[str, object]:
+    return {"output_text": TEXTS[number % len(TEXTS)], "mode": "fast", "include_trace": False}
+
+
+async def http_sequential(base: str) -> float:
+    async with httpx.AsyncClient(base_url=base) as client:
+        started = time.perf_counter()
+        for number in range(CALLS):
+            (await client.post("/reverse", json=_body(number))).raise_for_status()
+        return time.perf_counter() - started
+
+
+async def http_concurrent(base: str) -> float:
+    limits = httpx.Limits(max_connections=WINDOW, max_keepalive_connections=WINDOW)
+    async with httpx.AsyncClient(base_url=base, limits=limits) as client:
+        pending = iter(range(CALLS))
+
+        async def worker() -> None:
+            for number in pending:
+                (await client.post("/reverse", json=_body(number))).raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(WINDOW)))
+        return time.perf_counter() - started
+
+
+async def websocket_pipelined(url: str) -> float:
+    async with connect(url, max_size=None) as socket_:
+        window = asyncio.Semaphore(WINDOW)
+
+        async def send() -> None:
+            for number in range(CALLS):
+                await window.acquire()
+                await socket_.send(json.dumps({"id": number, **_body(number)}))
+
+        sender = asyncio.create_task(send())
+        started = time.perf_counter()
+        for _ in range(CALLS):
+            reply = json.loads(await socket_.recv())
+            if "result" not in reply:
+                raise RuntimeError(reply)
+            window.release()
+        elapsed = time.perf_counter() - started
+        await sender
+        return elapsed
+
+
+async def wait_until_up(base: str) -> None:
+    async with httpx.AsyncClient(base_url=base) as client:
+        for _ in range(100):
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def main() -> None:
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.app:app", "--port", str(port), "--log-level", "warning"]
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        await wait_until_up(base)
+        analysis_ms = await in_process_ms()
+        print(json.dumps({"transport": "in_process", "ms_per_call": round(analysis_ms, 4)}))
+        runs = [
+            ("http_sequential", http_sequential(base)),
+            ("http_concurrent", http_concurrent(base)),
+            ("websocket_pipelined", websocket_pipelined(f"ws://127.0.0.1:{port}/ws/reverse")),
+        ]
+        for name, run in runs:
+            elapsed = await run
+            per_call_ms = elapsed * 1000 / CALLS
+            row = {
+                "transport": name,
+                "calls_per_s": round(CALLS / elapsed),
+                "ms_per_call": round(per_call_ms, 4),
+                "overhead_ms": round(per_call_ms - analysis_ms, 4),
+            }
+            print(json.dumps(row))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
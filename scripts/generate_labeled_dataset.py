@@ -0,0 +1,99 @@
+"""Generate a labeled dataset for ``scripts/evaluate.py``.
+
+Each output is composed from a style frame, a task body and zero or more
+constraint fragments, so the gold labels are known by construction. Some
+fragments are paraphrases the heuristics are not tuned for, which keeps
+precision and recall meaningful.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+
+OUTPUT_PATH = Path(__file__).resolve().parent / "data" / "labeled_outputs.jsonl"
+ROWS = 400
+
+TASKS = {
+    "code": [
+        "def slugify(title):\n    return title.lower().replace(' ', '-')",
+        "```python\nclass Cache:\n    pass\n```",
+        "const total = items.reduce((sum, item) => sum + item.price, 0);",
+    ],
+    "essay": [
+        "Introduction: cities shape how we live. The body covers transit and housing. Conclusion: plan for people.",
+        "This paragraph states the thesis that remote work changes cities, and the next paragraph tests it.",
+        "Remote work reshaped downtowns; the evidence from three decades of commuting data tells a mixed story.",
+    ],
+    "explanation": [
+        "Let me explain how DNS resolves a name into an address.",
+        "Here is an overview of how vaccines train the immune system.",
+        "Photosynthesis turns light, water and carbon dioxide into sugar and oxygen.",
+    ],
+    "reasoning": [
+        "The train leaves at noon because the schedule shifted, therefore we arrive by three.",
+        "Since both shelves hold ten books, the total must be twenty.",
+        "Because the sum is even and one term is odd, the other term is odd as well.",
+    ],
+    "general": [
+        "Thanks for reaching out, the meeting is moved to Thursday afternoon.",
+        "Here are some ideas for a rainy weekend with kids at home.",
+        "Your package was delivered to the front desk this morning.",
+    ],
+}
+
+STYLES = {
+    "role-based": [
+        "You are a seasoned mentor. {body}",
+        "As an experienced consultant, {body}",
+        "Acting as your advisor: {body}",
+    ],
+    "template": ["[ROLE] [TASK] {body}", "{{{{audience}}}} {body}", "<<persona>> {body}"],
+    "chain-of-thought": [
+        "First, restate the problem.\nSecond, list what we know.\nThird, work it out.\nFinally:\n{body}",
+        "Step 1 gather facts\nStep 2 compare them\nStep 3 decide\nStep 4 answer\n{body}",
+        "Let's think it through.\nWe start from the facts.\nThen weigh them.\nThen answer.\n{body}",
+    ],
+    "instruction": ["{body}", "Answer: {body}", "Response: {body}"],
+}
+
+CONSTRAINTS = {
+    "json_format": ['{"answer": "see above", "confidence": 0.8}', "Output rendered as JSON.", '{ "status" : "ok" }'],
+    "bullet_points": ["- one point\n- another point", "* first idea\n* second idea", "• a point\n• another point"],
+    "length_limit": ["Kept to 50 words.", "Summary in 3 sentences.", "Limited to a few lines."],
+    "stepwise": ["Step 2 covers the rest.", "first, check; second, verify.", "Phase one then phase two."],
+    "no_fluff": ["Kept concise.", "Only the essentials.", "No padding."],
+}
+
+
+def build_row(rng: random.Random, row_id: int) -> dict[str, object]:
+    style = rng.choice(list(STYLES))
+    task_type = rng.choice(list(TASKS))
+    constraints = sorted(rng.sample(list(CONSTRAINTS), k=rng.choice([0, 0, 1, 1, 2])))
+    body = rng.choice(TASKS[task_type])
+    parts = [rng.choice(STYLES[style]).format(body=body)]
+    parts.extend(rng.choice(CONSTRAINTS[name]) for name in constraints)
+    return {
+        "id": row_id,
+        "output_text": "\n".join(parts),
+        "prompt_style": style,
+        "task_type": task_type,
+        "constraints": constraints,
+    }
+
+
+def main() -> int:
+    """Write deterministic labeled JSONL rows."""
+
+    rng = random.Random(1337)
+    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    with OUTPUT_PATH.open("w", encoding="utf-8") as file:
+        for row_id in range(ROWS):
+            file.write(json.dumps(build_row(rng, row_id)) + "\n")
+    print(f"wrote {ROWS} rows to {OUTPUT_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
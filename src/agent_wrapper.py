@@ -8,6 +8,7 @@ from dataclasses import dataclass
 from typing import Any
 
 from src.config import get_settings
+from src.models.schemas import AnalysisMode
 from src.services.reverse_engineering_service import ReverseEngineeringService
 
 
@@ -45,19 +46,25 @@ class PromptReverseEngineerAgent:
             if not output_text:
                 return {"ok": False, "error": {"code": "validation_error", "message": "output_text is required"}}
 
-            deterministic = bool(payload.get("deterministic", self.settings.deterministic_default))
-            seed = payload.get("seed")
+            try:
+                mode = AnalysisMode(payload.get("mode", AnalysisMode.standard.value))
+            except ValueError:
+                message = "mode must be one of fast, standard, deep"
+                return {"ok": False, "error": {"code": "validation_error", "message": message}}
+            deadline_ms = payload.get("deadline_ms")
+            if deadline_ms is not None and (not isinstance(deadline_ms, int) or deadline_ms <= 0):
+                return {"ok": False, "error": {"code": "validation_error", "message": "deadline_ms must be positive"}}
             request_id = str(payload.get("request_id", uuid.uuid4()))
 
             result = await self.service.reverse(
                 output_text=output_text,
-                request_id=request_id,
-                deterministic=deterministic,
-                seed=seed if isinstance(seed, int) else None,
+                mode=mode,
+                deadline_ms=deadline_ms,
+                include_trace=bool(payload.get("include_trace", True)),
             )
 
             usage = self.usage_meter.record(output_text)
-            return {"ok": True, "data": result.model_dump(), "usage": usage}
+            return {"ok": True, "request_id": request_id, "data": result.model_dump(), "usage": usage}
         except Exception as exc:  # defensive wrapper boundary
             return {
                 "ok": False,
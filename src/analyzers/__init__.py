@@ -1 +1,4 @@
 """Package."""
+
+# Bump whenever an analyzer change can alter results; it is part of every result ETag.
+ANALYZER_VERSION = "4"
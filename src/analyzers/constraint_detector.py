@@ -2,35 +2,40 @@
 
 from __future__ import annotations
 
-import re
 from dataclasses import dataclass
 
+from src.analyzers import linear_patterns
 
-@dataclass
+
+@dataclass(slots=True)
 class ConstraintSignal:
     """Signal emitted by constraint detector."""
 
-    constraints: list[str]
-    trace: str
+    constraints: tuple[str, ...]
+    skipped: bool = False
+
+    @property
+    def trace(self) -> str:
+        return "constraint_hits=skipped" if self.skipped else f"constraint_hits={','.join(self.constraints)}"
+
+
+NONE_EXPLICIT = ("none-explicit",)
 
 
 class ConstraintDetector:
     """Detect constraints such as formatting, length, and style requirements."""
 
-    PATTERNS = {
-        "json_format": re.compile(r"json|\{\s*\".*\"\s*:\s*", re.IGNORECASE),
-        "bullet_points": re.compile(r"^-\s|^\*\s", re.MULTILINE),
-        "length_limit": re.compile(r"\b\d+\s*(words|sentences|characters)\b", re.IGNORECASE),
-        "stepwise": re.compile(r"step\s*\d+|first[,\s]|second[,\s]", re.IGNORECASE),
-        "no_fluff": re.compile(r"concise|brief|without fluff|only", re.IGNORECASE),
+    MATCHERS = {
+        "json_format": linear_patterns.json_format,
+        "bullet_points": linear_patterns.bullet_points,
+        "length_limit": linear_patterns.length_limit,
+        "stepwise": linear_patterns.stepwise,
+        "no_fluff": linear_patterns.no_fluff,
     }
 
     def analyze(self, text: str) -> ConstraintSignal:
         """Analyze text and return detected constraints."""
 
-        hits = [name for name, pattern in self.PATTERNS.items() if pattern.search(text)]
-        constraints = hits or ["none-explicit"]
-        return ConstraintSignal(
-            constraints=constraints,
-            trace=f"constraint_hits={','.join(constraints)}",
-        )
+        lower = text.lower()
+        hits = tuple(name for name, matcher in self.MATCHERS.items() if matcher(text, lower))
+        return ConstraintSignal(hits or NONE_EXPLICIT)
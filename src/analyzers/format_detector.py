@@ -5,12 +5,19 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class FormatSignal:
     """Signal emitted by format detector."""
 
-    format_markers: list[str]
-    trace: str
+    format_markers: tuple[str, ...]
+    skipped: bool = False
+
+    @property
+    def trace(self) -> str:
+        return "format_markers=skipped" if self.skipped else f"format_markers={','.join(self.format_markers)}"
+
+
+PLAIN_TEXT = ("plain_text",)
 
 
 class FormatDetector:
@@ -30,7 +37,4 @@ class FormatDetector:
             markers.append("numbered_steps")
         if "{" in text and "}" in text and '"' in text:
             markers.append("json_like")
-        if not markers:
-            markers.append("plain_text")
-
-        return FormatSignal(markers, trace=f"format_markers={','.join(markers)}")
+        return FormatSignal(tuple(markers) if markers else PLAIN_TEXT)
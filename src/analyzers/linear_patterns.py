@@ -0,0 +1,97 @@
+"""Backtracking-free matchers shared by the analyzers.
+
+Every matcher runs in time linear in the input length. Patterns that stay
+regular expressions are either fixed-width or use possessive quantifiers over
+disjoint character runs, so each start position consumes at most one run and
+never re-enters it. Patterns whose regex form needs a greedy ``.*`` across a
+line are replaced by line scanners built on ``str.find``.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_right
+
+_LINE_BULLET = re.compile(r"^[-*]\s", re.MULTILINE)
+_LENGTH_LIMIT = re.compile(r"\b\d++\s*+(?:words|sentences|characters)\b")
+_STEPWISE = re.compile(r"step\s*+\d|first[,\s]|second[,\s]")
+_NO_FLUFF = ("concise", "brief", "without fluff", "only")
+_JSON_OPEN = re.compile(r"\{\s*+\"")
+_JSON_KEY_CLOSE = re.compile(r"\"\s*+:")
+_UPPER_PLACEHOLDER = re.compile(r"\[[A-Z_]++\]")
+
+
+def json_format(text: str, lower: str) -> bool:
+    """Equivalent of ``json|\\{\\s*".*"\\s*:\\s*`` (case-insensitive)."""
+
+    return "json" in lower or _json_key_on_line(text)
+
+
+def bullet_points(text: str, lower: str) -> bool:
+    """Equivalent of ``^-\\s|^\\*\\s`` in multiline mode."""
+
+    return _LINE_BULLET.search(text) is not None
+
+
+def length_limit(text: str, lower: str) -> bool:
+    """Equivalent of ``\\b\\d+\\s*(words|sentences|characters)\\b`` (case-insensitive)."""
+
+    return _LENGTH_LIMIT.search(lower) is not None
+
+
+def stepwise(text: str, lower: str) -> bool:
+    """Equivalent of ``step\\s*\\d+|first[,\\s]|second[,\\s]`` (case-insensitive)."""
+
+    return _STEPWISE.search(lower) is not None
+
+
+def no_fluff(text: str, lower: str) -> bool:
+    """Equivalent of ``concise|brief|without fluff|only`` (case-insensitive)."""
+
+    return any(phrase in lower for phrase in _NO_FLUFF)
+
+
+def template_marker(text: str) -> bool:
+    """Equivalent of ``\\{\\{.*?\\}\\}|\\[[A-Z_]+\\]``."""
+
+    return _double_brace_on_line(text) or _UPPER_PLACEHOLDER.search(text) is not None
+
+
+def _json_key_on_line(text: str) -> bool:
+    """Find ``{`` + whitespace + ``"`` followed on the same line by ``"`` + whitespace + ``:``.
+
+    The regex form retries its greedy ``.*`` from every opening brace, which is
+    quadratic on long lines full of quotes and braces. Here each line's first
+    opening quote is paired with the first key-closing quote after it.
+    """
+
+    closings = [match.start() for match in _JSON_KEY_CLOSE.finditer(text)]
+    if not closings:
+        return False
+
+    line_end = -1
+    for match in _JSON_OPEN.finditer(text):
+        quote = match.end() - 1
+        if quote < line_end:
+            continue
+        line_end = text.find("\n", quote)
+        if line_end == -1:
+            line_end = len(text)
+        index = bisect_right(closings, quote)
+        if index < len(closings) and closings[index] < line_end:
+            return True
+    return False
+
+
+def _double_brace_on_line(text: str) -> bool:
+    """Find ``{{`` followed by ``}}`` on the same line, scanning each line at most once."""
+
+    start = text.find("{{")
+    while start != -1:
+        line_end = text.find("\n", start)
+        if line_end == -1:
+            line_end = len(text)
+        if text.find("}}", start + 2, line_end) != -1:
+            return True
+        start = text.find("{{", line_end)
+    return False
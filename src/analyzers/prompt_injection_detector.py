@@ -2,42 +2,106 @@
 
 from __future__ import annotations
 
+import logging
+import threading
+import time
 from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
 
+from src.analyzers.signatures import DEFAULT_PACK, SignatureSet
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
 class InjectionSignal:
     """Signal emitted by prompt injection detector."""
 
     suspected_injection: bool
-    matched_patterns: list[str]
-    trace: str
+    matched_patterns: tuple[str, ...]
+    score: float = 0.0
+
+    @property
+    def trace(self) -> str:
+        return f"injection_matches={','.join(self.matched_patterns) or 'none'}"
 
 
 class PromptInjectionDetector:
-    """Heuristic detector for common jailbreak/prompt-leak signatures."""
+    """Signature-pack detector for common jailbreak/prompt-leak artifacts.
+
+    Rules come from a JSON pack (format in ``src.analyzers.signatures``),
+    the bundled one unless ``signatures_path`` is given. Text is suspected
+    when the weights of its matched categories reach the pack's threshold.
+    The file's modification time is checked at most every
+    ``reload_interval_seconds`` (0 disables polling) and a changed pack is
+    compiled and swapped in; a pack that fails to compile is logged and the
+    current rules stay in use.
+    """
+
+    def __init__(self, signatures_path: Path | str | None = None, reload_interval_seconds: float = 5.0) -> None:
+        self.path = Path(signatures_path) if signatures_path else DEFAULT_PACK
+        self.reload_interval_seconds = reload_interval_seconds
+        self.reloads = 0
+        self.reload_errors = 0
+        self._lock = threading.Lock()
+        self._mtime_ns = self.path.stat().st_mtime_ns
+        self.signatures = SignatureSet.from_file(self.path)
+        self._next_check = time.monotonic() + reload_interval_seconds
 
-    PATTERNS: dict[str, tuple[str, ...]] = {
-        "instruction_override": ("ignore previous", "disregard all prior", "new instructions"),
-        "policy_exfiltration": ("system prompt", "hidden prompt", "reveal instructions"),
-        "role_hijack": ("you are now", "act as", "developer mode"),
-        "secrets_access": ("api key", "token", "password", "credentials"),
-    }
+    def reload(self) -> SignatureSet:
+        """Compile the pack file and swap it in; raises ``OSError`` or ``ValueError`` and keeps the old rules."""
 
-    def __init__(self, threshold: int = 2) -> None:
-        self.threshold = threshold
+        with self._lock:
+            mtime_ns = self.path.stat().st_mtime_ns
+            try:
+                signatures = SignatureSet.from_file(self.path)
+            except (OSError, ValueError):
+                self._mtime_ns = mtime_ns  # do not retry this version on every poll
+                self.reload_errors += 1
+                raise
+            self.signatures = signatures
+            self._mtime_ns = mtime_ns
+            self.reloads += 1
+        logger.info("Loaded %d injection signatures from %s", len(signatures), self.path)
+        return signatures
+
+    def maybe_reload(self) -> None:
+        """Reload when the pack file changed since it was last read."""
+
+        now = time.monotonic()
+        if not self.reload_interval_seconds or now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval_seconds
+        try:
+            if self.path.stat().st_mtime_ns != self._mtime_ns:
+                self.reload()
+        except (OSError, ValueError):
+            logger.exception("Keeping the current injection signatures; %s failed to load", self.path)
 
     def analyze(self, text: str) -> InjectionSignal:
         """Return whether text contains suspicious injection patterns."""
 
-        lower = text.lower()
-        matches: list[str] = []
-        for category, keys in self.PATTERNS.items():
-            if any(k in lower for k in keys):
-                matches.append(category)
-        suspected = len(matches) >= self.threshold
-        return InjectionSignal(
-            suspected_injection=suspected,
-            matched_patterns=matches,
-            trace=f"injection_matches={','.join(matches) if matches else 'none'}",
-        )
+        return self.analyze_many([text])[0]
+
+    def analyze_many(self, texts: list[str]) -> list[InjectionSignal]:
+        """Return one signal per text from a single scan shared by all of them."""
+
+        self.maybe_reload()
+        signatures = self.signatures
+        return [
+            InjectionSignal(
+                suspected_injection=match.score >= signatures.threshold,
+                matched_patterns=match.categories,
+                score=match.score,
+            )
+            for match in signatures.scan_many(texts)
+        ]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "source": str(self.path),
+            "signatures": float(len(self.signatures)),
+            "reloads": float(self.reloads),
+            "reload_errors": float(self.reload_errors),
+        }
@@ -5,12 +5,18 @@ from __future__ import annotations
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(slots=True)
 class ReasoningSignal:
     """Signal emitted by reasoning depth estimator."""
 
     depth_score: float
-    trace: str
+    connectors: int = 0
+    steps: int = 0
+    skipped: bool = False
+
+    @property
+    def trace(self) -> str:
+        return "reasoning=skipped" if self.skipped else f"connectors={self.connectors}, steps={self.steps}"
 
 
 class ReasoningDepthEstimator:
@@ -26,4 +32,4 @@ class ReasoningDepthEstimator:
         multiline_steps = sum(1 for line in text.splitlines() if line.strip().startswith(tuple("123456789")))
         raw = connectors * 0.08 + multiline_steps * 0.1 + min(words / 1500, 0.25)
         depth = max(0.0, min(raw, 1.0))
-        return ReasoningSignal(depth_score=depth, trace=f"connectors={connectors}, steps={multiline_steps}")
+        return ReasoningSignal(depth, connectors, multiline_steps)
@@ -0,0 +1,296 @@
+"""Compiled multi-pattern signature sets for the prompt-injection detector.
+
+A signature pack is a JSON file::
+
+    {
+      "threshold": 2.0,
+      "max_gap": 4,
+      "signatures": [
+        {"id": "override-1", "pattern": "ignore previous", "category": "instruction_override"},
+        {"id": "exfil-2", "pattern": "reveal * instructions", "category": "policy_exfiltration", "weight": 1.5},
+        {"id": "secrets-3", "pattern": "passw*", "category": "secrets_access"}
+      ]
+    }
+
+Patterns are case-insensitive and match whole words, so ``act as`` does not
+fire inside "react as"; punctuation separates words and is otherwise
+ignored. A standalone ``*`` skips up to ``max_gap`` words (``reveal *
+instructions`` covers "reveal your hidden instructions"), and a word of at
+least three characters ending in ``*`` matches any word starting with it
+(``passw*`` covers "passwords"). Every rule's word sequences go into one
+Aho–Corasick automaton over word symbols, so a scan costs one split of the
+text plus one automaton step per word that occurs in some rule, however
+many signatures the pack holds.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import itertools
+import json
+import string
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+DEFAULT_PACK = Path(__file__).with_name("injection_signatures.json")
+MAX_EXPANSIONS = 256
+MIN_STEM_CHARS = 3
+STEM_CACHE_ENTRIES = 100_000
+
+# Mapping punctuation to spaces and splitting is several times faster than a word regex.
+_SEPARATORS = str.maketrans(dict.fromkeys(string.punctuation + "‘’“”«»–—…", " "))
+
+
+@dataclass(slots=True)
+class Signature:
+    id: str
+    category: str
+    weight: float
+    fragments: tuple[tuple[str, ...], ...]
+    max_gap: int
+
+
+@dataclass(slots=True)
+class SignatureMatch:
+    categories: tuple[str, ...]
+    signature_ids: tuple[str, ...]
+    score: float
+
+
+class SignatureSet:
+    """An immutable compiled pack; swap the whole object to change rules."""
+
+    def __init__(
+        self, signatures: list[Signature], threshold: float = 2.0, source: str = "", digest: str = ""
+    ) -> None:
+        self.signatures = signatures
+        self.threshold = threshold
+        self.source = source
+        # Identifies the rules in result versions, so results computed under another pack are not served.
+        self.digest = digest
+        self._words: dict[str, int] = {}
+        self._stems: dict[str, int] = {}
+        for signature in signatures:
+            for element in itertools.chain.from_iterable(signature.fragments):
+                table = self._stems if element.endswith("*") else self._words
+                table.setdefault(element.rstrip("*"), len(self._words) + len(self._stems))
+        self._stem_lengths = sorted({len(stem) for stem in self._stems}, reverse=True)
+        self._stem_heads = {stem[:MIN_STEM_CHARS] for stem in self._stems}
+        self._sorted_terms = sorted([*self._words.items(), *self._stems.items()])
+        # Words already resolved against the stems; text vocabularies repeat, so most scans only hit these.
+        self._stemmed: dict[str, int] = {}
+        self._unstemmed: set[str] = set()
+
+        self._goto: list[dict[int, int]] = [{}]
+        outputs: list[list[tuple[int, int, int]]] = [[]]
+        for number, signature in enumerate(signatures):
+            for index, fragment in enumerate(signature.fragments):
+                for symbols in self._expand(signature, fragment):
+                    state = 0
+                    for symbol in symbols:
+                        next_state = self._goto[state].get(symbol)
+                        if next_state is None:
+                            next_state = len(self._goto)
+                            self._goto[state][symbol] = next_state
+                            self._goto.append({})
+                            outputs.append([])
+                        state = next_state
+                    outputs[state].append((number, index, len(fragment)))
+
+        self._fail = [0] * len(self._goto)
+        self._out: list[tuple[tuple[int, int, int], ...]] = [tuple(dict.fromkeys(found)) for found in outputs]
+        queue = deque(self._goto[0].values())
+        while queue:  # breadth-first, so each failure target is complete before it is used
+            state = queue.popleft()
+            if self._out[self._fail[state]]:
+                self._out[state] += self._out[self._fail[state]]
+            for symbol, child in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and symbol not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(symbol, 0) if state else 0
+                queue.append(child)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _expand(self, signature: Signature, fragment: tuple[str, ...]) -> list[tuple[int, ...]]:
+        """Symbol sequences a fragment matches.
+
+        A text word gets a single symbol: its exact entry, else its longest
+        matching stem. A stem therefore also lists every word and longer stem
+        it is a prefix of.
+        """
+
+        choices = []
+        for element in fragment:
+            if not element.endswith("*"):
+                choices.append((self._words[element],))
+                continue
+            stem = element[:-1]
+            terms = self._sorted_terms
+            start = bisect.bisect_left(terms, (stem,))
+            end = start
+            while end < len(terms) and terms[end][0].startswith(stem):
+                end += 1
+            choices.append(tuple(symbol for _, symbol in terms[start:end]))
+        if any(len(options) > 1 for options in choices) and _product_size(choices) > MAX_EXPANSIONS:
+            raise ValueError(f"signature {signature.id}: stems expand to more than {MAX_EXPANSIONS} sequences")
+        return list(itertools.product(*choices))
+
+    def _stemmed_words(self, words: list[str]) -> set[str]:
+        """Return the words that only match a stem, resolving words not seen before."""
+
+        unknown = set(words).difference(self._words)
+        new = unknown.difference(self._stemmed, self._unstemmed)
+        if new:
+            if len(self._stemmed) + len(self._unstemmed) > STEM_CACHE_ENTRIES:
+                self._stemmed, self._unstemmed = {}, set()
+            for word in new:
+                if word[:MIN_STEM_CHARS] in self._stem_heads:
+                    for length in self._stem_lengths:
+                        symbol = self._stems.get(word[:length]) if length <= len(word) else None
+                        if symbol is not None:
+                            self._stemmed[word] = symbol
+                            break
+                if word not in self._stemmed:
+                    self._unstemmed.add(word)
+        # Probe the cache per word: set.intersection(dict) would walk the whole cache.
+        return {word for word in unknown if word in self._stemmed}
+
+    def scan(self, text: str) -> SignatureMatch:
+        """Match every signature against ``text`` in one pass."""
+
+        return self.scan_many([text])[0]
+
+    def scan_many(self, texts: list[str]) -> list[SignatureMatch]:
+        """Match every signature against each text, resolving the words of all texts to symbols at once.
+
+        Matches never span two texts: the automaton restarts at each one.
+        """
+
+        segments = [text.lower().translate(_SEPARATORS).split() for text in texts]
+        words = segments[0] if len(segments) == 1 else list(itertools.chain.from_iterable(segments))
+        symbols: list[int | None] = list(map(self._words.get, words))
+        if self._stems and self._stemmed_words(words):
+            stemmed = self._stemmed
+            symbols = [stemmed.get(word) if symbol is None else symbol for word, symbol in zip(words, symbols)]
+
+        matches = []
+        start = 0
+        for segment in segments:
+            end = start + len(segment)
+            matches.append(self._match(symbols[start:end] if len(segments) > 1 else symbols))
+            start = end
+        return matches
+
+    def _match(self, symbols: list[int | None]) -> SignatureMatch:
+        goto, fail, out, signatures = self._goto, self._fail, self._out, self.signatures
+        matched: set[int] = set()
+        # Ends of each multi-fragment rule's matched prefixes, by (signature, fragment index).
+        prefix_ends: dict[tuple[int, int], deque[int]] = {}
+        state = 0
+        previous = -2
+        for position, symbol in [(position, symbol) for position, symbol in enumerate(symbols) if symbol is not None]:
+            if position != previous + 1:  # a word outside every rule breaks all partial matches
+                state = 0
+            previous = position
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for number, index, length in out[state]:
+                if number in matched:
+                    continue
+                if index:
+                    ends = prefix_ends.get((number, index - 1))
+                    if not ends or not _has_end_within(ends, position + 1 - length, signatures[number].max_gap):
+                        continue
+                if index == len(signatures[number].fragments) - 1:
+                    matched.add(number)
+                else:
+                    prefix_ends.setdefault((number, index), deque()).append(position + 1)
+
+        best: dict[str, float] = {}
+        for number in matched:
+            signature = signatures[number]
+            best[signature.category] = max(best.get(signature.category, 0.0), signature.weight)
+        return SignatureMatch(
+            categories=tuple(sorted(best)),
+            signature_ids=tuple(sorted(signatures[number].id for number in matched)),
+            score=sum(best.values()),
+        )
+
+    @classmethod
+    def from_file(cls, path: Path | str) -> SignatureSet:
+        path = Path(path)
+        with path.open(encoding="utf-8") as pack:
+            return cls.from_pack(json.load(pack), source=str(path))
+
+    @classmethod
+    def from_pack(cls, pack: dict[str, Any], source: str = "") -> SignatureSet:
+        """Validate and compile a pack; raises ``ValueError`` naming the first bad rule."""
+
+        max_gap = int(pack.get("max_gap", 4))
+        signatures = []
+        for number, rule in enumerate(pack.get("signatures", [])):
+            rule_id = str(rule.get("id", number))
+            fragments = _parse_pattern(str(rule.get("pattern", "")))
+            if not rule.get("category") or not fragments:
+                raise ValueError(
+                    f"signature {rule_id}: needs a category, words around every '*' and stems of 3+ characters"
+                )
+            signatures.append(
+                Signature(
+                    id=rule_id,
+                    category=str(rule["category"]),
+                    weight=float(rule.get("weight", 1.0)),
+                    fragments=fragments,
+                    max_gap=int(rule.get("max_gap", max_gap)),
+                )
+            )
+        digest = hashlib.sha256(json.dumps(pack, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+        return cls(signatures, threshold=float(pack.get("threshold", 2.0)), source=source, digest=digest)
+
+
+def _parse_pattern(pattern: str) -> tuple[tuple[str, ...], ...]:
+    """Split a pattern into word fragments at standalone ``*``; stems keep their trailing ``*``.
+
+    Returns an empty tuple when a ``*`` has no words on one side or a stem is too short.
+    """
+
+    fragments: list[list[str]] = [[]]
+    for part in pattern.lower().split():
+        if part == "*":
+            fragments.append([])
+            continue
+        words = part.rstrip("*").translate(_SEPARATORS).split()
+        if part.endswith("*") and words:
+            if len(words[-1]) < MIN_STEM_CHARS:
+                return ()
+            words[-1] += "*"
+        fragments[-1].extend(words)
+    if not all(fragments):
+        return ()
+    return tuple(tuple(fragment) for fragment in fragments)
+
+
+def _product_size(choices: list[tuple[int, ...]]) -> int:
+    size = 1
+    for options in choices:
+        size *= len(options)
+    return size
+
+
+def _has_end_within(ends: deque[int], start: int, max_gap: int) -> bool:
+    """Whether a prefix ended at most ``max_gap`` words before ``start``.
+
+    Ends arrive in increasing order and later occurrences of a fragment start
+    later, so ends before the window can be dropped for good.
+    """
+
+    while ends and ends[0] < start - max_gap:
+        ends.popleft()
+    return bool(ends) and ends[0] <= start
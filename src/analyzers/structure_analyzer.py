@@ -2,20 +2,25 @@
 
 from __future__ import annotations
 
-import re
+import sys
 from dataclasses import dataclass
 
+from src.analyzers.linear_patterns import template_marker
 from src.models.schemas import PromptStyle
 
 
-@dataclass
+@dataclass(slots=True)
 class StructureSignal:
     """Signal emitted by structure analyzer."""
 
     inferred_prompt: str
     prompt_style: PromptStyle
     task_type: str
-    trace: str
+    template_markers: bool = False
+
+    @property
+    def trace(self) -> str:
+        return f"style={self.prompt_style.value}, task_type={self.task_type}, template_markers={self.template_markers}"
 
 
 class StructureAnalyzer:
@@ -29,7 +34,7 @@ class StructureAnalyzer:
         """Analyze generated text and infer likely upstream prompt frame."""
 
         lower = text.lower()
-        is_template = bool(re.search(r"\{\{.*?\}\}|\[[A-Z_]+\]", text))
+        is_template = template_marker(text)
         role_based = "as an" in lower or "you are" in lower
         cot = any(h in lower for h in self.REASONING_HINTS) and len(text.splitlines()) > 4
 
@@ -44,13 +49,7 @@ class StructureAnalyzer:
 
         task_type = self._infer_task_type(lower)
         inferred_prompt = self._reconstruct_prompt(task_type, prompt_style)
-        trace = f"style={prompt_style.value}, task_type={task_type}, template_markers={is_template}"
-        return StructureSignal(
-            inferred_prompt=inferred_prompt,
-            prompt_style=prompt_style,
-            task_type=task_type,
-            trace=trace,
-        )
+        return StructureSignal(inferred_prompt, prompt_style, task_type, is_template)
 
     def _infer_task_type(self, lower_text: str) -> str:
         if any(h in lower_text for h in self.CODE_HINTS):
@@ -65,19 +64,25 @@ class StructureAnalyzer:
 
     @staticmethod
     def _reconstruct_prompt(task_type: str, style: PromptStyle) -> str:
-        base = {
-            "code": "Generate production-ready code with comments and edge-case handling.",
-            "essay": "Write a structured essay with intro, body, and conclusion.",
-            "explanation": "Explain the concept clearly for an intermediate audience.",
-            "reasoning": "Solve the problem step-by-step and justify each conclusion.",
-            "general": "Respond clearly and helpfully to the user request.",
-        }[task_type]
-
-        prefixes = {
-            PromptStyle.instruction: "Instruction: ",
-            PromptStyle.role_based: "Role: You are a domain expert. Task: ",
-            PromptStyle.chain_of_thought: "Think step-by-step. Then answer. Task: ",
-            PromptStyle.template: "Template: [ROLE] [TASK] [CONSTRAINTS]. Task: ",
-        }
-
-        return f"{prefixes[style]}{base}"
+        return _PROMPTS[style, task_type]
+
+
+_TASK_BASES = {
+    "code": "Generate production-ready code with comments and edge-case handling.",
+    "essay": "Write a structured essay with intro, body, and conclusion.",
+    "explanation": "Explain the concept clearly for an intermediate audience.",
+    "reasoning": "Solve the problem step-by-step and justify each conclusion.",
+    "general": "Respond clearly and helpfully to the user request.",
+}
+_STYLE_PREFIXES = {
+    PromptStyle.instruction: "Instruction: ",
+    PromptStyle.role_based: "Role: You are a domain expert. Task: ",
+    PromptStyle.chain_of_thought: "Think step-by-step. Then answer. Task: ",
+    PromptStyle.template: "Template: [ROLE] [TASK] [CONSTRAINTS]. Task: ",
+}
+# Every reconstructed prompt is built once and shared by all responses.
+_PROMPTS = {
+    (style, task_type): sys.intern(prefix + base)
+    for style, prefix in _STYLE_PREFIXES.items()
+    for task_type, base in _TASK_BASES.items()
+}
@@ -7,13 +7,22 @@ from dataclasses import dataclass
 from src.models.schemas import TemperatureEstimate
 
 
-@dataclass
+@dataclass(slots=True)
 class ToneSignal:
     """Signal emitted by tone classifier."""
 
     tone: str
     temperature: TemperatureEstimate
-    trace: str
+    exclamations: int = 0
+    hedging: int = 0
+    formal: int = 0
+    skipped: bool = False
+
+    @property
+    def trace(self) -> str:
+        if self.skipped:
+            return "tone=skipped"
+        return f"tone={self.tone}, exclamations={self.exclamations}, hedging={self.hedging}, formal={self.formal}"
 
 
 class ToneClassifier:
@@ -37,5 +46,4 @@ class ToneClassifier:
             temperature = TemperatureEstimate.medium
             tone = "neutral"
 
-        trace = f"tone={tone}, exclamations={exclamations}, hedging={hedging}, formal={formal}"
-        return ToneSignal(tone=tone, temperature=temperature, trace=trace)
+        return ToneSignal(tone, temperature, exclamations, hedging, formal)
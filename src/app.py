@@ -2,14 +2,36 @@
 
 from __future__ import annotations
 
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
 from src.config import get_settings
-from src.server.api import router
+from src.server.api import admission, jobs, loop_lag, router, service, worker_metrics
+from src.server.middleware import AdmissionMiddleware, CompressionMiddleware
 from src.utils.logging import configure_logging
 from fastapi.middleware.cors import CORSMiddleware
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Start per-worker background tasks and release pools on shutdown."""
+
+    loop_lag.start()
+    jobs.ensure_started()  # resumes jobs left running by a previous process
+    if worker_metrics is not None:
+        worker_metrics.start()
+    try:
+        yield
+    finally:
+        if worker_metrics is not None:
+            await worker_metrics.stop()
+        await jobs.stop()
+        await loop_lag.stop()
+        service.executor.shutdown()
+
+
 def create_app() -> FastAPI:
     """Create and configure FastAPI app instance."""
 
@@ -20,8 +42,21 @@ def create_app() -> FastAPI:
     title=settings.app_name,
     version="1.0.0",
     description="Analyze LLM outputs and reconstruct likely source prompts.",
+    lifespan=lifespan,
     )
 
+    if settings.admission_enabled:
+        app.add_middleware(AdmissionMiddleware, controller=admission)
+    if settings.compression_enabled:
+        app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_bytes,
+            max_request_bytes=settings.max_request_bytes,
+            limits={"/jobs": settings.jobs_max_upload_bytes},
+            gzip_level=settings.compression_gzip_level,
+            zstd_level=settings.compression_zstd_level,
+        )
+
 # --- ADD THIS BLOCK ---
     app.add_middleware(
         CORSMiddleware,
@@ -15,12 +15,92 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
 
+    workers: int = 0
+    worker_max_requests: int = 0
+    worker_max_memory_mb: int = 0
+    metrics_shared_dir: str = ""
+
     openai_api_key: str = Field(default="", alias="OPENAI_API_KEY")
     openai_base_url: str = Field(default="https://api.openai.com/v1", alias="OPENAI_BASE_URL")
     openai_model: str = Field(default="gpt-4o-mini", alias="OPENAI_MODEL")
 
+    admin_token: str = ""
+    profile_max_seconds: float = 60.0
+
     max_input_chars: int = 12000
     max_batch_items: int = 20
+    fast_mode_sample_chars: int = 4000
+
+    compression_enabled: bool = True
+    compression_minimum_bytes: int = 1024
+    compression_gzip_level: int = 6
+    compression_zstd_level: int = 3
+    max_request_bytes: int = 8_388_608
+
+    ws_max_connections: int = 1000
+    ws_max_inflight: int = 64
+    ws_max_message_bytes: int = 262_144
+
+    temperature_max_outputs: int = 5000
+    temperature_max_analyzed: int = 500
+
+    transcript_max_turns: int = 200
+    transcript_max_chars: int = 100_000
+
+    executor_inline_budget_ms: float = 1.0
+    executor_thread_workers: int = 4
+    executor_process_workers: int = 0
+    executor_process_min_cost_ms: float = 50.0
+
+    injection_signatures_path: str = ""
+    injection_reload_seconds: float = 5.0
+
+    micro_batch_enabled: bool = True
+    micro_batch_max_items: int = 32
+    micro_batch_max_wait_ms: float = 1.0
+    micro_batch_max_inflight: int = 4
+
+    result_store_ttl_seconds: int = 3600
+    result_store_max_entries: int = 5_000
+
+    near_duplicate_cache_enabled: bool = False
+    near_duplicate_max_entries: int = 100_000
+    near_duplicate_max_distance: int = 7
+    near_duplicate_verify_rate: float = 0.01
+
+    analytics_bucket_seconds: int = 3600
+    analytics_retention_buckets: int = 168
+    analytics_max_tenants: int = 10_000
+    analytics_max_buckets: int = 10_000
+
+    prompt_clustering_enabled: bool = False
+    prompt_clustering_max_clusters: int = 5_000
+    prompt_clustering_max_pending: int = 1_000
+    prompt_clustering_similarity: float = 0.6
+
+    jobs_dir: str = "data/jobs"
+    jobs_workers: int = 2
+    jobs_max_upload_bytes: int = 1_073_741_824
+    jobs_checkpoint_lines: int = 500
+    jobs_lease_seconds: float = 60.0
+    jobs_retention_seconds: float = 604_800.0
+
+    fair_scheduler_enabled: bool = True
+    fair_scheduler_concurrency: int = 16
+    fair_scheduler_quantum_chars: int = 4000
+    fair_scheduler_max_queue_per_tenant: int = 64
+    plan_weights: dict[str, float] = {"free": 1.0, "pro": 4.0, "enterprise": 8.0}
+    plan_concurrency: dict[str, int] = {"free": 4, "pro": 8, "enterprise": 16}
+    tenant_plans: dict[str, str] = {}
+    default_plan: str = "free"
+    tenant_proxy_token: str = ""
+
+    admission_enabled: bool = True
+    admission_initial_limit: int = 32
+    admission_max_limit: int = 256
+    admission_target_delay_ms: float = 50.0
+    admission_max_queue: int = 256
+    admission_max_wait_ms: float = 1000.0
 
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
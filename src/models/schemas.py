@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import List
+from typing import Dict, List, Optional, Union
 
 from pydantic import BaseModel, Field, field_validator
 
@@ -27,10 +27,50 @@ class TemperatureEstimate(str, Enum):
     high = "high"
 
 
+class AnalysisMode(str, Enum):
+    """Analysis depth traded against latency."""
+
+    fast = "fast"
+    standard = "standard"
+    deep = "deep"
+
+
+class TurnRole(str, Enum):
+    """Author of one transcript turn."""
+
+    system = "system"
+    user = "user"
+    assistant = "assistant"
+    tool = "tool"
+
+
+class JobStatus(str, Enum):
+    """Lifecycle of an asynchronous analysis job."""
+
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+
 class ReverseRequest(BaseModel):
     """Single reverse engineering request."""
 
     output_text: str = Field(..., min_length=20, description="Raw text produced by an LLM.")
+    mode: AnalysisMode = Field(
+        default=AnalysisMode.standard,
+        description="fast samples large inputs and skips costly analyzers; deep adds slower analyzers.",
+    )
+    deadline_ms: Optional[int] = Field(
+        default=None,
+        gt=0,
+        le=60_000,
+        description="Latency budget; remaining stages are skipped and the result flagged degraded when exceeded.",
+    )
+    include_trace: bool = Field(
+        default=True,
+        description="Set to false to skip building reasoning_trace, which is then returned empty.",
+    )
 
     @field_validator("output_text")
     @classmethod
@@ -43,6 +83,19 @@ class ReverseRequest(BaseModel):
         return value.strip()
 
 
+class StreamReverseRequest(ReverseRequest):
+    """One request frame on the ``/ws/reverse`` socket."""
+
+    id: Union[int, str] = Field(..., description="Client tag echoed on the matching response frame.")
+
+    @field_validator("id")
+    @classmethod
+    def validate_id_length(cls, value: Union[int, str]) -> Union[int, str]:
+        if isinstance(value, str) and len(value) > 128:
+            raise ValueError("id exceeds max length of 128 characters")
+        return value
+
+
 class BatchReverseRequest(BaseModel):
     """Batch reverse engineering request."""
 
@@ -59,6 +112,67 @@ class BatchReverseRequest(BaseModel):
         return value
 
 
+class TranscriptTurn(BaseModel):
+    """One role-tagged turn of a conversation."""
+
+    role: TurnRole
+    content: str
+
+    @field_validator("content")
+    @classmethod
+    def validate_content_length(cls, value: str) -> str:
+        """Guard against overly large turns."""
+
+        max_chars = get_settings().max_input_chars
+        if len(value) > max_chars:
+            raise ValueError(f"content exceeds max length of {max_chars} characters")
+        return value.strip()
+
+
+class TranscriptRequest(BaseModel):
+    """A multi-turn transcript; assistant turns are reverse engineered, every turn is scanned for injection."""
+
+    turns: List[TranscriptTurn] = Field(..., min_length=1)
+    mode: AnalysisMode = Field(
+        default=AnalysisMode.standard,
+        description="Analysis depth per assistant turn; deep runs the deep stages without model assistance.",
+    )
+    deadline_ms: Optional[int] = Field(default=None, gt=0, le=60_000, description="Latency budget for all turns.")
+    include_trace: bool = True
+
+    @field_validator("turns")
+    @classmethod
+    def validate_transcript_size(cls, value: List[TranscriptTurn]) -> List[TranscriptTurn]:
+        """Guard against oversized transcripts and ones with nothing to analyze."""
+
+        settings = get_settings()
+        if len(value) > settings.transcript_max_turns:
+            raise ValueError(f"transcript exceeds limit of {settings.transcript_max_turns} turns")
+        if sum(len(turn.content) for turn in value) > settings.transcript_max_chars:
+            raise ValueError(f"transcript exceeds max length of {settings.transcript_max_chars} characters")
+        if not any(turn.role is TurnRole.assistant and turn.content for turn in value):
+            raise ValueError("transcript needs at least one non-empty assistant turn")
+        return value
+
+
+class TemperatureSetRequest(BaseModel):
+    """Several outputs believed to come from the same prompt."""
+
+    outputs: List[str] = Field(..., min_length=2, description="Completions sampled from one prompt.")
+
+    @field_validator("outputs")
+    @classmethod
+    def validate_outputs(cls, value: List[str]) -> List[str]:
+        """Guard against oversized sets and outputs."""
+
+        settings = get_settings()
+        if len(value) > settings.temperature_max_outputs:
+            raise ValueError(f"set size exceeds limit of {settings.temperature_max_outputs}")
+        if any(len(output) > settings.max_input_chars for output in value):
+            raise ValueError(f"outputs exceed max length of {settings.max_input_chars} characters")
+        return [output.strip() for output in value]
+
+
 class AnalyzerSignals(BaseModel):
     """Unified analyzer signals used for scoring."""
 
@@ -74,6 +188,23 @@ class AnalyzerSignals(BaseModel):
 class ReverseResponse(AnalyzerSignals):
     """Public API response schema for reverse engineering."""
 
+    approximate: bool = Field(
+        default=False,
+        description="True when the result was reused from a near-duplicate input instead of a full analysis.",
+    )
+    degraded: bool = Field(
+        default=False,
+        description="True when the deadline cut the pipeline short and the best partial result was returned.",
+    )
+    suspected_injection: Optional[bool] = Field(
+        default=None,
+        description="Whether the text matches the prompt-injection signatures; null when the scan did not run.",
+    )
+    injection_categories: List[str] = Field(
+        default_factory=list,
+        description="Signature categories matched by the injection scan.",
+    )
+
 
 class BatchReverseResponse(BaseModel):
     """Public API response schema for batch operations."""
@@ -81,6 +212,131 @@ class BatchReverseResponse(BaseModel):
     results: List[ReverseResponse]
 
 
+class TemperatureSetResponse(BaseModel):
+    """Temperature estimated from the variation across a set of outputs."""
+
+    temperature_estimate: TemperatureEstimate
+    variability: float = Field(..., ge=0.0, le=1.0, description="0 for identical outputs, near 1 for unrelated ones.")
+    samples: int
+    samples_analyzed: int
+    distinct_samples: int
+    mean_similarity: float
+    similarity_quantiles: Dict[str, float]
+    near_duplicate_rate: float
+    lexical_diversity: float
+    consensus_divergence: float
+    pairs_compared: int
+
+
+class TranscriptTurnResult(BaseModel):
+    """Signals for one turn; ``result`` is set for non-empty assistant turns only."""
+
+    index: int
+    role: TurnRole
+    suspected_injection: bool
+    injection_patterns: List[str]
+    result: Optional[ReverseResponse] = None
+
+
+class ConstraintDrift(BaseModel):
+    """Constraints that appeared or vanished at an assistant turn, relative to the previous one."""
+
+    turn: int
+    added: List[str]
+    removed: List[str]
+
+
+class ConversationSummary(BaseModel):
+    """Conversation-level view across the analyzed assistant turns."""
+
+    assistant_turns: int
+    prompt_style: PromptStyle
+    style_stable: bool
+    style_changes: List[int] = Field(..., description="Turns whose style differs from the previous assistant turn.")
+    task_type: str
+    temperature_estimate: TemperatureEstimate
+    persistent_constraints: List[str]
+    constraint_drift: List[ConstraintDrift]
+    injection_turns: List[int]
+    mean_confidence: float
+
+
+class TranscriptResponse(BaseModel):
+    """Per-turn signals and the conversation summary for one transcript."""
+
+    turns: List[TranscriptTurnResult]
+    summary: ConversationSummary
+
+
+class AnalyticsResponse(BaseModel):
+    """Aggregated analysis distribution for one tenant and time range."""
+
+    tenant: str
+    total: int
+    prompt_style: Dict[str, int]
+    task_type: Dict[str, int]
+    temperature_estimate: Dict[str, int]
+    constraints_detected: Dict[str, int]
+    confidence_quantiles: Dict[str, float]
+    distinct_texts: int
+
+
+class ClusterSummary(BaseModel):
+    """Group of analyzed outputs that likely share an upstream prompt."""
+
+    cluster_id: int
+    size: int
+    inferred_shared_prompt: str
+    prompt_style: Dict[str, int]
+    task_type: Dict[str, int]
+    constraints_detected: Dict[str, int]
+    shared_phrases: List[str]
+    exemplar: str
+
+
+class ClusterListResponse(BaseModel):
+    """Largest clusters currently held by this worker."""
+
+    clusters: List[ClusterSummary]
+
+
+class ClusterMatchResponse(BaseModel):
+    """Nearest cluster for a queried output, if any."""
+
+    cluster: Optional[ClusterSummary]
+    similarity: float
+
+
+class JobResponse(BaseModel):
+    """Progress of one asynchronous analysis job."""
+
+    job_id: str
+    status: JobStatus
+    total: int
+    processed: int
+    failed: int
+    error: Optional[str] = None
+    created_at: float
+    updated_at: float
+
+
+class JobResultItem(BaseModel):
+    """Result for one input line of a job; exactly one of ``result`` and ``error`` is set."""
+
+    line: int
+    result: Optional[ReverseResponse] = None
+    error: Optional[str] = None
+
+
+class JobResultsPage(BaseModel):
+    """A page of checkpointed job results."""
+
+    job_id: str
+    offset: int
+    limit: int
+    items: List[JobResultItem]
+
+
 class HealthResponse(BaseModel):
     """Health check response."""
 
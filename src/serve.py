@@ -0,0 +1,223 @@
+"""Prefork launcher: warm the analyzers once, then serve from several worker processes.
+
+Run ``python -m src.serve``. The parent binds the listening socket, imports
+the app and analyzes a few samples in every mode, then forks the workers,
+so compiled patterns and lookup tables are shared copy-on-write. Workers
+accept from the one inherited socket. The parent restarts workers that exit
+and recycles workers whose resident memory passes ``WORKER_MAX_MEMORY_MB``;
+``WORKER_MAX_REQUESTS`` recycles them after a request count instead.
+Workers publish metrics, analytics sketches and the texts behind by-hash
+lookups to a shared tmpfs directory, so ``/metrics``, ``/analytics`` and
+``GET /reverse/{hash}`` on any worker cover all of them. ``WORKERS`` defaults
+to the CPU count.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_TEXTS = (
+    "You are a senior reviewer. Provide concise feedback in 3 bullet points.",
+    "Step 1: analyze the input. Step 2: return JSON with confidence and constraints.",
+    "def slugify(title):\n    return title.lower().replace(' ', '-')",
+)
+
+
+def _rss_bytes(pid: int) -> int | None:
+    """Resident set size of ``pid`` from ``/proc``; ``None`` where that is unavailable."""
+
+    try:
+        with open(f"/proc/{pid}/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def warm_up(service: Any) -> None:
+    """Run every analysis mode once so lazily built state exists before the fork."""
+
+    from src.models.schemas import AnalysisMode
+
+    for text in WARM_UP_TEXTS:
+        for mode in AnalysisMode:
+            service._analyze(text, mode, None)
+
+
+class Supervisor:
+    """Fork, watch and restart uvicorn workers that share one listening socket."""
+
+    def __init__(
+        self,
+        app: Any,
+        sock: socket.socket,
+        workers: int,
+        metrics_dir: Path,
+        max_requests: int = 0,
+        max_memory_mb: int = 0,
+        graceful_timeout: float = 30.0,
+    ) -> None:
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.metrics_dir = metrics_dir
+        self.max_requests = max_requests
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024
+        self.graceful_timeout = graceful_timeout
+        self.children: dict[int, float] = {}
+        self.recycling: set[int] = set()
+        self.stopping = False
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self.spawn()
+        logger.info("Serving with %d workers", self.workers)
+        while not self.stopping:
+            self.reap()
+            self.recycle_bloated()
+            time.sleep(0.5)
+        self.shutdown()
+        return 0
+
+    def _stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+
+    def spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = self._serve()
+            except BaseException:
+                logger.exception("Worker crashed")
+            finally:
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+
+    def _serve(self) -> int:
+        import uvicorn
+
+        from src.config import get_settings
+        from src.server.api import jobs
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        random.seed()  # forked children start from the parent's random state
+        jobs.reopen()
+        max_requests = self.max_requests + random.randint(0, self.max_requests // 10) if self.max_requests else None
+        config = uvicorn.Config(
+            self.app,
+            lifespan="on",
+            limit_max_requests=max_requests,
+            log_config=None,
+            ws_max_size=get_settings().ws_max_message_bytes,
+        )
+        uvicorn.Server(config).run(sockets=[self.sock])
+        return 0
+
+    def reap(self) -> None:
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            started = self.children.pop(pid, None)
+            self.recycling.discard(pid)
+            (self.metrics_dir / f"{pid}.json").unlink(missing_ok=True)
+            shutil.rmtree(self.metrics_dir / str(pid), ignore_errors=True)
+            if started is None or self.stopping:
+                continue
+            logger.warning("Worker %d exited with %d; restarting", pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < 1.0:
+                time.sleep(1.0)  # back off a worker that dies on startup
+            self.spawn()
+
+    def recycle_bloated(self) -> None:
+        if not self.max_memory_bytes:
+            return
+        for pid in list(self.children):
+            rss = _rss_bytes(pid)
+            if rss is not None and rss > self.max_memory_bytes and pid not in self.recycling:
+                logger.warning("Worker %d uses %d MB; recycling", pid, rss // (1024 * 1024))
+                self.recycling.add(pid)
+                os.kill(pid, signal.SIGTERM)
+
+    def shutdown(self) -> None:
+        for pid in self.children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in self.children:
+            os.kill(pid, signal.SIGKILL)
+        while self.children:
+            pid, _ = os.waitpid(-1, 0)
+            self.children.pop(pid, None)
+
+
+def main(argv: list[str] | None = None) -> int:
+    shm = Path("/dev/shm")
+    metrics_dir = Path(tempfile.mkdtemp(prefix="prompt-reverse-metrics-", dir=shm if shm.is_dir() else None))
+    os.environ["METRICS_SHARED_DIR"] = str(metrics_dir)  # read by every worker's settings
+
+    from src.config import get_settings
+    from src.utils.logging import configure_logging
+
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Serve the API from several prefork workers.")
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=settings.workers or os.cpu_count() or 1)
+    parser.add_argument("--max-requests", type=int, default=settings.worker_max_requests)
+    parser.add_argument("--max-memory-mb", type=int, default=settings.worker_max_memory_mb)
+    args = parser.parse_args(argv)
+    configure_logging(settings.log_level)
+
+    try:
+        sock = bind_socket(args.host, args.port)
+        from src.app import app
+        from src.server.api import jobs, service
+
+        warm_up(service)
+        jobs.store.close()  # each worker opens its own connection
+        gc.collect()
+        gc.freeze()  # keep the collector from touching, and so copying, the shared pages
+        supervisor = Supervisor(
+            app,
+            sock,
+            workers=args.workers,
+            metrics_dir=metrics_dir,
+            max_requests=args.max_requests,
+            max_memory_mb=args.max_memory_mb,
+        )
+        return supervisor.run()
+    finally:
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
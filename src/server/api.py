@@ -2,23 +2,147 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import hmac
+import json
 import logging
+import os
+import time
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import asdict
+from typing import Any, Literal
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Path, Query, Request, Response, WebSocket
+from fastapi.requests import HTTPConnection
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import ValidationError
 
 from src.config import get_settings
 from src.models.schemas import (
+    AnalysisMode,
+    AnalyticsResponse,
     BatchReverseRequest,
     BatchReverseResponse,
+    ClusterListResponse,
+    ClusterMatchResponse,
+    ClusterSummary,
     HealthResponse,
+    JobResponse,
+    JobResultsPage,
+    JobStatus,
     ReverseRequest,
     ReverseResponse,
+    StreamReverseRequest,
+    TemperatureSetRequest,
+    TemperatureSetResponse,
+    TranscriptRequest,
+    TranscriptResponse,
 )
+from src.services.admission import AdmissionController, Overloaded, Priority
+from src.services.analytics import CorpusAnalytics
+from src.services.executor import LoopLagMonitor
+from src.services.fair_scheduler import FairScheduler
+from src.services.jobs import JobRunner, JobTooLarge
+from src.services.metrics import MetricsRegistry
+from src.services.profiler import ProfileInProgress, SamplingProfiler
+from src.services.prompt_clustering import ClusterWorker, PromptClusterIndex
+from src.services.result_store import ResultStore, cacheable, etag_matches, input_hash, result_etag
 from src.services.reverse_engineering_service import ReverseEngineeringService
+from src.services.sample_temperature import SampleTemperatureEstimator
+from src.services.worker_metrics import WorkerMetricsChannel
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 service = ReverseEngineeringService()
+metrics = MetricsRegistry()
+loop_lag = LoopLagMonitor()
+profiler = SamplingProfiler()
+_settings = get_settings()
+analytics = CorpusAnalytics(
+    bucket_seconds=_settings.analytics_bucket_seconds,
+    retention_buckets=_settings.analytics_retention_buckets,
+    max_tenants=_settings.analytics_max_tenants,
+    max_buckets=_settings.analytics_max_buckets,
+)
+clusters = ClusterWorker(
+    PromptClusterIndex(
+        max_clusters=_settings.prompt_clustering_max_clusters,
+        similarity_threshold=_settings.prompt_clustering_similarity,
+    ),
+    max_pending=_settings.prompt_clustering_max_pending,
+)
+results = ResultStore(
+    ttl_seconds=_settings.result_store_ttl_seconds,
+    max_entries=_settings.result_store_max_entries,
+    publish_texts=bool(_settings.metrics_shared_dir),
+)
+temperature = SampleTemperatureEstimator(max_analyzed=_settings.temperature_max_analyzed)
+scheduler = (
+    FairScheduler(
+        concurrency=_settings.fair_scheduler_concurrency,
+        plan_weights=_settings.plan_weights,
+        plan_concurrency=_settings.plan_concurrency,
+        tenant_plans=_settings.tenant_plans,
+        default_plan=_settings.default_plan,
+        quantum_chars=_settings.fair_scheduler_quantum_chars,
+        max_queue_per_tenant=_settings.fair_scheduler_max_queue_per_tenant,
+    )
+    if _settings.fair_scheduler_enabled and _settings.tenant_plans
+    else None
+)
+if scheduler is not None and service.batcher is not None:
+    # Calls reach the batcher holding a slot, so only that many can be batched together.
+    service.batcher.limit_to(scheduler.concurrency)
+admission = AdmissionController(
+    initial_limit=_settings.admission_initial_limit,
+    max_limit=_settings.admission_max_limit,
+    target_delay_ms=_settings.admission_target_delay_ms,
+    max_queue=_settings.admission_max_queue,
+    max_wait_ms=_settings.admission_max_wait_ms,
+)
+
+
+def _tenant_id(http_request: HTTPConnection) -> str:
+    """Identify the calling tenant by API key id, then user id.
+
+    The headers are not authenticated here; a proxy in front must set them.
+    With ``TENANT_PROXY_TOKEN`` set they only count on calls that carry the
+    same ``X-Proxy-Token``, and every other call is ``anonymous``.
+    """
+
+    headers = http_request.headers
+    if _settings.tenant_proxy_token:
+        supplied = headers.get("x-proxy-token", "")
+        if not hmac.compare_digest(supplied.encode(), _settings.tenant_proxy_token.encode()):
+            return "anonymous"
+    return headers.get("x-api-key-id") or headers.get("x-user-id") or "anonymous"
+
+
+def _scheduled(tenant: str, cost: int) -> AbstractAsyncContextManager[None]:
+    """Wait for the tenant's fair share of analysis slots, when the scheduler is enabled."""
+
+    return scheduler.slot(tenant, cost) if scheduler is not None else nullcontext()
+
+
+def _observe(tenant: str, output_text: str, result: ReverseResponse) -> None:
+    """Feed one analyzed output into the aggregate views."""
+
+    analytics.record(tenant, output_text, result)
+    if _settings.prompt_clustering_enabled:
+        clusters.insert(output_text, result, tenant)
+
+
+jobs = JobRunner(
+    service,
+    _settings.jobs_dir,
+    workers=_settings.jobs_workers,
+    checkpoint_lines=_settings.jobs_checkpoint_lines,
+    lease_seconds=_settings.jobs_lease_seconds,
+    observe=_observe,
+    scheduled=_scheduled,
+    retention_seconds=_settings.jobs_retention_seconds,
+)
 
 
 @router.get("/health", response_model=HealthResponse)
@@ -29,24 +153,521 @@ async def health() -> HealthResponse:
     return HealthResponse(status="ok", app=settings.app_name, environment=settings.app_env)
 
 
+def _local_metrics() -> dict[str, Any]:
+    payload: dict[str, Any] = {
+        "endpoints": metrics.snapshot(),
+        "event_loop_lag": loop_lag.stats(),
+        "executor": service.executor.stats(),
+    }
+    if service.batcher is not None:
+        payload["micro_batcher"] = service.batcher.stats()
+    if service.near_duplicates is not None:
+        payload["near_duplicate_cache"] = service.near_duplicates.stats()
+    if _settings.admission_enabled:
+        payload["admission"] = admission.stats()
+    if scheduler is not None:
+        payload["fair_scheduler"] = scheduler.stats()
+    payload["websocket"] = {"connections": float(_socket_connections)}
+    payload["injection_signatures"] = service.injection.stats()
+    payload["result_store"] = results.stats()
+    payload["analytics"] = analytics.stats()
+    payload["prompt_clusters"] = clusters.stats()
+    return payload
+
+
+def _worker_snapshot() -> dict[str, Any]:
+    return {"endpoints": metrics.export(), "event_loop_lag": loop_lag.export(), "stats": _local_metrics()}
+
+
+def _changed_analytics() -> dict[str, Any]:
+    return {tenant: analytics.export(tenant) for tenant in analytics.take_dirty()}
+
+
+worker_metrics = (
+    WorkerMetricsChannel(
+        _settings.metrics_shared_dir,
+        _worker_snapshot,
+        shared={"analytics": _changed_analytics, "texts": results.take_new_texts},
+        shared_ttl_seconds={"texts": results.ttl_seconds},
+    )
+    if _settings.metrics_shared_dir
+    else None
+)
+
+
+@router.get("/metrics")
+async def get_metrics() -> dict[str, Any]:
+    """Return endpoint timings, event-loop lag, admission and cache counters.
+
+    Under ``src.serve`` the counters and histograms cover every worker.
+    """
+
+    if worker_metrics is None:
+        return _local_metrics()
+    worker_metrics.publish()
+    return worker_metrics.aggregate()
+
+
+def _require_admin(http_request: Request) -> None:
+    """Allow the call only with the configured ``X-Admin-Token``; admin and debug routes are hidden without one."""
+
+    if not _settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = http_request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(supplied.encode(), _settings.admin_token.encode()):
+        raise HTTPException(status_code=403, detail="admin_token_invalid")
+
+
+@router.post("/admin/signatures/reload")
+async def reload_signatures(http_request: Request) -> dict[str, Any]:
+    """Recompile the injection signature pack now instead of at the next poll.
+
+    Under ``src.serve`` this reloads the worker that served the call; the
+    others pick up the changed file at their next poll.
+    """
+
+    _require_admin(http_request)
+    try:
+        signatures = await asyncio.to_thread(service.injection.reload)
+    except (OSError, ValueError) as exc:
+        logger.warning("Signature pack reload failed: %s", exc)
+        raise HTTPException(status_code=422, detail="invalid_signature_pack") from exc
+    return {"source": signatures.source, "signatures": len(signatures), "threshold": signatures.threshold}
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse)
+async def debug_profile(
+    http_request: Request,
+    seconds: float = Query(default=10.0, gt=0),
+    mode: Literal["cpu", "alloc"] = "cpu",
+    interval_ms: float = Query(default=10.0, ge=1.0, le=1000.0),
+) -> PlainTextResponse:
+    """Profile this worker for ``seconds`` and return collapsed stacks for flamegraph tools.
+
+    CPU profiles weigh stacks by samples; alloc profiles by bytes still alive
+    at the end. Only one profile runs per worker at a time.
+    """
+
+    _require_admin(http_request)
+    if seconds > _settings.profile_max_seconds:
+        raise HTTPException(status_code=422, detail="profile_too_long")
+    try:
+        profile = await profiler.profile(seconds, mode, interval_ms)
+    except ProfileInProgress as exc:
+        raise HTTPException(status_code=409, detail="profile_in_progress") from exc
+    headers = {
+        "X-Profile-Mode": profile.mode,
+        "X-Profile-Clock": profile.clock,
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Pid": str(os.getpid()),
+    }
+    return PlainTextResponse(profile.collapsed(), headers=headers)
+
+
+@router.get("/analytics", response_model=AnalyticsResponse)
+async def get_analytics(
+    http_request: Request,
+    since: float | None = None,
+    until: float | None = None,
+) -> AnalyticsResponse:
+    """Return the calling tenant's analysis distribution between two unix timestamps.
+
+    Under ``src.serve`` the sketches other workers last published are merged
+    in, so the answer covers every worker up to the publish interval.
+    """
+
+    tenant = _tenant_id(http_request)
+    if worker_metrics is None:
+        return AnalyticsResponse(**analytics.query(tenant, since, until))
+    published = await asyncio.to_thread(worker_metrics.collect_shared, "analytics", tenant)
+    combined = CorpusAnalytics(analytics.bucket_seconds, analytics.retention_buckets, max_tenants=1)
+    combined.absorb(tenant, analytics.export(tenant))
+    for exported in published:
+        combined.absorb(tenant, exported)
+    return AnalyticsResponse(**combined.query(tenant, since, until))
+
+
+@router.get("/clusters", response_model=ClusterListResponse)
+async def list_clusters(http_request: Request, limit: int = Query(default=20, ge=1, le=200)) -> ClusterListResponse:
+    """Return the calling tenant's largest prompt clusters seen by this worker."""
+
+    top = await clusters.call(clusters.index.top, limit, _tenant_id(http_request))
+    return ClusterListResponse(clusters=[ClusterSummary(**summary) for summary in top])
+
+
+@router.get("/clusters/{cluster_id}", response_model=ClusterSummary)
+async def get_cluster(cluster_id: int, http_request: Request) -> ClusterSummary:
+    """Return one of the calling tenant's prompt clusters."""
+
+    summary = await clusters.call(clusters.index.get, cluster_id, _tenant_id(http_request))
+    if summary is None:
+        raise HTTPException(status_code=404, detail="cluster_not_found")
+    return ClusterSummary(**summary)
+
+
+@router.post("/clusters/query", response_model=ClusterMatchResponse)
+async def query_cluster(request: ReverseRequest, http_request: Request) -> ClusterMatchResponse:
+    """Find the calling tenant's cluster an output most likely belongs to without inserting it."""
+
+    tenant = _tenant_id(http_request)
+    try:
+        result = await service.reverse(request.output_text, slot=_scheduled(tenant, len(request.output_text)))
+    except Overloaded as exc:
+        raise HTTPException(
+            status_code=503, detail="tenant_overloaded", headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+    match = await clusters.call(clusters.index.query, request.output_text, result, tenant)
+    if match is None:
+        return ClusterMatchResponse(cluster=None, similarity=0.0)
+    summary, similarity = match
+    return ClusterMatchResponse(cluster=ClusterSummary(**summary), similarity=similarity)
+
+
+async def _owned_job(job_id: str, http_request: Request) -> dict[str, Any]:
+    job = await jobs.status(job_id)
+    if job is None or job["tenant"] != _tenant_id(http_request):
+        raise HTTPException(status_code=404, detail="job_not_found")
+    return job
+
+
+def _job_response(job: dict[str, Any]) -> JobResponse:
+    return JobResponse(
+        job_id=job["id"],
+        status=job["status"],
+        total=job["total"],
+        processed=job["processed"],
+        failed=job["failed"],
+        error=job["error"],
+        created_at=job["created_at"],
+        updated_at=job["updated_at"],
+    )
+
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(http_request: Request) -> JobResponse:
+    """Spool a JSONL body of ``ReverseRequest`` objects to disk and queue it for analysis."""
+
+    tenant = _tenant_id(http_request)
+    try:
+        job_id = await jobs.submit(http_request.stream(), tenant, _settings.jobs_max_upload_bytes)
+    except JobTooLarge as exc:
+        raise HTTPException(status_code=413, detail="job_too_large") from exc
+    return _job_response(await _owned_job(job_id, http_request))
+
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, http_request: Request) -> JobResponse:
+    """Report a job's progress."""
+
+    return _job_response(await _owned_job(job_id, http_request))
+
+
+@router.get("/jobs/{job_id}/results")
+async def download_job_results(job_id: str, http_request: Request) -> FileResponse:
+    """Download a completed job's results as gzip-compressed JSONL."""
+
+    job = await _owned_job(job_id, http_request)
+    if job["status"] != JobStatus.completed.value:
+        raise HTTPException(status_code=409, detail="job_not_completed")
+    return FileResponse(
+        jobs.results_path(job_id),
+        media_type="application/gzip",
+        filename=f"{job_id}.jsonl.gz",
+    )
+
+
+@router.get("/jobs/{job_id}/results/page", response_model=JobResultsPage)
+async def page_job_results(
+    job_id: str,
+    http_request: Request,
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+) -> JobResultsPage:
+    """Return checkpointed results by input line; available while the job is still running."""
+
+    await _owned_job(job_id, http_request)
+    items = await jobs.page(job_id, offset, limit)
+    return JobResultsPage(job_id=job_id, offset=offset, limit=limit, items=items)
+
+
+def _rules() -> str:
+    """Digest of the signature pack in use, part of result ETags and the result store version."""
+
+    return service.injection.signatures.digest
+
+
+async def _reverse_stored(
+    request: ReverseRequest,
+    tenant: str,
+    text_hash: str,
+) -> ReverseResponse:
+    """Serve a stored full result for this input, or analyze and store it.
+
+    Only a new analysis feeds analytics and clusters, so serving a stored
+    result does not count the same output again.
+    """
+
+    rules = _rules()
+    result = results.get(text_hash, request.mode, request.include_trace, rules)
+    if result is None:
+        try:
+            result = await service.reverse(
+                request.output_text,
+                request.mode,
+                request.deadline_ms,
+                request.include_trace,
+                slot=_scheduled(tenant, len(request.output_text)),
+            )
+        except Overloaded as exc:
+            raise HTTPException(
+                status_code=503, detail="tenant_overloaded", headers={"Retry-After": str(exc.retry_after)}
+            ) from exc
+        if cacheable(request.mode, result):
+            results.put(text_hash, request.output_text, request.mode, request.include_trace, result, rules, tenant)
+        _observe(tenant, request.output_text, result)
+    return result
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
 @router.post("/reverse", response_model=ReverseResponse)
-async def reverse(request: ReverseRequest) -> ReverseResponse:
-    """Reverse engineer a likely prompt from one model output."""
+async def reverse(request: ReverseRequest, http_request: Request, response: Response) -> Any:
+    """Reverse engineer a likely prompt from one model output.
+
+    Full results carry a strong ``ETag``; a matching ``If-None-Match`` gets
+    ``304`` without re-analysis.
+    """
 
+    started = time.perf_counter()
     try:
-        return await service.reverse(request.output_text)
+        text_hash = input_hash(request.output_text)
+        etag = result_etag(text_hash, request.mode, request.include_trace, _rules())
+        if request.mode is not AnalysisMode.deep and etag_matches(http_request.headers.get("if-none-match"), etag):
+            return _not_modified(etag)
+        result = await _reverse_stored(request, _tenant_id(http_request), text_hash)
+        response.headers["X-Input-Hash"] = text_hash
+        if cacheable(request.mode, result):
+            response.headers["ETag"] = etag
+        return result
+    except HTTPException:
+        raise
     except Exception as exc:  # defensive catch for graceful failure
         logger.exception("Failed to reverse engineer prompt")
         raise HTTPException(status_code=500, detail="reverse_engineering_failed") from exc
+    finally:
+        metrics.track("/reverse", started)
+
+
+@router.get("/reverse/{text_hash}", response_model=ReverseResponse)
+async def reverse_by_hash(
+    http_request: Request,
+    response: Response,
+    text_hash: str = Path(pattern="^[0-9a-f]{64}$"),
+    mode: AnalysisMode = AnalysisMode.standard,
+    include_trace: bool = True,
+) -> Any:
+    """Return the analysis of an output this tenant submitted before, referenced by its SHA-256 input hash.
+
+    Under ``src.serve`` outputs stored by other workers resolve too, once
+    they have published them.
+    """
+
+    etag = result_etag(text_hash, mode, include_trace, _rules())
+    if mode is not AnalysisMode.deep and etag_matches(http_request.headers.get("if-none-match"), etag):
+        return _not_modified(etag)
+    tenant = _tenant_id(http_request)
+    output_text = results.text(text_hash, tenant)
+    if output_text is None and worker_metrics is not None:
+        published = await asyncio.to_thread(worker_metrics.collect_shared, "texts", f"{tenant}:{text_hash}")
+        output_text = published[0] if published else None
+    if output_text is None:
+        raise HTTPException(status_code=404, detail="result_not_found")
+    request = ReverseRequest(output_text=output_text, mode=mode, include_trace=include_trace)
+    result = await _reverse_stored(request, tenant, text_hash)
+    if cacheable(mode, result):
+        response.headers["ETag"] = etag
+    return result
 
 
 @router.post("/reverse/batch", response_model=BatchReverseResponse)
-async def reverse_batch(request: BatchReverseRequest) -> BatchReverseResponse:
-    """Reverse engineer prompts for a batch of outputs."""
+async def reverse_batch(request: BatchReverseRequest, http_request: Request, response: Response) -> Any:
+    """Reverse engineer prompts for a batch of outputs.
+
+    The batch ``ETag`` covers every item's ETag and is only issued when all
+    items are full, cacheable results.
+    """
 
+    started = time.perf_counter()
+    tenant = _tenant_id(http_request)
     try:
-        results = [await service.reverse(item.output_text) for item in request.items]
-        return BatchReverseResponse(results=results)
+        hashes = [input_hash(item.output_text) for item in request.items]
+        rules = _rules()
+        etags = [result_etag(h, item.mode, item.include_trace, rules) for h, item in zip(hashes, request.items)]
+        batch_etag = '"b' + hashlib.sha256(",".join(etags).encode()).hexdigest()[:32] + '"'
+        conditional = all(item.mode is not AnalysisMode.deep for item in request.items)
+        if conditional and etag_matches(http_request.headers.get("if-none-match"), batch_etag):
+            return _not_modified(batch_etag)
+
+        batch_results = []
+        for item, text_hash in zip(request.items, hashes):
+            batch_results.append(await _reverse_stored(item, tenant, text_hash))
+        if all(cacheable(item.mode, result) for item, result in zip(request.items, batch_results)):
+            response.headers["ETag"] = batch_etag
+        return BatchReverseResponse(results=batch_results)
+    except HTTPException:
+        raise
     except Exception as exc:  # defensive catch for graceful failure
         logger.exception("Batch reverse engineering failed")
         raise HTTPException(status_code=500, detail="batch_reverse_engineering_failed") from exc
+    finally:
+        metrics.track("/reverse/batch", started)
+
+
+@router.post("/reverse/temperature", response_model=TemperatureSetResponse)
+async def reverse_temperature(request: TemperatureSetRequest, http_request: Request) -> TemperatureSetResponse:
+    """Estimate sampling temperature from how much several outputs of one prompt vary."""
+
+    started = time.perf_counter()
+    outputs = request.outputs
+    analyzed_chars = sum(map(len, outputs)) * min(1.0, temperature.max_analyzed / len(outputs))
+    try:
+        async with _scheduled(_tenant_id(http_request), int(analyzed_chars)):
+            estimate = await asyncio.to_thread(temperature.estimate, outputs)
+        return TemperatureSetResponse(**asdict(estimate))
+    except Overloaded as exc:
+        raise HTTPException(
+            status_code=503, detail="tenant_overloaded", headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+    finally:
+        metrics.track("/reverse/temperature", started)
+
+
+@router.post("/reverse/transcript", response_model=TranscriptResponse)
+async def reverse_transcript(request: TranscriptRequest, http_request: Request) -> TranscriptResponse:
+    """Analyze every turn of a conversation in one pass and summarize it.
+
+    Assistant turns count towards the tenant's analytics. They are not
+    clustered: each answers a different user message, and indexing them
+    would cost more than analyzing them.
+    """
+
+    started = time.perf_counter()
+    tenant = _tenant_id(http_request)
+    turns = [(turn.role, turn.content) for turn in request.turns]
+    try:
+        async with _scheduled(tenant, sum(len(content) for _, content in turns)):
+            transcript = await service.reverse_transcript(
+                turns, request.mode, request.deadline_ms, request.include_trace
+            )
+        for (_, content), turn in zip(turns, transcript.turns):
+            if turn.result is not None:
+                analytics.record(tenant, content, turn.result)
+        return transcript
+    except Overloaded as exc:
+        raise HTTPException(
+            status_code=503, detail="tenant_overloaded", headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
+    except Exception as exc:  # defensive catch for graceful failure
+        logger.exception("Transcript analysis failed")
+        raise HTTPException(status_code=500, detail="transcript_analysis_failed") from exc
+    finally:
+        metrics.track("/reverse/transcript", started)
+
+
+_socket_connections = 0
+
+
+@router.websocket("/ws/reverse")
+async def reverse_socket(websocket: WebSocket) -> None:
+    """Pipeline many ``/reverse`` calls over one connection.
+
+    Each text frame is a ``StreamReverseRequest``: the ``/reverse`` body plus
+    a client ``id``. Responses are ``{"id", "result"}`` or ``{"id", "error"}``
+    frames sent as each analysis completes, so they can arrive out of
+    order. At most ``WS_MAX_INFLIGHT`` requests run per connection; further
+    frames are not read until one completes, which pushes back on the
+    client through TCP. Each request is admitted at high priority, like a
+    ``POST /reverse``, and a shed one gets an ``overloaded`` error frame.
+    Frames over ``WS_MAX_MESSAGE_BYTES`` (UTF-8 encoded) close the
+    connection with 1009, and connections beyond ``WS_MAX_CONNECTIONS`` are
+    closed with 1013.
+    """
+
+    global _socket_connections
+    await websocket.accept()
+    if _socket_connections >= _settings.ws_max_connections:
+        await websocket.close(code=1013, reason="too_many_connections")
+        return
+    _socket_connections += 1
+    tenant = _tenant_id(websocket)
+    slots = asyncio.Semaphore(_settings.ws_max_inflight)
+    send_lock = asyncio.Lock()
+    tasks: set[asyncio.Task[None]] = set()
+
+    async def send(frame: str) -> None:
+        async with send_lock:
+            await websocket.send_text(frame)
+
+    async def answer(raw: str) -> None:
+        started = time.perf_counter()
+        try:
+            await send(await _socket_reply(raw, tenant))
+        except Exception:  # the client went away mid-reply
+            logger.debug("Dropped a WebSocket reply", exc_info=True)
+        finally:
+            slots.release()
+            metrics.track("/ws/reverse", started)
+
+    try:
+        while True:
+            await slots.acquire()
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            raw = message.get("text")
+            size = len(raw.encode("utf-8")) if raw is not None else len(message.get("bytes") or b"")
+            if size > _settings.ws_max_message_bytes:
+                await websocket.close(code=1009, reason="frame_too_large")
+                break
+            if raw is None:
+                raw = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+            task = asyncio.create_task(answer(raw))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        _socket_connections -= 1
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _socket_reply(raw: str, tenant: str) -> str:
+    """Analyze one request frame and return its JSON response frame."""
+
+    try:
+        request = StreamReverseRequest.model_validate_json(raw)
+    except ValidationError as exc:
+        try:
+            frame_id = json.loads(raw).get("id")
+        except (ValueError, AttributeError):
+            frame_id = None
+        errors = [{"loc": error["loc"], "msg": error["msg"]} for error in exc.errors()]
+        return json.dumps({"id": frame_id, "error": "invalid_request", "detail": errors})
+
+    frame_id = json.dumps(request.id)
+    admitted = admission.admit(Priority.high) if _settings.admission_enabled else nullcontext()
+    try:
+        async with admitted:
+            result = await _reverse_stored(request, tenant, input_hash(request.output_text))
+    except Overloaded as exc:
+        return json.dumps({"id": request.id, "error": "overloaded", "retry_after": exc.retry_after})
+    except HTTPException as exc:
+        retry_after = (exc.headers or {}).get("Retry-After")
+        error = {"id": request.id, "error": exc.detail, **({"retry_after": int(retry_after)} if retry_after else {})}
+        return json.dumps(error)
+    except Exception:  # defensive catch for graceful failure
+        logger.exception("Failed to reverse engineer prompt over WebSocket")
+        return json.dumps({"id": request.id, "error": "reverse_engineering_failed"})
+    return f'{{"id":{frame_id},"result":{result.model_dump_json()}}}'
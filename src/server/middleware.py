@@ -0,0 +1,214 @@
+"""ASGI middleware applied in front of the API routes."""
+
+from __future__ import annotations
+
+import re
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.admission import AdmissionController, Overloaded, Priority
+from src.utils.compression import BodyTooLarge, Deflater, Inflater, MalformedBody, negotiate, supported_encodings
+
+ADMISSION_PRIORITIES: dict[str, Priority] = {
+    "/reverse": Priority.high,
+    "/reverse/{text_hash}": Priority.high,
+    "/reverse/batch": Priority.low,
+    "/reverse/temperature": Priority.low,
+    "/reverse/transcript": Priority.low,
+}
+
+# Already-compressed payloads gain nothing from a second pass.
+PRECOMPRESSED_TYPES = ("application/gzip", "application/zstd", "application/zip", "image/", "audio/", "video/")
+
+
+class AdmissionMiddleware:
+    """Admit analysis requests through an ``AdmissionController`` and shed the excess with 503.
+
+    Requests are admitted before their body is read, so a shed request costs
+    only the response it is sent. Paths are matched exactly first, then
+    against ``{param}`` templates, which match one path segment.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        priorities: dict[str, Priority] | None = None,
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.priorities = ADMISSION_PRIORITIES if priorities is None else priorities
+        self._templates = [
+            (re.compile(re.sub(r"\\\{\w+\\\}", "[^/]+", re.escape(path)) + "$"), priority)
+            for path, priority in self.priorities.items()
+            if "{" in path
+        ]
+
+    def _priority(self, path: str) -> Priority | None:
+        priority = self.priorities.get(path)
+        if priority is None:
+            priority = next((priority for pattern, priority in self._templates if pattern.match(path)), None)
+        return priority
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        priority = self._priority(scope["path"]) if scope["type"] == "http" else None
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            async with self.controller.admit(priority):
+                await self.app(scope, receive, send)
+        except Overloaded as exc:
+            response = JSONResponse(
+                {"detail": "overloaded"},
+                status_code=503,
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+            await response(scope, receive, send)
+
+
+class CompressionMiddleware:
+    """Inflate gzip and zstd request bodies and compress responses the client accepts.
+
+    Request bodies are decoded as they stream in, and the inflated size is
+    capped per path (``limits``, else ``max_request_bytes``) before any
+    output past the cap is produced; a body over the cap gets 413. Responses
+    are compressed chunk by chunk and each chunk is flushed, so streamed
+    bodies stay incremental. Single-chunk bodies under ``minimum_size`` are
+    sent as they are.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        max_request_bytes: int = 8_388_608,
+        limits: dict[str, int] | None = None,
+        gzip_level: int = 6,
+        zstd_level: int = 3,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.max_request_bytes = max_request_bytes
+        self.limits = limits or {}
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        response_encoding = negotiate(headers.get("accept-encoding"))
+        content_encoding = headers.get("content-encoding", "identity").strip().lower()
+        if content_encoding == "identity":
+            await self.app(scope, receive, self._compressing(send, response_encoding))
+            return
+        if content_encoding not in supported_encodings():
+            await JSONResponse({"detail": "unsupported_content_encoding"}, status_code=415)(scope, receive, send)
+            return
+
+        inflater = Inflater(content_encoding, self.limits.get(scope["path"], self.max_request_bytes))
+        rejection: list[JSONResponse] = []
+        started = False
+
+        async def inflating_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                try:
+                    message = {**message, "body": inflater.feed(message.get("body", b""))}
+                except BodyTooLarge:
+                    rejection.append(JSONResponse({"detail": "request_too_large"}, status_code=413))
+                    raise
+                except MalformedBody:
+                    rejection.append(JSONResponse({"detail": "invalid_content_encoding"}, status_code=400))
+                    raise
+            return message
+
+        compressing_send = self._compressing(send, response_encoding)
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal started
+            if rejection:
+                return  # whatever the route made of the decoding error is replaced below
+            started = True
+            await compressing_send(message)
+
+        decoded_scope = {
+            **scope,
+            "headers": [
+                (name, value)
+                for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ],
+        }
+        try:
+            await self.app(decoded_scope, inflating_receive, guarded_send)
+        except (BodyTooLarge, MalformedBody):
+            if started:
+                raise
+        if rejection and not started:
+            await rejection[0](scope, receive, send)
+
+    def _compressing(self, send: Send, encoding: str | None) -> Send:
+        if encoding is None:
+            return send
+        pending: Message | None = None
+        deflater: Deflater | None = None
+
+        async def compressing_send(message: Message) -> None:
+            nonlocal pending, deflater
+            if message["type"] == "http.response.start":
+                response_headers = Headers(raw=message["headers"])
+                content_type = response_headers.get("content-type", "")
+                if (
+                    message["status"] in (204, 304)
+                    or "content-encoding" in response_headers
+                    or content_type.startswith(PRECOMPRESSED_TYPES)
+                ):
+                    await send(message)
+                else:
+                    pending = message
+                return
+            if pending is None and deflater is None:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                if pending is not None:
+                    await send(pending)
+                    pending = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if deflater is None:
+                start, pending = pending, None
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start)
+                    await send(message)
+                    return
+                deflater = Deflater(encoding, gzip_level=self.gzip_level, zstd_level=self.zstd_level)
+                response_headers = MutableHeaders(scope=start)
+                response_headers["Content-Encoding"] = encoding
+                response_headers.add_vary_header("Accept-Encoding")
+                etag = response_headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    response_headers["ETag"] = "W/" + etag  # the encoded bytes differ from the identity ones
+                if more_body:
+                    del response_headers["Content-Length"]
+                else:
+                    body = deflater.finish(body)
+                    response_headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start)
+            chunk = deflater.compress(body) if more_body else deflater.finish(body)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        return compressing_send
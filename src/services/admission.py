@@ -0,0 +1,181 @@
+"""Adaptive admission control with priority queueing and fast load shedding."""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator
+
+from src.services.analytics import TDigest
+
+
+class Priority(IntEnum):
+    """Admission priority; lower values are dispatched first."""
+
+    high = 0
+    low = 1
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__("overloaded")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight limit with gradient limit control and CoDel-style queue shedding.
+
+    The in-flight limit follows the ratio of long-term to recent service time:
+    when requests start taking longer than the baseline the limit shrinks,
+    and while latency holds at the baseline it grows by ``sqrt(limit)``.
+    Queue delay drives shedding instead. Once per ``interval_ms`` the
+    controller checks the smallest queue delay of the interval; if even the
+    luckiest request waited longer than ``target_delay_ms`` the controller
+    is overloaded, drops waiters older than the target from the queue head
+    and sheds low-priority arrivals outright. Low-priority requests are only
+    dispatched when no high-priority request is waiting.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 32,
+        min_limit: int = 2,
+        max_limit: int = 256,
+        target_delay_ms: float = 50.0,
+        interval_ms: float = 100.0,
+        max_queue: int = 256,
+        max_wait_ms: float = 1000.0,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_delay = target_delay_ms / 1000
+        self.interval = interval_ms / 1000
+        self.max_queue = max_queue
+        self.max_wait = max_wait_ms / 1000
+        self.overloaded = False
+        self._in_flight = 0
+        self._queues: dict[Priority, deque[tuple[asyncio.Future[None], float]]] = {
+            priority: deque() for priority in Priority
+        }
+        self._interval_start = time.monotonic()
+        self._interval_min_delay = math.inf
+        self._short_rtt = 0.0
+        self._long_rtt = 0.0
+        self._queue_delay_ms = TDigest()
+        self._admitted = 0
+        self._shed = {priority: 0 for priority in Priority}
+
+    @asynccontextmanager
+    async def admit(self, priority: Priority = Priority.high) -> AsyncIterator[None]:
+        """Hold one in-flight slot for the duration of the block, or raise ``Overloaded``."""
+
+        await self._acquire(priority)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._update_limit(time.monotonic() - started)
+            self._in_flight -= 1
+            self._dispatch()
+
+    async def _acquire(self, priority: Priority) -> None:
+        now = time.monotonic()
+        if self._in_flight < int(self.limit) and not any(self._queues[p] for p in Priority if p <= priority):
+            self._in_flight += 1
+            self._admitted += 1
+            self._record_delay(0.0, now)
+            return
+
+        queue = self._queues[priority]
+        if len(queue) >= self._queue_capacity(priority) or (priority is Priority.low and self.overloaded):
+            raise self._reject(priority)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (future, now)
+        queue.append(entry)
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await future
+        except (TimeoutError, asyncio.CancelledError) as exc:
+            if future.done() and not future.cancelled():
+                # Admitted in the same tick the caller gave up; hand the slot on.
+                self._in_flight -= 1
+                self._dispatch()
+            elif entry in queue:
+                queue.remove(entry)
+            if isinstance(exc, TimeoutError):
+                raise self._reject(priority) from None
+            raise
+
+    def _dispatch(self) -> None:
+        now = time.monotonic()
+        while self._in_flight < int(self.limit):
+            priority = next((p for p in Priority if self._queues[p]), None)
+            if priority is None:
+                return
+            future, enqueued_at = self._queues[priority].popleft()
+            if future.done():
+                continue
+            if self.overloaded and now - enqueued_at > self.target_delay:
+                future.set_exception(self._reject(priority))
+                continue
+            self._in_flight += 1
+            self._admitted += 1
+            self._record_delay(now - enqueued_at, now)
+            future.set_result(None)
+
+    def _record_delay(self, delay: float, now: float) -> None:
+        self._queue_delay_ms.add(delay * 1000)
+        self._interval_min_delay = min(self._interval_min_delay, delay)
+        if now - self._interval_start < self.interval:
+            return
+
+        self.overloaded = self._interval_min_delay > self.target_delay
+        self._interval_start = now
+        self._interval_min_delay = math.inf
+
+    def _update_limit(self, rtt: float) -> None:
+        if not self._long_rtt:
+            self._short_rtt = self._long_rtt = rtt
+            return
+        self._short_rtt += 0.1 * (rtt - self._short_rtt)
+        self._long_rtt += 0.01 * (rtt - self._long_rtt)
+        if self._long_rtt > 2 * self._short_rtt:
+            # Recover the baseline quickly after a latency spike has passed.
+            self._long_rtt *= 0.95
+        if self._in_flight < self.limit / 2:
+            return  # not limit-bound, so latency says nothing about the limit
+        gradient = max(0.5, min(1.0, self._long_rtt / self._short_rtt)) if self._short_rtt else 1.0
+        target = self.limit * gradient + math.sqrt(self.limit)
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), 0.8 * self.limit + 0.2 * target))
+
+    def _queue_capacity(self, priority: Priority) -> int:
+        return self.max_queue if priority is Priority.high else self.max_queue // 2
+
+    def _reject(self, priority: Priority) -> Overloaded:
+        self._shed[priority] += 1
+        queued = sum(len(queue) for queue in self._queues.values())
+        drain_seconds = (queued + self._in_flight) * self._short_rtt / max(self.limit, 1.0)
+        return Overloaded(retry_after=max(1, math.ceil(drain_seconds)))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": float(self._in_flight),
+            "overloaded": self.overloaded,
+            "admitted": float(self._admitted),
+            "queued": {priority.name: float(len(queue)) for priority, queue in self._queues.items()},
+            "shed": {priority.name: float(count) for priority, count in self._shed.items()},
+            "queue_delay_ms": {
+                "p50": round(self._queue_delay_ms.quantile(0.5), 3),
+                "p99": round(self._queue_delay_ms.quantile(0.99), 3),
+                "max": round(self._queue_delay_ms.max, 3) if self._queue_delay_ms.count else 0.0,
+            },
+        }
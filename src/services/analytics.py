@@ -0,0 +1,339 @@
+"""Per-tenant corpus analytics folded into mergeable, time-bucketed sketches."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import time
+from collections import Counter, OrderedDict
+from typing import Any
+
+from src.models.schemas import ReverseResponse
+
+
+class TDigest:
+    """Merging t-digest for streaming quantile estimates with bounded centroids."""
+
+    def __init__(self, compression: float = 100.0) -> None:
+        self.compression = compression
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._centroids: list[tuple[float, float]] = []
+        self._buffer: list[tuple[float, float]] = []
+        self._buffer_limit = int(compression * 5)
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """Add one observation; compression runs once per buffered batch."""
+
+        self._buffer.append((value, weight))
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def merge(self, other: TDigest) -> None:
+        """Fold another digest into this one."""
+
+        if not other.count:
+            return
+        self._buffer.extend(other._centroids)
+        self._buffer.extend(other._buffer)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def quantile(self, q: float) -> float:
+        """Return the estimated value at quantile ``q`` in [0, 1]."""
+
+        self._compress()
+        if not self._centroids:
+            return 0.0
+        if len(self._centroids) == 1:
+            return self._centroids[0][0]
+
+        target = q * self.count
+        cumulative = 0.0
+        previous_mean, previous_center = self.min, 0.0
+        for mean, weight in self._centroids:
+            center = cumulative + weight / 2
+            if target <= center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_mean + (mean - previous_mean) * fraction
+            previous_mean, previous_center = mean, center
+            cumulative += weight
+
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span else 0.0
+        return previous_mean + (self.max - previous_mean) * fraction
+
+    def to_dict(self) -> dict[str, Any]:
+        self._compress()
+        return {
+            "compression": self.compression,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "centroids": [[mean, weight] for mean, weight in self._centroids],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> TDigest:
+        digest = cls(compression=float(payload["compression"]))
+        digest._centroids = [(float(mean), float(weight)) for mean, weight in payload["centroids"]]
+        digest.count = sum(weight for _, weight in digest._centroids)
+        if digest.count:
+            digest.min = float(payload["min"])
+            digest.max = float(payload["max"])
+        return digest
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        items = sorted(self._centroids + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in items)
+        merged: list[tuple[float, float]] = []
+        cumulative = 0.0
+        mean, weight = items[0]
+        for next_mean, next_weight in items[1:]:
+            q = (cumulative + weight + next_weight) / total
+            if weight + next_weight <= 4 * total * q * (1 - q) / self.compression:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                cumulative += weight
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self._centroids = merged
+
+
+class HyperLogLog:
+    """HyperLogLog distinct counter; registers merge by element-wise max."""
+
+    def __init__(self, precision: int = 12) -> None:
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add_hash(self, value: int) -> None:
+        """Add a 64-bit hash to the sketch."""
+
+        index = value >> (64 - self.precision)
+        remainder = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def merge(self, other: HyperLogLog) -> None:
+        if other.precision != self.precision:
+            raise ValueError("cannot merge HyperLogLog sketches with different precision")
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+    def estimate(self) -> int:
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0**-r for r in self._registers)
+        zeros = self._registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"precision": self.precision, "registers": self._registers.hex()}
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> HyperLogLog:
+        sketch = cls(precision=int(payload["precision"]))
+        sketch._registers = bytearray.fromhex(payload["registers"])
+        return sketch
+
+
+def text_hash(text: str) -> int:
+    """Return a process-independent 64-bit hash so sketches merge across workers."""
+
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class SketchBucket:
+    """All sketches for one tenant and one time window."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.prompt_style: Counter[str] = Counter()
+        self.task_type: Counter[str] = Counter()
+        self.temperature_estimate: Counter[str] = Counter()
+        self.constraints_detected: Counter[str] = Counter()
+        self.confidence = TDigest()
+        self.distinct_texts = HyperLogLog()
+
+    def add(self, text: str, response: ReverseResponse) -> None:
+        self.count += 1
+        self.prompt_style[response.prompt_style.value] += 1
+        self.task_type[response.task_type] += 1
+        self.temperature_estimate[response.temperature_estimate.value] += 1
+        self.constraints_detected.update(response.constraints_detected)
+        self.confidence.add(response.confidence_score)
+        self.distinct_texts.add_hash(text_hash(text))
+
+    def seal(self) -> None:
+        """Fold buffered digest entries into centroids once the window has closed."""
+
+        self.confidence._compress()
+
+    def merge(self, other: SketchBucket) -> None:
+        self.count += other.count
+        self.prompt_style.update(other.prompt_style)
+        self.task_type.update(other.task_type)
+        self.temperature_estimate.update(other.temperature_estimate)
+        self.constraints_detected.update(other.constraints_detected)
+        self.confidence.merge(other.confidence)
+        self.distinct_texts.merge(other.distinct_texts)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "prompt_style": dict(self.prompt_style),
+            "task_type": dict(self.task_type),
+            "temperature_estimate": dict(self.temperature_estimate),
+            "constraints_detected": dict(self.constraints_detected),
+            "confidence": self.confidence.to_dict(),
+            "distinct_texts": self.distinct_texts.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> SketchBucket:
+        bucket = cls()
+        bucket.count = int(payload["count"])
+        bucket.prompt_style.update(payload["prompt_style"])
+        bucket.task_type.update(payload["task_type"])
+        bucket.temperature_estimate.update(payload["temperature_estimate"])
+        bucket.constraints_detected.update(payload["constraints_detected"])
+        bucket.confidence = TDigest.from_dict(payload["confidence"])
+        bucket.distinct_texts = HyperLogLog.from_dict(payload["distinct_texts"])
+        return bucket
+
+
+class CorpusAnalytics:
+    """Bounded per-tenant store of time-bucketed sketches.
+
+    Memory is capped by ``retention_buckets`` windows per tenant,
+    ``max_tenants`` tenants (least recently updated tenants are dropped) and
+    ``max_buckets`` windows in total (0 for no cap), which drops the oldest
+    windows of the least recently updated tenants first. Tenants whose
+    buckets changed are kept for ``take_dirty`` so a worker can publish them.
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, bucket_seconds: int, retention_buckets: int, max_tenants: int, max_buckets: int = 0) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.retention_buckets = retention_buckets
+        self.max_tenants = max_tenants
+        self.max_buckets = max_buckets
+        self._tenants: OrderedDict[str, OrderedDict[int, SketchBucket]] = OrderedDict()
+        self._buckets = 0
+        self._dirty: set[str] = set()
+
+    def record(self, tenant: str, text: str, response: ReverseResponse, now: float | None = None) -> None:
+        """Fold one response into the tenant's current time bucket."""
+
+        start = self._bucket_start(time.time() if now is None else now)
+        buckets = self._tenants.get(tenant)
+        if buckets is None:
+            buckets = self._tenants[tenant] = OrderedDict()
+            while len(self._tenants) > self.max_tenants:
+                evicted, dropped = self._tenants.popitem(last=False)
+                self._buckets -= len(dropped)
+                self._dirty.add(evicted)
+        else:
+            self._tenants.move_to_end(tenant)
+
+        bucket = buckets.get(start)
+        if bucket is None:
+            if buckets:
+                next(reversed(buckets.values())).seal()
+            bucket = buckets[start] = SketchBucket()
+            self._buckets += 1
+            while len(buckets) > self.retention_buckets:
+                buckets.popitem(last=False)
+                self._buckets -= 1
+            self._enforce_bucket_cap()
+        bucket.add(text, response)
+        self._dirty.add(tenant)
+
+    def take_dirty(self) -> set[str]:
+        """Return the tenants changed since the last call and forget them."""
+
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def stats(self) -> dict[str, float]:
+        return {"tenants": float(len(self._tenants)), "buckets": float(self._buckets)}
+
+    def query(self, tenant: str, since: float | None = None, until: float | None = None) -> dict[str, Any]:
+        """Merge every bucket of ``tenant`` overlapping ``[since, until)`` into one summary."""
+
+        merged = self.merged(tenant, since, until)
+        return {
+            "tenant": tenant,
+            "total": merged.count,
+            "prompt_style": dict(merged.prompt_style),
+            "task_type": dict(merged.task_type),
+            "temperature_estimate": dict(merged.temperature_estimate),
+            "constraints_detected": dict(merged.constraints_detected),
+            "confidence_quantiles": {
+                f"p{round(q * 100)}": round(merged.confidence.quantile(q), 4) if merged.count else 0.0
+                for q in self.QUANTILES
+            },
+            "distinct_texts": merged.distinct_texts.estimate() if merged.count else 0,
+        }
+
+    def merged(self, tenant: str, since: float | None = None, until: float | None = None) -> SketchBucket:
+        """Return one sketch merged across the selected windows."""
+
+        merged = SketchBucket()
+        for start, bucket in self._tenants.get(tenant, {}).items():
+            if since is not None and start + self.bucket_seconds <= since:
+                continue
+            if until is not None and start >= until:
+                continue
+            merged.merge(bucket)
+        return merged
+
+    def export(self, tenant: str) -> dict[str, Any]:
+        """Serialize a tenant's buckets so another worker can ``absorb`` them."""
+
+        return {str(start): bucket.to_dict() for start, bucket in self._tenants.get(tenant, {}).items()}
+
+    def absorb(self, tenant: str, exported: dict[str, Any]) -> None:
+        """Merge buckets exported by another worker into this store."""
+
+        buckets = self._tenants.setdefault(tenant, OrderedDict())
+        self._buckets -= len(buckets)
+        for start, payload in exported.items():
+            incoming = SketchBucket.from_dict(payload)
+            existing = buckets.get(int(start))
+            if existing is None:
+                buckets[int(start)] = incoming
+            else:
+                existing.merge(incoming)
+        ordered = sorted(buckets.items())[-self.retention_buckets :]
+        self._tenants[tenant] = OrderedDict(ordered)
+        self._tenants.move_to_end(tenant)
+        self._buckets += len(ordered)
+        self._enforce_bucket_cap()
+
+    def _enforce_bucket_cap(self) -> None:
+        while self.max_buckets and self._buckets > self.max_buckets:
+            tenant, buckets = next(iter(self._tenants.items()))
+            buckets.popitem(last=False)
+            self._buckets -= 1
+            self._dirty.add(tenant)
+            if not buckets:
+                del self._tenants[tenant]
+
+    def _bucket_start(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds) * self.bucket_seconds
@@ -35,3 +35,6 @@ class TTLCache(Generic[T]):
         self._store.move_to_end(key)
         while len(self._store) > self.max_entries:
             self._store.popitem(last=False)
+
+    def clear(self) -> None:
+        self._store.clear()
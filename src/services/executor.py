@@ -0,0 +1,138 @@
+"""Cost-aware execution of CPU-bound analysis off the event loop."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from src.services.analytics import TDigest
+
+T = TypeVar("T")
+
+
+def _timed(func: Callable[..., T], *args: Any) -> tuple[T, float]:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+class AdaptiveExecutor:
+    """Run a call inline, on a thread pool or on a process pool depending on its predicted cost.
+
+    Cost is predicted from input size with a running estimate of milliseconds
+    per character, refreshed from every measured call. Calls predicted under
+    ``inline_budget_ms`` run on the event loop, where a pool hop would cost
+    more than it saves. Larger calls go to a thread pool, which shares the
+    service objects and needs no pickling. The process pool is only used
+    when ``process_workers`` is set and the predicted cost reaches
+    ``process_min_cost_ms``, so pickling the input and result is a small
+    fraction of the work.
+    """
+
+    def __init__(
+        self,
+        inline_budget_ms: float = 1.0,
+        thread_workers: int = 4,
+        process_workers: int = 0,
+        process_min_cost_ms: float = 50.0,
+        initial_ms_per_char: float = 0.0002,
+    ) -> None:
+        self.inline_budget_ms = inline_budget_ms
+        self.process_min_cost_ms = process_min_cost_ms
+        self.ms_per_char = initial_ms_per_char
+        self._threads = ThreadPoolExecutor(thread_workers, thread_name_prefix="analysis") if thread_workers else None
+        self._processes = ProcessPoolExecutor(process_workers) if process_workers else None
+        self._runs = {"inline": 0, "thread": 0, "process": 0}
+
+    def estimate_ms(self, size: int) -> float:
+        return self.ms_per_char * size
+
+    def choose(self, size: int) -> str:
+        """Return ``inline``, ``thread`` or ``process`` for an input of ``size`` characters."""
+
+        cost = self.estimate_ms(size)
+        if self._processes is not None and cost >= self.process_min_cost_ms:
+            return "process"
+        if self._threads is not None and cost >= self.inline_budget_ms:
+            return "thread"
+        return "inline"
+
+    async def run(
+        self,
+        func: Callable[..., T],
+        size: int,
+        *args: Any,
+        process_func: Callable[..., T] | None = None,
+    ) -> T:
+        """Run ``func(*args)``; ``process_func`` is a picklable equivalent used on the process pool."""
+
+        where = self.choose(size)
+        if where == "process" and process_func is None:
+            where = "thread" if self._threads is not None else "inline"
+        self._runs[where] += 1
+
+        if where == "inline":
+            result, elapsed_ms = _timed(func, *args)
+        else:
+            pool: Executor = self._processes if where == "process" else self._threads  # type: ignore[assignment]
+            target = process_func if where == "process" else func
+            result, elapsed_ms = await asyncio.get_running_loop().run_in_executor(pool, _timed, target, *args)
+        if size:
+            self.ms_per_char += 0.1 * (elapsed_ms / size - self.ms_per_char)
+        return result
+
+    def shutdown(self) -> None:
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "ms_per_char": round(self.ms_per_char, 6),
+            **{f"runs_{where}": float(count) for where, count in self._runs.items()},
+        }
+
+
+class LoopLagMonitor:
+    """Measure event-loop lag as the overshoot of a periodic sleep."""
+
+    def __init__(self, interval_ms: float = 100.0) -> None:
+        self.interval = interval_ms / 1000
+        self._lag_ms = TDigest()
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self._lag_ms.add(max(0.0, (time.perf_counter() - expected) * 1000))
+
+    def stats(self) -> dict[str, float]:
+        return lag_stats(self._lag_ms)
+
+    def export(self) -> dict[str, Any]:
+        return self._lag_ms.to_dict()
+
+
+def lag_stats(lag_ms: TDigest) -> dict[str, float]:
+    return {
+        "samples": lag_ms.count,
+        "p50_ms": round(lag_ms.quantile(0.5), 3),
+        "p99_ms": round(lag_ms.quantile(0.99), 3),
+        "max_ms": round(lag_ms.max, 3) if lag_ms.count else 0.0,
+    }
@@ -0,0 +1,188 @@
+"""Per-tenant weighted fair scheduling of analysis work."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+from src.services.admission import Overloaded
+from src.services.analytics import TDigest
+
+DEFAULT_PLAN_WEIGHTS = {"free": 1.0, "pro": 4.0, "enterprise": 8.0}
+DEFAULT_PLAN_CONCURRENCY = {"free": 4, "pro": 8, "enterprise": 16}
+
+
+@dataclass(slots=True)
+class _Tenant:
+    plan: str
+    weight: float
+    cap: int
+    queue: deque[tuple[asyncio.Future[None], int, float]] = field(default_factory=deque)
+    deficit: float = 0.0
+    running: int = 0
+    dispatched: int = 0
+    rejected: int = 0
+    wait_ms: TDigest = field(default_factory=TDigest)
+
+
+class FairScheduler:
+    """Deficit round robin across tenant queues, with per-plan weights and concurrency caps.
+
+    Every call waits in its tenant's queue for one of ``concurrency`` slots.
+    Tenants with queued work take turns; each turn a tenant may dispatch
+    calls while its deficit covers their cost in characters, and a tenant
+    that cannot afford its next call earns ``quantum_chars`` times its plan
+    weight and yields its turn. A tenant flooding its queue therefore only
+    delays others by its weighted share. Tenants at their plan's
+    concurrency cap are skipped, and a tenant with ``max_queue_per_tenant``
+    calls already waiting is rejected with ``Overloaded``.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 16,
+        plan_weights: dict[str, float] | None = None,
+        plan_concurrency: dict[str, int] | None = None,
+        tenant_plans: dict[str, str] | None = None,
+        default_plan: str = "free",
+        quantum_chars: int = 4000,
+        max_queue_per_tenant: int = 64,
+        max_tenants: int = 1000,
+    ) -> None:
+        self.plan_weights = DEFAULT_PLAN_WEIGHTS if plan_weights is None else plan_weights
+        self.plan_concurrency = DEFAULT_PLAN_CONCURRENCY if plan_concurrency is None else plan_concurrency
+        self.tenant_plans = tenant_plans or {}
+        unknown = ({default_plan} | set(self.tenant_plans.values())) - (
+            self.plan_weights.keys() & self.plan_concurrency.keys()
+        )
+        if unknown:
+            raise ValueError(f"plans without a weight and concurrency cap: {sorted(unknown)}")
+        self.concurrency = concurrency
+        self.default_plan = default_plan
+        self.quantum = quantum_chars
+        self.max_queue_per_tenant = max_queue_per_tenant
+        self.max_tenants = max_tenants
+        self._tenants: OrderedDict[str, _Tenant] = OrderedDict()
+        self._active: deque[str] = deque()
+        self._running = 0
+
+    def plan_for(self, tenant: str) -> str:
+        return self.tenant_plans.get(tenant, self.default_plan)
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, cost: int) -> AsyncIterator[None]:
+        """Hold one scheduling slot for ``tenant`` for the duration of the block."""
+
+        state = await self._acquire(tenant, max(1, cost))
+        try:
+            yield
+        finally:
+            state.running -= 1
+            self._running -= 1
+            self._dispatch()
+
+    async def _acquire(self, tenant: str, cost: int) -> _Tenant:
+        state = self._tenant(tenant)
+        if len(state.queue) >= self.max_queue_per_tenant:
+            state.rejected += 1
+            raise Overloaded(retry_after=1)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (future, cost, time.monotonic())
+        state.queue.append(entry)
+        if len(state.queue) == 1:
+            self._active.append(tenant)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Dispatched in the same tick the caller gave up; hand the slot on.
+                state.running -= 1
+                self._running -= 1
+                self._dispatch()
+            elif entry in state.queue:
+                state.queue.remove(entry)
+                if not state.queue:
+                    self._deactivate(tenant)
+            raise
+        return state
+
+    def _dispatch(self) -> None:
+        skipped = 0
+        while self._running < self.concurrency and self._active and skipped < len(self._active):
+            name = self._active[0]
+            state = self._tenants[name]
+            if state.running >= state.cap:
+                self._active.rotate(-1)
+                skipped += 1
+                continue
+            skipped = 0
+            future, cost, enqueued_at = state.queue[0]
+            if future.done():  # cancelled while queued
+                state.queue.popleft()
+                if not state.queue:
+                    self._deactivate(name)
+                continue
+            if state.deficit < cost:
+                state.deficit += self.quantum * state.weight
+                self._active.rotate(-1)
+                continue
+
+            state.queue.popleft()
+            state.deficit -= cost
+            state.running += 1
+            state.dispatched += 1
+            self._running += 1
+            state.wait_ms.add((time.monotonic() - enqueued_at) * 1000)
+            future.set_result(None)
+            if not state.queue:
+                self._deactivate(name)
+
+    def _deactivate(self, tenant: str) -> None:
+        self._active.remove(tenant)
+        self._tenants[tenant].deficit = 0.0
+
+    def _tenant(self, tenant: str) -> _Tenant:
+        state = self._tenants.get(tenant)
+        if state is None:
+            plan = self.plan_for(tenant)
+            state = _Tenant(plan, self.plan_weights[plan], self.plan_concurrency[plan])
+            self._tenants[tenant] = state
+            self._evict_idle()
+        else:
+            self._tenants.move_to_end(tenant)
+        return state
+
+    def _evict_idle(self) -> None:
+        """Forget the least recently seen idle tenants beyond ``max_tenants``, never the newest."""
+
+        for name in list(self._tenants)[:-1]:
+            if len(self._tenants) <= self.max_tenants:
+                return
+            state = self._tenants[name]
+            if not state.queue and not state.running:
+                del self._tenants[name]
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "concurrency": float(self.concurrency),
+            "running": float(self._running),
+            "queued": float(sum(len(state.queue) for state in self._tenants.values())),
+            "tenants": {
+                name: {
+                    "plan": state.plan,
+                    "queued": float(len(state.queue)),
+                    "running": float(state.running),
+                    "dispatched": float(state.dispatched),
+                    "rejected": float(state.rejected),
+                    "wait_p50_ms": round(state.wait_ms.quantile(0.5), 3),
+                    "wait_p99_ms": round(state.wait_ms.quantile(0.99), 3),
+                }
+                for name, state in self._tenants.items()
+            },
+        }
@@ -0,0 +1,488 @@
+"""Disk-spooled analysis jobs with a SQLite-backed queue that survives restarts."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from pydantic import ValidationError
+
+from src.models.schemas import ReverseRequest, ReverseResponse
+from src.services.admission import Overloaded
+from src.services.reverse_engineering_service import ReverseEngineeringService
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bytes of input lines read per disk read while a job runs.
+READ_AHEAD_BYTES = 1 << 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    processed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    input_offset INTEGER NOT NULL DEFAULT 0,
+    output_offset INTEGER NOT NULL DEFAULT 0,
+    lease_until REAL NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_chunks (
+    job_id TEXT NOT NULL,
+    first_line INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    PRIMARY KEY (job_id, first_line)
+);
+"""
+
+
+class JobTooLarge(ValueError):
+    """Raised when an uploaded job exceeds the configured size limit."""
+
+
+class LeaseLost(RuntimeError):
+    """Raised when another worker has claimed a job after this worker's lease expired."""
+
+
+@dataclass(slots=True)
+class _Lease:
+    job_id: str
+    until: float
+    lost: bool = False
+
+
+class JobStore:
+    """SQLite job table plus the byte offset of every gzip member in each result file.
+
+    Workers claim queued jobs, or running jobs whose lease expired, so a job
+    left behind by a crashed or restarted worker is picked up again from
+    its last checkpoint. Writes by a lease holder are conditional on
+    ``lease_until`` still being the value it last set, and raise
+    ``LeaseLost`` once another worker has claimed the job.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def create(self, job_id: str, tenant: str, total: int) -> None:
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO jobs (id, tenant, status, total, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, tenant, total, now, now),
+        )
+
+    def get(self, job_id: str) -> dict[str, Any] | None:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def claim(self, lease_seconds: float) -> dict[str, Any] | None:
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', lease_until = ?, updated_at = ? WHERE id = ?",
+                    (now + lease_seconds, now, row["id"]),
+                )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return {**row, "status": "running", "lease_until": now + lease_seconds} if row else None
+
+    def renew(self, job_id: str, lease_until: float, lease_seconds: float) -> float:
+        """Extend a lease this worker still holds and return its new expiry."""
+
+        now = time.time()
+        renewed = self._db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running' AND lease_until = ?",
+            (now + lease_seconds, job_id, lease_until),
+        )
+        if not renewed.rowcount:
+            raise LeaseLost(job_id)
+        return now + lease_seconds
+
+    def checkpoint(
+        self,
+        job_id: str,
+        first_line: int,
+        chunk_offset: int,
+        processed: int,
+        failed: int,
+        input_offset: int,
+        output_offset: int,
+        lease_until: float,
+        lease_seconds: float,
+    ) -> float:
+        """Record a flushed chunk and the job's progress, renewing the lease; returns its new expiry."""
+
+        now = time.time()
+        with self._db:
+            self._db.execute("BEGIN")
+            updated = self._db.execute(
+                "UPDATE jobs SET processed = ?, failed = ?, input_offset = ?, output_offset = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ? AND status = 'running' AND lease_until = ?",
+                (processed, failed, input_offset, output_offset, now + lease_seconds, now, job_id, lease_until),
+            )
+            if not updated.rowcount:
+                raise LeaseLost(job_id)  # rolls back
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_chunks (job_id, first_line, byte_offset) VALUES (?, ?, ?)",
+                (job_id, first_line, chunk_offset),
+            )
+        return now + lease_seconds
+
+    def finish(self, job_id: str, status: str, lease_until: float, error: str | None = None) -> None:
+        finished = self._db.execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_until = 0, updated_at = ? "
+            "WHERE id = ? AND status = 'running' AND lease_until = ?",
+            (status, error, time.time(), job_id, lease_until),
+        )
+        if not finished.rowcount:
+            raise LeaseLost(job_id)
+
+    def purge(self, before: float) -> list[str]:
+        """Delete completed and failed jobs last updated before ``before``; returns their ids."""
+
+        with self._db:
+            self._db.execute("BEGIN")
+            expired = [
+                row["id"]
+                for row in self._db.execute(
+                    "SELECT id FROM jobs WHERE status IN ('completed', 'failed') AND updated_at < ?", (before,)
+                )
+            ]
+            self._db.executemany("DELETE FROM job_chunks WHERE job_id = ?", [(job_id,) for job_id in expired])
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in expired])
+        return expired
+
+    def chunk_for_line(self, job_id: str, line: int) -> tuple[int, int] | None:
+        row = self._db.execute(
+            "SELECT first_line, byte_offset FROM job_chunks WHERE job_id = ? AND first_line <= ? "
+            "ORDER BY first_line DESC LIMIT 1",
+            (job_id, line),
+        ).fetchone()
+        return (row["first_line"], row["byte_offset"]) if row else None
+
+
+class JobRunner:
+    """Spool JSONL uploads to disk and analyze them with a pool of background workers.
+
+    Each input line is a ``ReverseRequest`` object. Results are appended to a
+    gzip JSONL file one gzip member per checkpoint, so a resumed job
+    truncates the file back to its last checkpoint and appends; readers can
+    seek straight to the member holding a given line. A worker renews its
+    lease every third of ``lease_seconds`` while it runs a job, and before
+    each write to the result file confirms it still holds it; a worker that
+    lost its job to another stops without touching it. ``scheduled`` wraps each
+    line's analysis, so jobs share the fair scheduler with interactive calls;
+    a line turned away because its tenant's queue is full waits out the
+    ``Retry-After`` and queues again, so a busy tenant slows its jobs down
+    rather than failing them.
+
+    SQLite calls run on one dedicated thread, which also keeps the shared
+    connection's transactions apart, and file reads and writes run in worker
+    threads, so neither blocks the event loop. A job's input is deleted once
+    it finishes; with ``retention_seconds`` set, finished jobs and their
+    results are deleted that long after they finished.
+    """
+
+    SWEEP_SECONDS = 60.0
+
+    def __init__(
+        self,
+        service: ReverseEngineeringService,
+        directory: Path | str,
+        workers: int = 2,
+        checkpoint_lines: int = 500,
+        lease_seconds: float = 60.0,
+        poll_seconds: float = 1.0,
+        observe: Callable[[str, str, ReverseResponse], None] | None = None,
+        scheduled: Callable[[str, int], AbstractAsyncContextManager[None]] | None = None,
+        retention_seconds: float = 0.0,
+    ) -> None:
+        self.service = service
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.store = JobStore(self.directory / "jobs.sqlite3")
+        self.workers = workers
+        self.checkpoint_lines = checkpoint_lines
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.observe = observe
+        self.scheduled = scheduled
+        self.retention_seconds = retention_seconds
+        self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+        self._swept_at = 0.0
+        self._wakeup: asyncio.Event | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def reopen(self) -> None:
+        """Open a fresh SQLite connection; a forked worker must not reuse its parent's."""
+
+        self.store = JobStore(self.directory / "jobs.sqlite3")
+        self._db_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jobs-db")
+
+    async def _store(self, method: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a ``JobStore`` call on the store's thread."""
+
+        return await asyncio.get_running_loop().run_in_executor(self._db_thread, partial(method, *args, **kwargs))
+
+    def input_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.input.jsonl"
+
+    def results_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.results.jsonl.gz"
+
+    async def submit(self, chunks: AsyncIterator[bytes], tenant: str, max_bytes: int) -> str:
+        """Stream an upload to disk, queue it and return the job id."""
+
+        job_id = uuid.uuid4().hex
+        path = self.input_path(job_id)
+        size = total = 0
+        open_line = False  # the partial line carried over from the previous chunk has content
+        try:
+            with path.open("wb") as spool:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise JobTooLarge(f"upload exceeds {max_bytes} bytes")
+                    await asyncio.to_thread(spool.write, chunk)
+                    *complete, partial = chunk.split(b"\n")
+                    for line in complete:
+                        total += open_line or bool(line.strip())
+                        open_line = False
+                    open_line = open_line or bool(partial.strip())
+            total += open_line
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+
+        await self._store(self.store.create, job_id, tenant, total)
+        self.ensure_started()
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def status(self, job_id: str) -> dict[str, Any] | None:
+        return await self._store(self.store.get, job_id)
+
+    async def page(self, job_id: str, offset: int, limit: int) -> list[dict[str, Any]]:
+        """Return up to ``limit`` checkpointed result lines starting at line ``offset``."""
+
+        chunk = await self._store(self.store.chunk_for_line, job_id, offset)
+        if chunk is None:
+            return []
+        return await asyncio.to_thread(self._read_page, job_id, *chunk, offset, limit)
+
+    def _read_page(
+        self, job_id: str, first_line: int, byte_offset: int, offset: int, limit: int
+    ) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        with self.results_path(job_id).open("rb") as raw:
+            raw.seek(byte_offset)
+            with gzip.GzipFile(fileobj=raw, mode="rb") as results:
+                try:
+                    for index, line in enumerate(results, start=first_line):
+                        if index < offset:
+                            continue
+                        items.append(json.loads(line))
+                        if len(items) >= limit:
+                            break
+                except EOFError:
+                    pass  # a member still being written by another process
+        return items
+
+    def ensure_started(self) -> None:
+        """Start the worker tasks on the running loop if they are not running yet."""
+
+        self._tasks = [task for task in self._tasks if not task.done()]
+        if self._tasks:
+            return
+        self._wakeup = wakeup = asyncio.Event()
+        self._tasks = [asyncio.get_running_loop().create_task(self._worker(wakeup)) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def run_next(self) -> bool:
+        """Claim and run one job to completion; return False when nothing is queued."""
+
+        job = await self._store(self.store.claim, self.lease_seconds)
+        if job is None:
+            return False
+        lease = _Lease(job["id"], job["lease_until"])
+        keeper = asyncio.get_running_loop().create_task(self._keep_lease(lease))
+        try:
+            await self._process(job, lease)
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost:
+            logger.warning("Job lease lost to another worker", extra={"job_id": job["id"]})
+        except Exception as exc:  # a broken job must not take the worker down
+            logger.exception("Job failed", extra={"job_id": job["id"]})
+            try:
+                await self._store(self.store.finish, job["id"], "failed", lease.until, error=str(exc))
+                await asyncio.to_thread(self.input_path(job["id"]).unlink, missing_ok=True)
+            except LeaseLost:
+                pass
+        finally:
+            keeper.cancel()
+        return True
+
+    async def _keep_lease(self, lease: _Lease) -> None:
+        if self.lease_seconds <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                lease.until = await self._store(self.store.renew, lease.job_id, lease.until, self.lease_seconds)
+            except LeaseLost:
+                lease.lost = True
+                return
+
+    async def _worker(self, wakeup: asyncio.Event) -> None:
+        while True:
+            if await self.run_next():
+                continue
+            if self.retention_seconds and time.monotonic() - self._swept_at >= self.SWEEP_SECONDS:
+                self._swept_at = time.monotonic()
+                try:
+                    await self.sweep()
+                except Exception:  # a failed sweep is retried at the next one
+                    logger.exception("Job sweep failed")
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def sweep(self, now: float | None = None) -> int:
+        """Delete finished jobs older than ``retention_seconds`` and their files; returns how many."""
+
+        if not self.retention_seconds:
+            return 0
+        before = (time.time() if now is None else now) - self.retention_seconds
+        expired = await self._store(self.store.purge, before)
+        for job_id in expired:
+            await asyncio.to_thread(self._remove_files, job_id)
+        return len(expired)
+
+    def _remove_files(self, job_id: str) -> None:
+        self.input_path(job_id).unlink(missing_ok=True)
+        self.results_path(job_id).unlink(missing_ok=True)
+
+    async def _process(self, job: dict[str, Any], lease: _Lease) -> None:
+        job_id = job["id"]
+        line_no, failed = job["processed"], job["failed"]
+        output_path = self.results_path(job_id)
+        with output_path.open("ab") as output:
+            output.truncate(job["output_offset"])
+
+        batch: list[bytes] = []
+        input_offset = job["input_offset"]
+        with self.input_path(job_id).open("rb") as source:
+            source.seek(input_offset)
+            while lines := await asyncio.to_thread(source.readlines, READ_AHEAD_BYTES):
+                for raw in lines:
+                    input_offset += len(raw)
+                    if lease.lost:
+                        raise LeaseLost(job_id)
+                    if not raw.strip():
+                        continue
+                    item = await self._analyze_line(line_no, raw, job["tenant"])
+                    failed += "error" in item
+                    batch.append(json.dumps(item).encode() + b"\n")
+                    line_no += 1
+                    if len(batch) >= self.checkpoint_lines:
+                        await self._flush(lease, batch, line_no, failed, input_offset)
+                        batch = []
+                    await asyncio.sleep(0)
+            if batch:
+                await self._flush(lease, batch, line_no, failed, input_offset)
+        await self._store(self.store.finish, job_id, "completed", lease.until)
+        await asyncio.to_thread(self.input_path(job_id).unlink, missing_ok=True)
+
+    async def _analyze_line(self, line_no: int, raw: bytes, tenant: str) -> dict[str, Any]:
+        try:
+            request = ReverseRequest.model_validate_json(raw)
+        except ValidationError as exc:
+            return {"line": line_no, "error": f"validation_error: {exc.errors()[0]['msg']}"}
+        while True:
+            slot = self.scheduled(tenant, len(request.output_text)) if self.scheduled is not None else None
+            try:
+                result = await self.service.reverse(
+                    request.output_text, request.mode, request.deadline_ms, request.include_trace, slot=slot
+                )
+                break
+            except Overloaded as exc:
+                await asyncio.sleep(exc.retry_after)
+            except Exception as exc:  # one bad line must not fail the job
+                logger.exception("Job line failed", extra={"line": line_no})
+                return {"line": line_no, "error": f"analysis_failed: {type(exc).__name__}"}
+        if self.observe is not None:
+            self.observe(tenant, request.output_text, result)
+        return {"line": line_no, "result": result.model_dump(mode="json")}
+
+    async def _flush(self, lease: _Lease, batch: list[bytes], line_no: int, failed: int, input_offset: int) -> None:
+        lease.until = await self._store(self.store.renew, lease.job_id, lease.until, self.lease_seconds)
+        chunk_offset, output_offset = await asyncio.to_thread(
+            self._append_member, self.results_path(lease.job_id), b"".join(batch)
+        )
+        lease.until = await self._store(
+            self.store.checkpoint,
+            lease.job_id,
+            first_line=line_no - len(batch),
+            chunk_offset=chunk_offset,
+            processed=line_no,
+            failed=failed,
+            input_offset=input_offset,
+            output_offset=output_offset,
+            lease_until=lease.until,
+            lease_seconds=self.lease_seconds,
+        )
+
+    @staticmethod
+    def _append_member(path: Path, data: bytes) -> tuple[int, int]:
+        """Append ``data`` as one gzip member and fsync; returns the member's start and end offsets."""
+
+        with path.open("ab") as output:
+            chunk_offset = output.tell()
+            with gzip.GzipFile(fileobj=output, mode="wb") as member:
+                member.write(data)
+            output.flush()
+            os.fsync(output.fileno())
+            return chunk_offset, output.tell()
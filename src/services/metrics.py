@@ -4,28 +4,61 @@ from __future__ import annotations
 
 import time
 from collections import defaultdict
+from typing import Any, Iterable
+
+from src.services.analytics import TDigest
 
 
 class MetricsRegistry:
-    """Simple metrics registry for observability."""
+    """Simple metrics registry for observability.
+
+    Durations go into a t-digest per endpoint, so memory stays bounded and
+    registries exported by several worker processes merge exactly.
+    """
 
     def __init__(self) -> None:
         self._counts: dict[str, int] = defaultdict(int)
-        self._durations_ms: dict[str, list[float]] = defaultdict(list)
+        self._total_ms: dict[str, float] = defaultdict(float)
+        self._durations_ms: dict[str, TDigest] = defaultdict(TDigest)
 
     def track(self, endpoint: str, started_at: float) -> float:
         elapsed = (time.perf_counter() - started_at) * 1000
         self._counts[endpoint] += 1
-        self._durations_ms[endpoint].append(elapsed)
+        self._total_ms[endpoint] += elapsed
+        self._durations_ms[endpoint].add(elapsed)
         return elapsed
 
     def snapshot(self) -> dict[str, dict[str, float]]:
         return {
             endpoint: {
                 "count": float(count),
-                "avg_ms": (sum(self._durations_ms[endpoint]) / len(self._durations_ms[endpoint]))
-                if self._durations_ms[endpoint]
-                else 0.0,
+                "avg_ms": self._total_ms[endpoint] / count if count else 0.0,
+                "p50_ms": round(self._durations_ms[endpoint].quantile(0.5), 3),
+                "p99_ms": round(self._durations_ms[endpoint].quantile(0.99), 3),
             }
             for endpoint, count in self._counts.items()
         }
+
+    def export(self) -> dict[str, dict[str, Any]]:
+        """Return a JSON-serializable copy of every counter and histogram."""
+
+        return {
+            endpoint: {
+                "count": count,
+                "total_ms": self._total_ms[endpoint],
+                "durations_ms": self._durations_ms[endpoint].to_dict(),
+            }
+            for endpoint, count in self._counts.items()
+        }
+
+    @classmethod
+    def merged(cls, exports: Iterable[dict[str, dict[str, Any]]]) -> MetricsRegistry:
+        """Build one registry from several ``export()`` payloads."""
+
+        registry = cls()
+        for export in exports:
+            for endpoint, values in export.items():
+                registry._counts[endpoint] += values["count"]
+                registry._total_ms[endpoint] += values["total_ms"]
+                registry._durations_ms[endpoint].merge(TDigest.from_dict(values["durations_ms"]))
+        return registry
@@ -0,0 +1,161 @@
+"""Dynamic micro-batching of concurrent single analyses."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from src.services.analytics import TDigest
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+@dataclass(slots=True)
+class _Pending(Generic[T, R]):
+    item: T
+    future: asyncio.Future[R]
+    enqueued_at: float
+
+
+class MicroBatcher(Generic[T, R]):
+    """Gather concurrent calls into batches and hand each caller its own result.
+
+    Up to ``max_inflight`` batches run at once. While a slot is free, queued
+    calls are dispatched at once, so an idle server adds no wait. Under
+    load, calls queue behind running batches and the next batch takes up to
+    ``max_batch`` of them. Once recent batches hold more than one call, a
+    free slot also lingers, for at most ``max_wait_ms``, until as many calls
+    are queued as the recent mean batch size. The linger is shortened to
+    the time the current arrival rate needs to reach that size.
+    ``run_batch`` receives the items in arrival order and returns one result
+    or exception per item.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list[T]], Awaitable[list[R | BaseException]]],
+        max_batch: int = 32,
+        max_wait_ms: float = 1.0,
+        max_inflight: int = 4,
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.max_inflight = max(1, max_inflight)
+        self._queue: deque[_Pending[T, R]] = deque()
+        self._inflight = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._load = 1.0  # moving average of batch size
+        self._interarrival_ms = 1000.0
+        self._last_arrival = 0.0
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = TDigest()
+        self.queue_wait_ms = TDigest()
+
+    def limit_to(self, concurrent_calls: int) -> None:
+        """Fit batches to an upstream limit of ``concurrent_calls``, such as fair-scheduler slots.
+
+        Only that many calls can be waiting here at once, so a larger
+        ``max_batch`` would never fill; batches are capped at the limit and
+        only as many run at once as the limit fills.
+        """
+
+        self.max_batch = max(1, min(self.max_batch, concurrent_calls))
+        self.max_inflight = max(1, min(self.max_inflight, concurrent_calls // self.max_batch))
+
+    async def submit(self, item: T) -> R:
+        now = time.perf_counter()
+        if self._last_arrival:
+            self._interarrival_ms += 0.1 * ((now - self._last_arrival) * 1000 - self._interarrival_ms)
+        self._last_arrival = now
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        pending = _Pending(item, future, now)
+        if not self._queue and self._inflight < self.max_inflight and self._load < 2:
+            # Idle: run as a batch of one in the caller's task, without a task hop.
+            self._inflight += 1
+            await self._run([pending])
+            return future.result()
+        self._queue.append(pending)
+        self._dispatch()
+        return await future
+
+    def window_ms(self) -> float:
+        """How long a free slot waits for more calls; zero unless recent batches were shared."""
+
+        target = min(self.max_batch, round(self._load))
+        if target < 2 or len(self._queue) >= target:
+            return 0.0
+        return min(self.max_wait_ms, self._interarrival_ms * (target - len(self._queue)))
+
+    def _dispatch(self, linger: bool = True) -> None:
+        while self._queue and self._inflight < self.max_inflight:
+            window = self.window_ms() if linger else 0.0
+            if window > 0:
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().call_later(window / 1000, self._flush)
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            batch = []
+            while self._queue and len(batch) < self.max_batch:
+                pending = self._queue.popleft()
+                if not pending.future.done():  # skip callers that gave up while queued
+                    batch.append(pending)
+            if not batch:
+                continue
+            self._inflight += 1
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _flush(self) -> None:
+        self._timer = None
+        self._dispatch(linger=False)
+
+    async def _run(self, batch: list[_Pending[T, R]]) -> None:
+        started = time.perf_counter()
+        for pending in batch:
+            self.queue_wait_ms.add((started - pending.enqueued_at) * 1000)
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes.add(len(batch))
+        self._load += 0.2 * (len(batch) - self._load)
+        try:
+            outcomes = await self.run_batch([pending.item for pending in batch])
+        except asyncio.CancelledError:
+            for pending in batch:
+                pending.future.cancel()
+            raise
+        except Exception as exc:
+            outcomes = [exc] * len(batch)
+        finally:
+            self._inflight -= 1
+            self._dispatch()
+        for pending, outcome in zip(batch, outcomes):
+            if pending.future.done():
+                continue
+            if isinstance(outcome, BaseException):
+                pending.future.set_exception(outcome)
+            else:
+                pending.future.set_result(outcome)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "batches": float(self.batches),
+            "items": float(self.items),
+            "queued": float(len(self._queue)),
+            "inflight": float(self._inflight),
+            "mean_batch_size": round(self.items / self.batches, 3) if self.batches else 0.0,
+            "batch_size_p50": round(self.batch_sizes.quantile(0.5), 3),
+            "batch_size_p99": round(self.batch_sizes.quantile(0.99), 3),
+            "queue_wait_p50_ms": round(self.queue_wait_ms.quantile(0.5), 3),
+            "queue_wait_p99_ms": round(self.queue_wait_ms.quantile(0.99), 3),
+            "window_ms": round(self.window_ms(), 3),
+        }
@@ -0,0 +1,225 @@
+"""Approximate result cache keyed by SimHash fingerprints of the input text."""
+
+from __future__ import annotations
+
+import random
+import re
+import struct
+import zlib
+from collections import OrderedDict
+from itertools import islice
+
+from src.models.schemas import ReverseResponse
+
+_TOKEN_RE = re.compile(r"\w+")
+_FINGERPRINT_BITS = 64
+_FINGERPRINT_MASK = (1 << _FINGERPRINT_BITS) - 1
+_LANE_BITS = 32
+_MIX = 0x9E3779B97F4A7C15
+_LANES = struct.Struct(f"<{_FINGERPRINT_BITS}I")
+
+
+def _build_spread_tables() -> tuple[tuple[int, ...], ...]:
+    """Map each byte of a 64-bit hash to 32-bit counter lanes inside one big int.
+
+    Summing spread values adds one to every lane whose hash bit is set, so the
+    per-bit SimHash counters are accumulated with a few integer additions per
+    feature instead of a 64-step Python loop.
+    """
+
+    byte_spread = [sum(((value >> bit) & 1) << (_LANE_BITS * bit) for bit in range(8)) for value in range(256)]
+    return tuple(tuple(spread << (_LANE_BITS * 8 * index) for spread in byte_spread) for index in range(8))
+
+
+_SPREAD = _build_spread_tables()
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    """Return word shingles with digit runs collapsed so numbers do not split neighbours."""
+
+    tokens = ["#" if token.isdigit() else token for token in _TOKEN_RE.findall(text.lower())]
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def stable_hash64(feature: str) -> int:
+    """Return a cheap 64-bit hash that is identical across processes and runs."""
+
+    data = feature.encode("utf-8")
+    return (((zlib.crc32(data) << 32) | zlib.crc32(data, 0x5BD1E995)) * _MIX) & _FINGERPRINT_MASK
+
+
+def hash_lanes(h: int) -> int:
+    """Return the packed SimHash bit counters of one 64-bit feature hash."""
+
+    t0, t1, t2, t3, t4, t5, t6, t7 = _SPREAD
+    return (
+        t0[h & 0xFF]
+        + t1[(h >> 8) & 0xFF]
+        + t2[(h >> 16) & 0xFF]
+        + t3[(h >> 24) & 0xFF]
+        + t4[(h >> 32) & 0xFF]
+        + t5[(h >> 40) & 0xFF]
+        + t6[(h >> 48) & 0xFF]
+        + t7[(h >> 56) & 0xFF]
+    )
+
+
+def fingerprint_from_lanes(lanes: int, features: int) -> int:
+    """Set each fingerprint bit whose counter holds more than half of ``features``."""
+
+    half = features / 2
+    fingerprint = 0
+    for bit, count in enumerate(_LANES.unpack(lanes.to_bytes(_LANES.size, "little"))):
+        if count > half:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def simhash(features: set[str]) -> int:
+    """Return a 64-bit SimHash over a feature set."""
+
+    lanes = 0
+    for feature in features:
+        lanes += hash_lanes(stable_hash64(feature))
+    return fingerprint_from_lanes(lanes, len(features))
+
+
+def responses_agree(left: ReverseResponse, right: ReverseResponse) -> bool:
+    """Return True when two responses carry the same categorical prediction."""
+
+    return (
+        left.prompt_style == right.prompt_style
+        and left.task_type == right.task_type
+        and left.temperature_estimate == right.temperature_estimate
+        and left.constraints_detected == right.constraints_detected
+    )
+
+
+class NearDuplicateCache:
+    """Bounded LRU index of responses looked up by Hamming distance between fingerprints.
+
+    Fingerprints are split into ``bands`` equal slices and each slice indexes a
+    bucket. Two fingerprints within ``bands - 1`` differing bits always share at
+    least one slice exactly; for larger thresholds lookups also probe every
+    slice with one bit flipped, which covers up to ``2 * bands - 1`` bits. Either
+    way a lookup only compares against a handful of bucket members regardless
+    of how many entries are indexed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_distance: int = 7,
+        bands: int = 4,
+        max_bucket_scan: int = 32,
+        verify_sample_rate: float = 0.0,
+    ) -> None:
+        if _FINGERPRINT_BITS % bands:
+            raise ValueError("bands must evenly divide 64")
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.bands = bands
+        self.max_bucket_scan = max_bucket_scan
+        self.verify_sample_rate = verify_sample_rate
+        self._band_bits = _FINGERPRINT_BITS // bands
+        self._band_mask = (1 << self._band_bits) - 1
+        self._probe_flips = max_distance >= bands
+        self._entries: OrderedDict[int, ReverseResponse] = OrderedDict()
+        self._buckets: list[dict[int, dict[int, None]]] = [{} for _ in range(bands)]
+        self._hits = 0
+        self._misses = 0
+        self._verified = 0
+        self._disagreements = 0
+
+    def fingerprint(self, text: str) -> int:
+        """Return the SimHash fingerprint used as cache key for ``text``."""
+
+        return simhash(shingles(text))
+
+    def lookup(self, fingerprint: int) -> tuple[ReverseResponse, int] | None:
+        """Return the closest cached response and its distance, if within threshold."""
+
+        best: tuple[int, int] | None = None
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            buckets = self._buckets[band]
+            probes = [key]
+            if self._probe_flips:
+                probes.extend(key ^ (1 << bit) for bit in range(self._band_bits))
+            for probe in probes:
+                bucket = buckets.get(probe)
+                if not bucket:
+                    continue
+                for candidate in islice(reversed(bucket), self.max_bucket_scan):
+                    distance = (candidate ^ fingerprint).bit_count()
+                    if distance <= self.max_distance and (best is None or distance < best[1]):
+                        best = (candidate, distance)
+                        if distance == 0:
+                            break
+                if best is not None and best[1] == 0:
+                    break
+            if best is not None and best[1] == 0:
+                break
+
+        if best is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._entries.move_to_end(best[0])
+        return self._entries[best[0]], best[1]
+
+    def store(self, fingerprint: int, response: ReverseResponse) -> None:
+        """Index ``response`` under ``fingerprint``, evicting least recently used entries."""
+
+        if fingerprint in self._entries:
+            self._entries[fingerprint] = response
+            self._entries.move_to_end(fingerprint)
+            return
+        self._entries[fingerprint] = response
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            self._buckets[band].setdefault(key, {})[fingerprint] = None
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._unindex(evicted)
+
+    def should_verify(self) -> bool:
+        """Return True when a hit should be checked against a full analysis."""
+
+        return self.verify_sample_rate > 0 and random.random() < self.verify_sample_rate
+
+    def record_verification(self, agreed: bool) -> None:
+        """Record the outcome of comparing an approximate hit with a full analysis."""
+
+        self._verified += 1
+        if not agreed:
+            self._disagreements += 1
+
+    def stats(self) -> dict[str, float]:
+        """Return hit-rate and disagreement counters."""
+
+        lookups = self._hits + self._misses
+        return {
+            "entries": float(len(self._entries)),
+            "hits": float(self._hits),
+            "misses": float(self._misses),
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "verified": float(self._verified),
+            "disagreements": float(self._disagreements),
+            "disagreement_rate": self._disagreements / self._verified if self._verified else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _band_keys(self, fingerprint: int) -> list[int]:
+        return [(fingerprint >> (band * self._band_bits)) & self._band_mask for band in range(self.bands)]
+
+    def _unindex(self, fingerprint: int) -> None:
+        for band, key in enumerate(self._band_keys(fingerprint)):
+            bucket = self._buckets[band].get(key)
+            if bucket is None:
+                continue
+            bucket.pop(fingerprint, None)
+            if not bucket:
+                del self._buckets[band][key]
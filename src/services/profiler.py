@@ -0,0 +1,245 @@
+"""On-demand sampling profiles of a live worker, as collapsed stacks for flamegraphs."""
+
+from __future__ import annotations
+
+import asyncio
+import signal
+import socket
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from types import CodeType, FrameType
+
+MAX_STACKS = 20_000
+ALLOC_FRAMES = 32
+TRUNCATED = "[truncated]"
+THREAD_NAMES_REFRESH_SECONDS = 0.1
+
+# Leaf frames of threads parked waiting for work; sampling them would bury the busy stacks.
+IDLE_FRAMES = frozenset(
+    {
+        "threading.py:Condition.wait",
+        "threading.py:Event.wait",
+        "threading.py:Thread._wait_for_tstate_lock",
+        "queue.py:Queue.get",
+        "selectors.py:EpollSelector.select",
+        "selectors.py:PollSelector.select",
+        "selectors.py:SelectSelector.select",
+        "selectors.py:KqueueSelector.select",
+        "concurrent/futures/thread.py:_worker",
+    }
+)
+
+
+class ProfileInProgress(RuntimeError):
+    """Raised when a profile is requested while another one is running."""
+
+
+@dataclass(slots=True)
+class Profile:
+    mode: str
+    clock: str
+    seconds: float
+    samples: int
+    stacks: Counter[str]
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's folded format: ``root;...;leaf weight`` per line, heaviest first."""
+
+        return "".join(f"{stack} {weight}\n" for stack, weight in self.stacks.most_common())
+
+
+class SamplingProfiler:
+    """Profile the running process for a bounded time, one profile at a time.
+
+    CPU mode arms ``ITIMER_PROF`` so ``SIGPROF`` fires every ``interval_ms``
+    of process CPU time; the handler records the stack of every thread that
+    is not parked in an idle wait. Without ``SIGPROF``, or off the main
+    thread where signal handlers cannot be installed, a sampler thread does
+    the same on a wall-clock timer. Alloc mode traces allocations with
+    ``tracemalloc`` and reports the bytes allocated during the window that
+    are still alive at its end. Distinct stacks are capped at ``MAX_STACKS``;
+    the rest are counted under ``[truncated]``.
+    """
+
+    def __init__(self) -> None:
+        self._busy = False
+        self._labels: dict[CodeType, str] = {}
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def profile(self, seconds: float, mode: str = "cpu", interval_ms: float = 10.0) -> Profile:
+        if mode not in ("cpu", "alloc"):
+            raise ValueError(f"unknown profile mode {mode!r}")
+        if self._busy:
+            raise ProfileInProgress()
+        self._busy = True
+        try:
+            if mode == "alloc":
+                return await self._profile_allocations(seconds)
+            return await self._profile_cpu(seconds, interval_ms / 1000)
+        finally:
+            self._busy = False
+
+    async def _profile_cpu(self, seconds: float, interval: float) -> Profile:
+        stacks: Counter[str] = Counter()
+        names: dict[int, str] = {}
+        signal_driven = hasattr(signal, "SIGPROF") and threading.current_thread() is threading.main_thread()
+        if signal_driven:
+            previous = signal.signal(signal.SIGPROF, lambda signum, frame: self._sample(stacks, frame, names))
+            wakeup = _LoopWakeup()
+            signal.setitimer(signal.ITIMER_PROF, interval, interval)
+            try:
+                await _track_thread_names(names, seconds)
+            finally:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+                wakeup.close()
+                signal.signal(signal.SIGPROF, previous)
+        else:
+            stop = threading.Event()
+            sampler = threading.Thread(
+                target=self._sample_until, args=(stacks, interval, stop, names), daemon=True
+            )
+            sampler.start()
+            try:
+                await _track_thread_names(names, seconds)
+            finally:
+                stop.set()
+                await asyncio.to_thread(sampler.join)
+        return Profile("cpu", "cpu" if signal_driven else "wall", seconds, sum(stacks.values()), stacks)
+
+    def _sample_until(
+        self, stacks: Counter[str], interval: float, stop: threading.Event, names: dict[int, str]
+    ) -> None:
+        while not stop.wait(interval):
+            self._sample(stacks, None, names)
+
+    def _sample(self, stacks: Counter[str], interrupted: FrameType | None, names: dict[int, str]) -> None:
+        """Record one stack per busy thread; ``interrupted`` stands in for the signal handler's own thread.
+
+        This runs inside a signal handler, so it must not take locks the
+        interrupted code may hold: thread names come from ``names``, which
+        the event loop keeps current, not from ``threading.enumerate()``.
+        """
+
+        current = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == current:
+                if interrupted is None:
+                    continue  # the sampler thread itself
+                frame = interrupted
+            labels = []
+            while frame is not None:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if not labels or labels[0] in IDLE_FRAMES:
+                continue
+            labels.append(names.get(ident, f"thread-{ident}"))
+            self._count(stacks, ";".join(reversed(labels)), 1)
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{_short_path(code.co_filename)}:{code.co_qualname}"
+        return label
+
+    async def _profile_allocations(self, seconds: float) -> Profile:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(ALLOC_FRAMES)
+        try:
+            # Only blocks allocated after this point count, whoever started tracing.
+            baseline = tracemalloc.take_snapshot() if already_tracing else None
+            await asyncio.sleep(seconds)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+
+        stacks = await asyncio.to_thread(self._allocation_stacks, snapshot, baseline)
+        return Profile("alloc", "bytes", seconds, len(snapshot.traces), stacks)
+
+    def _allocation_stacks(
+        self, snapshot: tracemalloc.Snapshot, baseline: tracemalloc.Snapshot | None
+    ) -> Counter[str]:
+        """Group live blocks by traceback, dropping the profiler's own snapshot bookkeeping."""
+
+        if baseline is None:
+            statistics = [(statistic.traceback, statistic.size) for statistic in snapshot.statistics("traceback")]
+        else:
+            statistics = [(stat.traceback, stat.size_diff) for stat in snapshot.compare_to(baseline, "traceback")]
+        stacks: Counter[str] = Counter()
+        for traceback, size in statistics:
+            if size <= 0 or any(frame.filename == tracemalloc.__file__ for frame in traceback):
+                continue
+            self._count(stacks, ";".join(f"{_short_path(frame.filename)}:{frame.lineno}" for frame in traceback), size)
+        return stacks
+
+    @staticmethod
+    def _count(stacks: Counter[str], stack: str, weight: int) -> None:
+        if stack in stacks or len(stacks) < MAX_STACKS:
+            stacks[stack] += weight
+        else:
+            stacks[TRUNCATED] += weight
+
+
+async def _track_thread_names(names: dict[int, str], seconds: float) -> None:
+    """Sleep for ``seconds`` while refreshing the thread ident to name map the samples are labelled with."""
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    while True:
+        names.update((thread.ident, thread.name) for thread in threading.enumerate() if thread.ident is not None)
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(remaining, THREAD_NAMES_REFRESH_SECONDS))
+
+
+class _LoopWakeup:
+    """Wake the event loop when a signal arrives.
+
+    The kernel delivers ``SIGPROF`` to whichever thread is burning CPU, and
+    Python runs handlers only on the main thread. While the loop blocks in
+    ``select`` nothing would run them until its next timeout. A signal
+    wakeup fd makes ``select`` return, unless one is already installed.
+    """
+
+    def __init__(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._reader, self._writer = socket.socketpair()
+        self._reader.setblocking(False)
+        self._writer.setblocking(False)
+        self._previous = signal.set_wakeup_fd(self._writer.fileno(), warn_on_full_buffer=False)
+        if self._previous != -1:
+            signal.set_wakeup_fd(self._previous)
+        else:
+            self._loop.add_reader(self._reader.fileno(), self._drain)
+
+    def _drain(self) -> None:
+        try:
+            self._reader.recv(4096)
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        if self._previous == -1:
+            signal.set_wakeup_fd(-1)
+            self._loop.remove_reader(self._reader.fileno())
+        self._reader.close()
+        self._writer.close()
+
+
+def _short_path(filename: str) -> str:
+    """Trim a source path to the part that names the module: ``src/...``, a package, or the stdlib file."""
+
+    for marker in ("/site-packages/", "/src/"):
+        head, found, tail = filename.rpartition(marker)
+        if found:
+            return tail if marker == "/site-packages/" else f"src/{tail}"
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-3:]) if "concurrent" in parts else parts[-1]
@@ -0,0 +1,424 @@
+"""Incremental clustering of analyzed outputs that likely share an upstream prompt."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import operator
+import random
+import re
+import threading
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+
+from src.models.schemas import AnalyzerSignals, PromptStyle, TemperatureEstimate
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TOKEN_RE = re.compile(r"\w+")
+_TASK_TYPES = ("code", "essay", "explanation", "reasoning", "general")
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+_PROJECTION_SCALE = 1024
+
+SparseVector = dict[int, float]
+
+
+def _bigrams(text: str) -> list[str]:
+    tokens = ["#" if token.isdigit() else token for token in _TOKEN_RE.findall(text.lower())]
+    return [f"{a} {b}" for a, b in zip(tokens, tokens[1:])] or tokens
+
+
+class PromptFeaturizer:
+    """Turn analyzer signals plus hashed word bigrams into a sparse unit-length vector.
+
+    The first block one-hot encodes the categorical analyzer outputs and hashes
+    detected constraints; the second block is a signed feature-hashed bigram
+    histogram. Each block is normalized on its own and weighted so lexical
+    overlap dominates while analyzer agreement still separates near ties.
+    """
+
+    SIGNAL_DIMS = 32
+    NGRAM_DIMS = 256
+
+    def __init__(self, signal_weight: float = 0.3) -> None:
+        self.dims = self.SIGNAL_DIMS + self.NGRAM_DIMS
+        self._signal_scale = math.sqrt(signal_weight)
+        self._ngram_scale = math.sqrt(1.0 - signal_weight)
+        self._style_slots = {style: i for i, style in enumerate(PromptStyle)}
+        self._temperature_slots = {t: len(PromptStyle) + i for i, t in enumerate(TemperatureEstimate)}
+        self._task_offset = len(PromptStyle) + len(TemperatureEstimate)
+        self._constraint_offset = self._task_offset + len(_TASK_TYPES) + 1
+
+    def vectorize(self, text: str, signals: AnalyzerSignals, bigrams: list[str] | None = None) -> SparseVector:
+        """Return the feature vector for one analyzed text."""
+
+        signal_block: SparseVector = {}
+        slots = [self._style_slots[signals.prompt_style], self._temperature_slots[signals.temperature_estimate]]
+        task_index = _TASK_TYPES.index(signals.task_type) if signals.task_type in _TASK_TYPES else len(_TASK_TYPES)
+        slots.append(self._task_offset + task_index)
+        constraint_span = self.SIGNAL_DIMS - self._constraint_offset
+        slots.extend(
+            self._constraint_offset + zlib.crc32(name.encode("utf-8")) % constraint_span
+            for name in signals.constraints_detected
+        )
+        for slot in slots:
+            signal_block[slot] = signal_block.get(slot, 0.0) + 1.0
+
+        ngram_block: SparseVector = {}
+        for gram in bigrams if bigrams is not None else _bigrams(text):
+            h = zlib.crc32(gram.encode("utf-8"))
+            slot = self.SIGNAL_DIMS + h % self.NGRAM_DIMS
+            ngram_block[slot] = ngram_block.get(slot, 0.0) + (1.0 if (h >> 20) & 1 else -1.0)
+
+        vector = self._scaled(signal_block, self._signal_scale)
+        vector.update(self._scaled(ngram_block, self._ngram_scale))
+        return vector
+
+    @staticmethod
+    def _scaled(block: SparseVector, weight: float) -> SparseVector:
+        norm = math.sqrt(sum(v * v for v in block.values()))
+        if not norm:
+            return {}
+        factor = weight / norm
+        return {slot: value * factor for slot, value in block.items() if value}
+
+
+class _SignProjection:
+    """Random +/-1 projections evaluated with packed integer lanes.
+
+    Every dimension owns a random sign pattern across all hyperplanes. That
+    pattern (or its complement, for negative weights) is pre-spread into one
+    32-bit lane per hyperplane of a big integer, so projecting a sparse vector
+    costs one integer multiply-add per non-zero entry. Projections are linear,
+    which lets clusters keep a running projection of their member sum.
+    """
+
+    def __init__(self, dims: int, planes: int, seed: int) -> None:
+        rng = random.Random(seed)
+        self.planes = planes
+        mask = (1 << planes) - 1
+        self._positive: list[int] = []
+        self._negative: list[int] = []
+        for _ in range(dims):
+            bits = rng.getrandbits(planes)
+            self._positive.append(self._spread(bits, planes))
+            self._negative.append(self._spread(~bits & mask, planes))
+
+    @staticmethod
+    def _spread(bits: int, planes: int) -> int:
+        return sum(1 << (_LANE_BITS * plane) for plane in range(planes) if (bits >> plane) & 1)
+
+    def project(self, vector: SparseVector, first_slot: int = 0) -> list[int]:
+        """Return integer projections onto every hyperplane (the sign gives the hash bit).
+
+        Slots below ``first_slot`` are ignored.
+        """
+
+        lanes = 0
+        total = 0
+        for slot, value in vector.items():
+            if slot < first_slot:
+                continue
+            weight = round(value * _PROJECTION_SCALE)
+            if weight > 0:
+                lanes += weight * self._positive[slot]
+                total += weight
+            elif weight < 0:
+                lanes += -weight * self._negative[slot]
+                total -= weight
+        return [2 * ((lanes >> (_LANE_BITS * plane)) & _LANE_MASK) - total for plane in range(self.planes)]
+
+
+class _Cluster:
+    __slots__ = (
+        "cluster_id",
+        "tenant",
+        "size",
+        "total",
+        "norm_sq",
+        "projection",
+        "keys",
+        "prompts",
+        "styles",
+        "tasks",
+        "constraints",
+        "phrases",
+        "exemplar",
+    )
+
+    def __init__(
+        self, cluster_id: int, tenant: str, dims: int, planes: int, exemplar: str, phrase_candidates: list[str]
+    ) -> None:
+        self.cluster_id = cluster_id
+        self.tenant = tenant
+        self.size = 0
+        # Single precision and packed int64 lanes keep a cluster near a tenth of Python floats and ints.
+        self.total = array("f", bytes(4 * dims))
+        self.norm_sq = 0.0
+        self.projection = array("q", bytes(8 * planes))
+        self.keys: list[int] = []
+        self.prompts: Counter[str] = Counter()
+        self.styles: Counter[str] = Counter()
+        self.tasks: Counter[str] = Counter()
+        self.constraints: Counter[str] = Counter()
+        self.phrases: dict[str, int] = dict.fromkeys(phrase_candidates, 0)
+        self.exemplar = exemplar
+
+    def dot(self, vector: SparseVector) -> float:
+        total = self.total
+        return sum(value * total[slot] for slot, value in vector.items())
+
+
+class PromptClusterIndex:
+    """Online leader clustering over a random-hyperplane LSH index of centroids.
+
+    Each insert hashes the vector into ``tables`` buckets, probes those buckets
+    and their one-bit neighbours, compares it with the centroids found there,
+    and either joins the most similar cluster (if above
+    ``similarity_threshold``) or starts a new one. Only centroids and bounded
+    per-cluster counters are retained, so memory depends on ``max_clusters``
+    rather than on the number of inserted vectors.
+
+    Only the lexical block is hashed: analyzer signals are shared by many
+    unrelated outputs and would crowd every bucket, so they only take part in
+    the final cosine comparison.
+
+    Clusters belong to the tenant whose output started them: buckets are
+    keyed by tenant, so outputs only join, and queries only find, that
+    tenant's clusters. ``max_clusters`` bounds all tenants together, evicting
+    the least recently joined cluster. The index is not thread-safe; see
+    ``ClusterWorker``.
+    """
+
+    MAX_PHRASE_CANDIDATES = 64
+    SHARED_PHRASE_RATIO = 0.6
+
+    def __init__(
+        self,
+        max_clusters: int = 5_000,
+        similarity_threshold: float = 0.6,
+        tables: int = 8,
+        bits_per_table: int = 16,
+        featurizer: PromptFeaturizer | None = None,
+        seed: int = 1337,
+    ) -> None:
+        self.featurizer = featurizer or PromptFeaturizer()
+        self.max_clusters = max_clusters
+        self.similarity_threshold = similarity_threshold
+        self.tables = tables
+        self.bits_per_table = bits_per_table
+        self._projection = _SignProjection(self.featurizer.dims, tables * bits_per_table, seed)
+        self._flips = [1 << bit for bit in range(bits_per_table)]
+        self._buckets: list[dict[tuple[str, int], set[int]]] = [{} for _ in range(tables)]
+        self._clusters: OrderedDict[int, _Cluster] = OrderedDict()
+        self._next_id = 1
+        self._inserted = 0
+
+    def insert(self, text: str, signals: AnalyzerSignals, tenant: str = "") -> int:
+        """Assign one analyzed text to one of ``tenant``'s clusters and return the cluster id."""
+
+        bigrams = _bigrams(text)
+        vector = self.featurizer.vectorize(text, signals, bigrams)
+        projection = self._projection.project(vector, self.featurizer.SIGNAL_DIMS)
+        match = self._nearest(vector, self._keys(projection), tenant)
+        if match is not None and match[1] >= self.similarity_threshold:
+            cluster = self._clusters[match[0]]
+            self._clusters.move_to_end(cluster.cluster_id)
+        else:
+            cluster = self._new_cluster(text, bigrams, tenant)
+
+        self._absorb(cluster, vector, projection, signals, set(bigrams))
+        self._inserted += 1
+        return cluster.cluster_id
+
+    def query(self, text: str, signals: AnalyzerSignals, tenant: str = "") -> tuple[dict[str, Any], float] | None:
+        """Return the summary of ``tenant``'s most similar cluster and its cosine similarity."""
+
+        vector = self.featurizer.vectorize(text, signals)
+        keys = self._keys(self._projection.project(vector, self.featurizer.SIGNAL_DIMS))
+        match = self._nearest(vector, keys, tenant)
+        if match is None:
+            return None
+        return self.summary(match[0]), round(match[1], 4)
+
+    def summary(self, cluster_id: int) -> dict[str, Any]:
+        """Describe one cluster, including the prompt its members most likely share."""
+
+        cluster = self._clusters[cluster_id]
+        shared = self._shared_phrases(cluster)
+        prompt = cluster.prompts.most_common(1)[0][0] if cluster.prompts else ""
+        if shared:
+            prompt = f"{prompt} Recurring phrasing: " + ", ".join(f"'{phrase}'" for phrase in shared) + "."
+        return {
+            "cluster_id": cluster.cluster_id,
+            "size": cluster.size,
+            "inferred_shared_prompt": prompt,
+            "prompt_style": dict(cluster.styles),
+            "task_type": dict(cluster.tasks),
+            "constraints_detected": dict(cluster.constraints),
+            "shared_phrases": shared,
+            "exemplar": cluster.exemplar,
+        }
+
+    def top(self, limit: int = 20, tenant: str = "") -> list[dict[str, Any]]:
+        """Return summaries of ``tenant``'s largest clusters."""
+
+        owned = (cluster for cluster in self._clusters.values() if cluster.tenant == tenant)
+        largest = sorted(owned, key=lambda c: -c.size)[:limit]
+        return [self.summary(cluster.cluster_id) for cluster in largest]
+
+    def get(self, cluster_id: int, tenant: str = "") -> dict[str, Any] | None:
+        """Return the summary of one of ``tenant``'s clusters, or ``None``."""
+
+        cluster = self._clusters.get(cluster_id)
+        if cluster is None or cluster.tenant != tenant:
+            return None
+        return self.summary(cluster_id)
+
+    def stats(self) -> dict[str, float]:
+        return {"clusters": float(len(self._clusters)), "inserted": float(self._inserted)}
+
+    def _shared_phrases(self, cluster: _Cluster, limit: int = 5) -> list[str]:
+        """Chain bigrams common to most members into phrases, in first-seen order."""
+
+        phrases: list[list[str]] = []
+        previous_tail: str | None = None
+        for bigram, count in cluster.phrases.items():
+            if count < self.SHARED_PHRASE_RATIO * cluster.size:
+                previous_tail = None
+                continue
+            head, _, tail = bigram.partition(" ")
+            if previous_tail is not None and head == previous_tail:
+                phrases[-1].append(tail)
+            else:
+                phrases.append([head, tail] if tail else [head])
+            previous_tail = tail
+        phrases.sort(key=len, reverse=True)
+        return [" ".join(words) for words in phrases[:limit]]
+
+    def _keys(self, projection: Sequence[int]) -> list[int]:
+        keys = []
+        bits = self.bits_per_table
+        for table in range(self.tables):
+            key = 0
+            for bit, value in enumerate(projection[table * bits : (table + 1) * bits]):
+                if value >= 0:
+                    key |= 1 << bit
+            keys.append(key)
+        return keys
+
+    def _nearest(self, vector: SparseVector, keys: list[int], tenant: str) -> tuple[int, float] | None:
+        candidates: set[int] = set()
+        for table, key in enumerate(keys):
+            buckets = self._buckets[table]
+            candidates.update(buckets.get((tenant, key), ()))
+            for flip in self._flips:
+                candidates.update(buckets.get((tenant, key ^ flip), ()))
+
+        best: tuple[int, float] | None = None
+        for cluster_id in candidates:
+            cluster = self._clusters[cluster_id]
+            if not cluster.norm_sq:
+                continue
+            similarity = cluster.dot(vector) / math.sqrt(cluster.norm_sq)
+            if best is None or similarity > best[1]:
+                best = (cluster_id, similarity)
+        return best
+
+    def _new_cluster(self, text: str, bigrams: list[str], tenant: str) -> _Cluster:
+        candidates = list(dict.fromkeys(bigrams))[: self.MAX_PHRASE_CANDIDATES]
+        cluster = _Cluster(
+            self._next_id, tenant, self.featurizer.dims, self._projection.planes, text[:200], candidates
+        )
+        self._next_id += 1
+        self._clusters[cluster.cluster_id] = cluster
+        while len(self._clusters) > self.max_clusters:
+            _, evicted = self._clusters.popitem(last=False)
+            self._unindex(evicted)
+        return cluster
+
+    def _absorb(
+        self,
+        cluster: _Cluster,
+        vector: SparseVector,
+        projection: list[int],
+        signals: AnalyzerSignals,
+        bigrams: set[str],
+    ) -> None:
+        cluster.size += 1
+        cluster.norm_sq += 2 * cluster.dot(vector) + sum(value * value for value in vector.values())
+        for slot, value in vector.items():
+            cluster.total[slot] += value
+        cluster.projection = array("q", map(operator.add, cluster.projection, projection))
+        cluster.prompts[signals.inferred_prompt] += 1
+        cluster.styles[signals.prompt_style.value] += 1
+        cluster.tasks[signals.task_type] += 1
+        cluster.constraints.update(signals.constraints_detected)
+        for phrase in cluster.phrases:
+            if phrase in bigrams:
+                cluster.phrases[phrase] += 1
+
+        keys = self._keys(cluster.projection)
+        if keys != cluster.keys:
+            self._unindex(cluster)
+            for table, key in enumerate(keys):
+                self._buckets[table].setdefault((cluster.tenant, key), set()).add(cluster.cluster_id)
+            cluster.keys = keys
+
+    def _unindex(self, cluster: _Cluster) -> None:
+        for table, key in enumerate(cluster.keys):
+            bucket = self._buckets[table].get((cluster.tenant, key))
+            if bucket is None:
+                continue
+            bucket.discard(cluster.cluster_id)
+            if not bucket:
+                del self._buckets[table][(cluster.tenant, key)]
+        cluster.keys = []
+
+
+class ClusterWorker:
+    """Run every operation on one ``PromptClusterIndex`` on a single background thread.
+
+    An insert costs about a millisecond, so ``insert`` queues it and returns
+    at once; once ``max_pending`` inserts are waiting, further ones are
+    dropped and counted rather than backing up the caller. Reads go through
+    ``call`` and wait behind the inserts queued before them, so the index
+    is only ever touched by its own thread.
+    """
+
+    def __init__(self, index: PromptClusterIndex, max_pending: int = 1000) -> None:
+        self.index = index
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prompt-clusters")
+
+    def insert(self, text: str, signals: AnalyzerSignals, tenant: str = "") -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending += 1
+        self._pool.submit(self.index.insert, text, signals, tenant).add_done_callback(self._inserted)
+
+    async def call(self, method: Callable[..., T], *args: Any) -> T:
+        """Await ``method(*args)`` run on the index thread."""
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, method, *args)
+
+    def stats(self) -> dict[str, float]:
+        return {**self.index.stats(), "pending": float(self._pending), "dropped": float(self.dropped)}
+
+    def _inserted(self, future: Future[int]) -> None:
+        with self._lock:
+            self._pending -= 1
+        if future.exception() is not None:
+            logger.error("Prompt cluster insert failed", exc_info=future.exception())
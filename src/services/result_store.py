@@ -0,0 +1,125 @@
+"""Content-addressed store of analysis results for conditional and by-hash lookups."""
+
+from __future__ import annotations
+
+import hashlib
+
+from src.analyzers import ANALYZER_VERSION
+from src.models.schemas import AnalysisMode, ReverseResponse
+from src.services.cache import TTLCache
+
+
+def input_hash(output_text: str) -> str:
+    """SHA-256 hex digest of the output text as given; ``ReverseRequest`` has already stripped it."""
+
+    return hashlib.sha256(output_text.encode("utf-8")).hexdigest()
+
+
+def result_etag(text_hash: str, mode: AnalysisMode, include_trace: bool, rules: str = "") -> str:
+    """Strong ETag for the full analysis of one input under the current analyzer version and rule pack.
+
+    ``rules`` is the digest of the injection signature pack in use.
+    """
+
+    return f'"{text_hash[:32]}-{mode.value}-{"t" if include_trace else "n"}-v{ANALYZER_VERSION}.{rules}"'
+
+
+def cacheable(mode: AnalysisMode, response: ReverseResponse) -> bool:
+    """Whether ``response`` is fully determined by its input and may carry a strong ETag.
+
+    Deep results can include an external model summary, and degraded or
+    approximate results depend on timing and cache state.
+    """
+
+    return mode is not AnalysisMode.deep and not response.degraded and not response.approximate
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an ``If-None-Match`` header against ``etag``, as RFC 9110 requires."""
+
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+class ResultStore:
+    """Bounded TTL store of analyzed texts and their results, keyed by input hash.
+
+    Texts are stored per tenant, so a hash only resolves for the tenant that
+    submitted it and lookups reveal nothing about other tenants' inputs.
+    Results are shared, as they depend on the text alone.
+
+    Results belong to one rules version (the signature pack digest). A
+    lookup or store under a different version drops every stored result,
+    so a hot-swapped pack is never answered from results of the old one;
+    texts are kept, as they do not depend on the rules.
+
+    With ``publish_texts`` the texts stored since the last ``take_new_texts``
+    are kept for it, so a worker can share them with the others.
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int, publish_texts: bool = False) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.publish_texts = publish_texts
+        self._new_texts: dict[str, str] = {}
+        self._texts: TTLCache[str] = TTLCache(ttl_seconds, max_entries)
+        self._results: TTLCache[ReverseResponse] = TTLCache(ttl_seconds, max_entries)
+        self._hits = 0
+        self._misses = 0
+        self._rules: str | None = None
+        self.clears = 0
+
+    def put(
+        self,
+        text_hash: str,
+        output_text: str,
+        mode: AnalysisMode,
+        include_trace: bool,
+        result: ReverseResponse,
+        rules: str = "",
+        tenant: str = "",
+    ) -> None:
+        self._use_rules(rules)
+        self._texts.set(f"{tenant}:{text_hash}", output_text)
+        if self.publish_texts:
+            self._new_texts[f"{tenant}:{text_hash}"] = output_text
+        self._results.set(self._key(text_hash, mode, include_trace), result)
+
+    def get(self, text_hash: str, mode: AnalysisMode, include_trace: bool, rules: str = "") -> ReverseResponse | None:
+        self._use_rules(rules)
+        result = self._results.get(self._key(text_hash, mode, include_trace))
+        if result is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return result
+
+    def text(self, text_hash: str, tenant: str = "") -> str | None:
+        return self._texts.get(f"{tenant}:{text_hash}")
+
+    def take_new_texts(self) -> dict[str, str]:
+        """Return the texts stored since the last call, keyed ``tenant:hash``, and forget them."""
+
+        new, self._new_texts = self._new_texts, {}
+        return new
+
+    def stats(self) -> dict[str, float]:
+        lookups = self._hits + self._misses
+        return {
+            "hits": float(self._hits),
+            "misses": float(self._misses),
+            "hit_rate": self._hits / lookups if lookups else 0.0,
+            "clears": float(self.clears),
+        }
+
+    def _use_rules(self, rules: str) -> None:
+        if rules != self._rules:
+            if self._rules is not None:
+                self._results.clear()
+                self.clears += 1
+            self._rules = rules
+
+    @staticmethod
+    def _key(text_hash: str, mode: AnalysisMode, include_trace: bool) -> str:
+        return f"{text_hash}:{mode.value}:{int(include_trace)}"
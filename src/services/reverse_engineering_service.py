@@ -2,46 +2,414 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
+from contextlib import AbstractAsyncContextManager, nullcontext
+from functools import partial
+from typing import Any
 
-from src.analyzers.constraint_detector import ConstraintDetector
-from src.analyzers.format_detector import FormatDetector
-from src.analyzers.reasoning_depth_estimator import ReasoningDepthEstimator
+from src.analyzers.constraint_detector import NONE_EXPLICIT, ConstraintDetector, ConstraintSignal
+from src.analyzers.format_detector import PLAIN_TEXT, FormatDetector, FormatSignal
+from src.analyzers.prompt_injection_detector import InjectionSignal, PromptInjectionDetector
+from src.analyzers.reasoning_depth_estimator import ReasoningDepthEstimator, ReasoningSignal
 from src.analyzers.structure_analyzer import StructureAnalyzer
-from src.analyzers.tone_classifier import ToneClassifier
-from src.models.schemas import ReverseResponse
+from src.analyzers.tone_classifier import ToneClassifier, ToneSignal
+from src.client.openai_compatible import OpenAICompatibleClient
+from src.config import get_settings
+from src.models.schemas import AnalysisMode, ReverseResponse, TemperatureEstimate, TranscriptResponse, TurnRole
+from src.services.executor import AdaptiveExecutor
+from src.services.micro_batcher import MicroBatcher
+from src.services.near_duplicate_cache import NearDuplicateCache, responses_agree
 from src.services.scoring_ensemble import ScoringEnsemble
+from src.services.transcript import summarize_transcript
 
 logger = logging.getLogger(__name__)
 
+SKIPPED_CONSTRAINTS = ConstraintSignal(NONE_EXPLICIT, skipped=True)
+SKIPPED_TONE = ToneSignal("neutral", TemperatureEstimate.medium, skipped=True)
+SKIPPED_FORMAT = FormatSignal(PLAIN_TEXT, skipped=True)
+SKIPPED_REASONING = ReasoningSignal(0.0, skipped=True)
+
+# (output_text, mode, budget_seconds, include_trace) of one batched ``_analyze`` call. The budget is
+# what was left of the caller's deadline at submission; it restarts when the item's own analysis starts.
+AnalysisItem = tuple[str, AnalysisMode, float | None, bool]
+# (role, content) of one transcript turn.
+Turn = tuple[TurnRole, str]
+
+STAGES: dict[AnalysisMode, tuple[str, ...]] = {
+    AnalysisMode.fast: ("structure", "constraint", "format"),
+    AnalysisMode.standard: ("structure", "constraint", "format", "reasoning", "tone", "injection"),
+    AnalysisMode.deep: ("structure", "constraint", "format", "reasoning", "tone", "injection"),
+}
+
+
+def sample_windows(text: str, budget: int, window: int = 1000) -> str:
+    """Return head, tail and evenly strided middle windows totalling about ``budget`` chars."""
+
+    if len(text) <= budget:
+        return text
+    window = min(window, budget // 2)
+    middle_windows = max(0, budget // window - 2)
+    head, tail = text[:window], text[-window:]
+    span = len(text) - 2 * window
+    stride = span // (middle_windows + 1) if middle_windows else span
+    middle = [text[window + stride * i : window + stride * i + window] for i in range(1, middle_windows + 1)]
+    return "\n".join([head, *middle, tail])
+
 
 class ReverseEngineeringService:
-    """Coordinates all analyzers and emits API-ready response models."""
+    """Coordinates all analyzers and emits API-ready response models.
+
+    Stages named in ``disabled_analyzers`` are skipped and replaced by neutral
+    defaults, as under a spent deadline; the structure stage cannot be
+    disabled. Ablation runs in ``scripts/evaluate.py`` use this. With
+    ``micro_batching`` (default from settings), concurrent analyses are
+    gathered into batches that take one executor hop each.
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        near_duplicate_cache: NearDuplicateCache | None = None,
+        executor: AdaptiveExecutor | None = None,
+        disabled_analyzers: frozenset[str] = frozenset(),
+        micro_batching: bool | None = None,
+    ) -> None:
+        unknown = disabled_analyzers - {"constraint", "format", "reasoning", "tone", "injection"}
+        if unknown:
+            raise ValueError(f"cannot disable analyzers: {', '.join(sorted(unknown))}")
         self.structure = StructureAnalyzer()
         self.constraint = ConstraintDetector()
         self.tone = ToneClassifier()
         self.format_detector = FormatDetector()
         self.reasoning = ReasoningDepthEstimator()
+        self.injection = PromptInjectionDetector(
+            get_settings().injection_signatures_path or None,
+            reload_interval_seconds=get_settings().injection_reload_seconds,
+        )
         self.ensemble = ScoringEnsemble()
+        self._stage_analyzers: dict[str, Any] = {
+            "structure": self.structure,
+            "constraint": self.constraint,
+            "format": self.format_detector,
+            "reasoning": self.reasoning,
+            "tone": self.tone,
+            "injection": self.injection,
+        }
+        self.disabled_analyzers = disabled_analyzers
+        self.model_client = OpenAICompatibleClient(get_settings())
+        self.fast_sample_chars = get_settings().fast_mode_sample_chars
+        self.near_duplicates = (
+            near_duplicate_cache if near_duplicate_cache is not None else self._near_duplicate_cache_from_settings()
+        )
+        self.executor = executor if executor is not None else self._executor_from_settings()
+        settings = get_settings()
+        enabled = settings.micro_batch_enabled if micro_batching is None else micro_batching
+        self.batcher: MicroBatcher[AnalysisItem, ReverseResponse] | None = (
+            MicroBatcher(
+                self._run_batch,
+                max_batch=settings.micro_batch_max_items,
+                max_wait_ms=settings.micro_batch_max_wait_ms,
+                max_inflight=settings.micro_batch_max_inflight,
+            )
+            if enabled
+            else None
+        )
+
+    async def reverse(
+        self,
+        output_text: str,
+        mode: AnalysisMode = AnalysisMode.standard,
+        deadline_ms: int | None = None,
+        include_trace: bool = True,
+        slot: AbstractAsyncContextManager[Any] | None = None,
+    ) -> ReverseResponse:
+        """Run the analysis pipeline for ``mode`` within an optional latency budget.
+
+        Standard-mode requests go through the near-duplicate cache when it is
+        enabled; fast and deep results are never cached. Without
+        ``include_trace`` no trace strings are built and ``reasoning_trace``
+        is empty. ``slot``, such as a fair-scheduler slot, is held for the
+        local analysis only and released before a deep-mode model call; the
+        budget starts once it is entered.
+        """
+
+        async with slot if slot is not None else nullcontext():
+            deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms else None
+            if mode is not AnalysisMode.deep:
+                return await self._reverse_local(output_text, mode, deadline, include_trace)
+            response = await self._run_analysis(output_text, mode, deadline, include_trace)
+        return await self._model_assist(output_text, response, deadline)
+
+    async def _reverse_local(
+        self,
+        output_text: str,
+        mode: AnalysisMode,
+        deadline: float | None,
+        include_trace: bool,
+    ) -> ReverseResponse:
+        cache = self.near_duplicates
+        if cache is None or mode is not AnalysisMode.standard:
+            return await self._run_analysis(output_text, mode, deadline, include_trace)
+
+        fingerprint = cache.fingerprint(output_text)
+        hit = cache.lookup(fingerprint)
+        # A hit stored without a trace cannot serve a caller that wants one.
+        if hit is None or (include_trace and not hit[0].reasoning_trace):
+            response = await self._run_analysis(output_text, mode, deadline, include_trace)
+            if not response.degraded:
+                cache.store(fingerprint, response)
+            return response
+
+        cached, distance = hit
+        if cache.should_verify():
+            response = await self._run_analysis(output_text, mode, deadline, include_trace)
+            if not response.degraded:
+                cache.record_verification(responses_agree(cached, response))
+            return response
+        trace = [*cached.reasoning_trace, f"near_duplicate_distance={distance}"] if include_trace else []
+        return cached.model_copy(update={"approximate": True, "reasoning_trace": trace})
+
+    async def reverse_transcript(
+        self,
+        turns: list[Turn],
+        mode: AnalysisMode = AnalysisMode.standard,
+        deadline_ms: int | None = None,
+        include_trace: bool = True,
+    ) -> TranscriptResponse:
+        """Analyze a whole transcript in one executor call.
+
+        Every turn is scanned for injection and every non-empty assistant turn
+        is reverse engineered, with results equal to ``reverse`` of that turn
+        alone apart from the near-duplicate cache and model assistance, which
+        transcripts skip. The deadline covers all turns.
+        """
+
+        deadline = time.perf_counter() + deadline_ms / 1000 if deadline_ms else None
+        return await self.executor.run(
+            self._analyze_transcript,
+            sum(len(content) for _, content in turns),
+            turns,
+            mode,
+            deadline,
+            include_trace,
+            process_func=partial(_analyze_transcript_in_process, self.disabled_analyzers),
+        )
+
+    async def _run_analysis(
+        self,
+        output_text: str,
+        mode: AnalysisMode,
+        deadline: float | None,
+        include_trace: bool,
+    ) -> ReverseResponse:
+        if self.batcher is not None:
+            budget = None if deadline is None else deadline - time.perf_counter()
+            return await self.batcher.submit((output_text, mode, budget, include_trace))
+        return await self.executor.run(
+            self._analyze,
+            len(output_text),
+            output_text,
+            mode,
+            deadline,
+            include_trace,
+            process_func=partial(_analyze_in_process, self.disabled_analyzers),
+        )
+
+    async def _run_batch(self, items: list[AnalysisItem]) -> list[ReverseResponse | Exception]:
+        return await self.executor.run(
+            self._analyze_batch,
+            sum(len(item[0]) for item in items),
+            items,
+            process_func=partial(_analyze_batch_in_process, self.disabled_analyzers),
+        )
+
+    def _analyze_batch(self, items: list[AnalysisItem]) -> list[ReverseResponse | Exception]:
+        """Analyze items one after another; a failing item yields its exception instead of a result.
+
+        Each item's budget starts when its own analysis does, so items ahead
+        of it in the batch do not use up its deadline.
+        """
 
-    async def reverse(self, output_text: str) -> ReverseResponse:
-        """Run full multi-step analysis pipeline."""
+        outcomes: list[ReverseResponse | Exception] = []
+        for output_text, mode, budget, include_trace in items:
+            deadline = None if budget is None else time.perf_counter() + budget
+            try:
+                outcomes.append(self._analyze(output_text, mode, deadline, include_trace))
+            except Exception as exc:
+                outcomes.append(exc)
+        return outcomes
 
-        logger.debug("Starting reverse analysis", extra={"text_length": len(output_text)})
-        structure_signal = self.structure.analyze(output_text)
-        constraint_signal = self.constraint.analyze(output_text)
-        tone_signal = self.tone.analyze(output_text)
-        format_signal = self.format_detector.analyze(output_text)
-        reasoning_signal = self.reasoning.analyze(output_text)
+    def _analyze_transcript(
+        self,
+        turns: list[Turn],
+        mode: AnalysisMode,
+        deadline: float | None,
+        include_trace: bool,
+    ) -> TranscriptResponse:
+        """Scan all turns for injection at once, then run the other stages over each assistant turn.
+
+        The signature scan resolves the words of every turn in one pass and
+        attributes matches to the turn they occur in; assistant turns reuse
+        their share instead of scanning again. The other analyzers only read
+        their own turn, so the transcript is visited about once in total.
+        """
+
+        injections: list[InjectionSignal | None] = [None] * len(turns)
+        if "injection" not in self.disabled_analyzers:
+            injections = list(self._stage_analyzers["injection"].analyze_many([content for _, content in turns]))
+        results = [
+            self._analyze(content, mode, deadline, include_trace, injection=injection)
+            if role is TurnRole.assistant and content
+            else None
+            for (role, content), injection in zip(turns, injections)
+        ]
+        return summarize_transcript([role for role, _ in turns], results, injections)
+
+    def _analyze(
+        self,
+        output_text: str,
+        mode: AnalysisMode,
+        deadline: float | None,
+        include_trace: bool = True,
+        injection: InjectionSignal | None = None,
+    ) -> ReverseResponse:
+        """Run the stages of ``mode``; ``injection`` is an already computed signal for the injection stage."""
+
+        logger.debug("Starting reverse analysis", extra={"text_length": len(output_text), "mode": mode.value})
+        text = output_text
+        extra_trace: list[str] = []
+        if mode is AnalysisMode.fast and len(output_text) > self.fast_sample_chars:
+            text = sample_windows(output_text, self.fast_sample_chars)
+            extra_trace.append(f"sampled_chars={len(text)}/{len(output_text)}")
+
+        signals: dict[str, Any] = {}
+        degraded = False
+        for stage in STAGES[mode]:
+            if stage in self.disabled_analyzers:
+                continue
+            # Structure always runs so there is a prompt to return.
+            if signals and deadline is not None and time.perf_counter() >= deadline:
+                degraded = True
+                extra_trace.append(f"deadline_exceeded_before={stage}")
+                break
+            if stage == "injection" and injection is not None:
+                signals[stage] = injection
+            else:
+                signals[stage] = self._stage_analyzers[stage].analyze(text)
+
+        scanned = signals.pop("injection", None)
+        injection_fields: dict[str, Any] = {}
+        if scanned is not None:
+            injection_fields = {
+                "suspected_injection": scanned.suspected_injection,
+                "injection_categories": list(scanned.matched_patterns),
+            }
+            if include_trace:
+                extra_trace.append(scanned.trace)
 
         merged = self.ensemble.merge(
-            structure=structure_signal,
-            constraints=constraint_signal,
-            tone=tone_signal,
-            fmt=format_signal,
-            reasoning=reasoning_signal,
+            structure=signals["structure"],
+            constraints=signals.get("constraint") or SKIPPED_CONSTRAINTS,
+            tone=signals.get("tone") or SKIPPED_TONE,
+            fmt=signals.get("format") or SKIPPED_FORMAT,
+            reasoning=signals.get("reasoning") or SKIPPED_REASONING,
+            include_trace=include_trace,
+            model=ReverseResponse,
+            degraded=degraded,
+            **injection_fields,
+        )
+        if include_trace:
+            merged.reasoning_trace.extend(extra_trace)
+        return merged
+
+    async def _model_assist(
+        self,
+        output_text: str,
+        response: ReverseResponse,
+        deadline: float | None,
+    ) -> ReverseResponse:
+        """Enrich a deep-mode result with an external model summary when configured and in budget."""
+
+        if not self.model_client.enabled or response.degraded:
+            return response
+        remaining = None if deadline is None else deadline - time.perf_counter()
+        if remaining is not None and remaining <= 0:
+            return response.model_copy(update={"degraded": True})
+        try:
+            summary = await asyncio.wait_for(self.model_client.summarize(output_text), timeout=remaining)
+        except asyncio.TimeoutError:
+            return response.model_copy(
+                update={"degraded": True, "reasoning_trace": [*response.reasoning_trace, "model_summary=timeout"]}
+            )
+        except Exception:  # model assistance is best-effort
+            logger.exception("Model-assisted analysis failed")
+            return response
+        return response.model_copy(
+            update={"reasoning_trace": [*response.reasoning_trace, f"model_summary={summary}"]}
+        )
+
+    @staticmethod
+    def _executor_from_settings() -> AdaptiveExecutor:
+        settings = get_settings()
+        return AdaptiveExecutor(
+            inline_budget_ms=settings.executor_inline_budget_ms,
+            thread_workers=settings.executor_thread_workers,
+            process_workers=settings.executor_process_workers,
+            process_min_cost_ms=settings.executor_process_min_cost_ms,
+        )
+
+    @staticmethod
+    def _near_duplicate_cache_from_settings() -> NearDuplicateCache | None:
+        settings = get_settings()
+        if not settings.near_duplicate_cache_enabled:
+            return None
+        return NearDuplicateCache(
+            max_entries=settings.near_duplicate_max_entries,
+            max_distance=settings.near_duplicate_max_distance,
+            verify_sample_rate=settings.near_duplicate_verify_rate,
         )
 
-        return ReverseResponse(**merged.model_dump())
+
+# One service per set of disabled analyzers, built lazily in each pool process.
+_process_services: dict[frozenset[str], ReverseEngineeringService] = {}
+
+
+def _analyze_in_process(
+    disabled: frozenset[str],
+    output_text: str,
+    mode: AnalysisMode,
+    deadline: float | None,
+    include_trace: bool,
+) -> ReverseResponse:
+    """Process-pool entry point; each worker process builds its own inline-only service once.
+
+    ``deadline`` is a ``time.perf_counter`` value, which is system-wide monotonic on Linux.
+    """
+
+    return _get_process_service(disabled)._analyze(output_text, mode, deadline, include_trace)
+
+
+def _analyze_batch_in_process(disabled: frozenset[str], items: list[AnalysisItem]) -> list[ReverseResponse | Exception]:
+    return _get_process_service(disabled)._analyze_batch(items)
+
+
+def _analyze_transcript_in_process(
+    disabled: frozenset[str],
+    turns: list[Turn],
+    mode: AnalysisMode,
+    deadline: float | None,
+    include_trace: bool,
+) -> TranscriptResponse:
+    return _get_process_service(disabled)._analyze_transcript(turns, mode, deadline, include_trace)
+
+
+def _get_process_service(disabled: frozenset[str]) -> ReverseEngineeringService:
+    service = _process_services.get(disabled)
+    if service is None:
+        service = _process_services[disabled] = ReverseEngineeringService(
+            executor=AdaptiveExecutor(thread_workers=0),
+            disabled_analyzers=disabled,
+            micro_batching=False,
+        )
+    return service
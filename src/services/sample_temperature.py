@@ -0,0 +1,195 @@
+"""Estimate sampling temperature from how much several outputs of one prompt vary."""
+
+from __future__ import annotations
+
+import math
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from src.models.schemas import TemperatureEstimate
+from src.services.near_duplicate_cache import fingerprint_from_lanes, hash_lanes
+
+MAX_ANALYZED = 500
+PAIR_SAMPLES = 2048
+NEAR_DUPLICATE_BITS = 3
+_HASH_MASK = (1 << 64) - 1
+_LOG2 = math.log(2)
+_TOKEN_RE = re.compile(r"\w+")
+
+
+@dataclass(slots=True)
+class SampleSetEstimate:
+    samples: int
+    samples_analyzed: int
+    distinct_samples: int
+    temperature_estimate: TemperatureEstimate
+    variability: float
+    mean_similarity: float
+    similarity_quantiles: dict[str, float]
+    near_duplicate_rate: float
+    lexical_diversity: float
+    consensus_divergence: float
+    pairs_compared: int
+
+
+class SampleTemperatureEstimator:
+    """Grade the variation across completions of one prompt as low, medium or high temperature.
+
+    Three measures, each 0 for identical outputs and near 1 for unrelated
+    ones, are averaged into ``variability``:
+
+    * dissimilarity: one minus the mean cosine similarity of the outputs'
+      word-shingle sets, estimated from the Hamming distance of 64-bit
+      SimHash sketches over at most ``pair_samples`` random pairs;
+    * lexical diversity: one minus the share of other outputs that contain
+      a shingle, averaged over every shingle of every output, which is read
+      off shingle document frequencies;
+    * consensus divergence: the mean Jensen–Shannon divergence, in units of
+      ``log 2``, between each output's word distribution and the average
+      distribution of all outputs.
+
+    Every step is linear in the total text length, apart from the sampled
+    pairs, whose number is fixed. All three are means over outputs or
+    pairs, so sets larger than ``max_analyzed`` are measured on a seeded
+    uniform sample of that many outputs, which bounds the cost of a call;
+    exact duplicates are still counted over the whole set.
+    """
+
+    def __init__(
+        self,
+        low_below: float = 0.2,
+        high_from: float = 0.5,
+        max_analyzed: int = MAX_ANALYZED,
+        pair_samples: int = PAIR_SAMPLES,
+        seed: int = 0,
+    ) -> None:
+        self.low_below = low_below
+        self.high_from = high_from
+        self.max_analyzed = max(2, max_analyzed)
+        self.pair_samples = pair_samples
+        self.seed = seed
+
+    def estimate(self, outputs: list[str]) -> SampleSetEstimate:
+        """Estimate temperature from two or more outputs believed to share a prompt."""
+
+        count = len(outputs)
+        if count < 2:
+            raise ValueError("at least two outputs are needed")
+        analyzed = outputs
+        if count > self.max_analyzed:
+            analyzed = random.Random(self.seed).sample(outputs, self.max_analyzed)
+
+        # Sketches are only compared within one call, so the per-process string hash will do.
+        lanes_by_feature: dict[tuple[str, ...], int] = {}  # outputs of one prompt share most shingles
+        document_frequency: Counter[tuple[str, ...]] = Counter()
+        word_counts = []
+        fingerprints = []
+        for text in analyzed:
+            words = _TOKEN_RE.findall(text.lower())
+            features = set(zip(words, words[1:], words[2:])) if len(words) > 3 else {tuple(words)}
+            lanes = 0
+            for feature in features:
+                spread = lanes_by_feature.get(feature)
+                if spread is None:
+                    spread = lanes_by_feature[feature] = hash_lanes(hash(feature) & _HASH_MASK)
+                lanes += spread
+            document_frequency.update(features)
+            word_counts.append(Counter(words))
+            fingerprints.append(fingerprint_from_lanes(lanes, len(features)))
+
+        similarities, near_duplicates = self._pair_similarities(fingerprints)
+        mean_similarity = sum(similarities) / len(similarities)
+        lexical_diversity = 1.0 - _mean_containment(document_frequency, len(analyzed))
+        consensus_divergence = _consensus_divergence(word_counts)
+        variability = (max(0.0, 1.0 - mean_similarity) + lexical_diversity + consensus_divergence) / 3
+        if variability < self.low_below:
+            temperature = TemperatureEstimate.low
+        elif variability >= self.high_from:
+            temperature = TemperatureEstimate.high
+        else:
+            temperature = TemperatureEstimate.medium
+
+        ranked = sorted(similarities)
+        return SampleSetEstimate(
+            samples=count,
+            samples_analyzed=len(analyzed),
+            distinct_samples=len(set(outputs)),
+            temperature_estimate=temperature,
+            variability=round(variability, 4),
+            mean_similarity=round(mean_similarity, 4),
+            similarity_quantiles={
+                f"p{int(q * 100)}": round(ranked[min(len(ranked) - 1, int(q * len(ranked)))], 4)
+                for q in (0.1, 0.5, 0.9)
+            },
+            near_duplicate_rate=round(near_duplicates / len(similarities), 4),
+            lexical_diversity=round(lexical_diversity, 4),
+            consensus_divergence=round(consensus_divergence, 4),
+            pairs_compared=len(similarities),
+        )
+
+    def _pair_similarities(self, fingerprints: list[int]) -> tuple[list[float], int]:
+        """Cosine estimates and the near-duplicate count over all pairs, or ``pair_samples`` random ones."""
+
+        count = len(fingerprints)
+        if count * (count - 1) // 2 <= self.pair_samples:
+            pairs = [(i, j) for i in range(count) for j in range(i + 1, count)]
+        else:
+            rng = random.Random(self.seed)
+            pairs = []
+            for _ in range(self.pair_samples):
+                i, j = rng.randrange(count), rng.randrange(count - 1)
+                pairs.append((i, j + (j >= i)))
+        distances = [(fingerprints[i] ^ fingerprints[j]).bit_count() for i, j in pairs]
+        near_duplicates = sum(distance <= NEAR_DUPLICATE_BITS for distance in distances)
+        # Each bit of a SimHash differs with probability angle / pi.
+        return [math.cos(math.pi * distance / 64) for distance in distances], near_duplicates
+
+
+def _mean_containment(document_frequency: Counter[tuple[str, ...]], outputs: int) -> float:
+    """Share of the other outputs holding a shingle, averaged over every shingle occurrence.
+
+    A shingle held by ``d`` outputs occurs ``d`` times and each occurrence
+    is shared with ``d - 1`` others, so one pass over distinct shingles does.
+    """
+
+    occurrences = sum(document_frequency.values())
+    if not occurrences:
+        return 1.0
+    shared = sum(frequency * (frequency - 1) for frequency in document_frequency.values())
+    return shared / (occurrences * (outputs - 1))
+
+
+def _consensus_divergence(word_counts: list[Counter[str]]) -> float:
+    """Mean Jensen–Shannon divergence of each output's word distribution from the average one.
+
+    Only words of the output itself are visited: every consensus word the
+    output lacks adds ``consensus / 2 * log 2``, so those terms reduce to one
+    minus the consensus mass on the output's words.
+    """
+
+    distributions = []
+    consensus: Counter[str] = Counter()
+    for words in word_counts:
+        total = sum(words.values())
+        if not total:
+            continue
+        distribution = {word: occurrences / total for word, occurrences in words.items()}
+        distributions.append(distribution)
+        consensus.update(distribution)
+    if not distributions:
+        return 0.0
+    scale = 1 / len(distributions)
+
+    divergence = 0.0
+    for distribution in distributions:
+        shared_mass = 0.0
+        total = 0.0
+        for word, p in distribution.items():
+            m = consensus[word] * scale
+            shared_mass += m
+            middle = (p + m) / 2
+            total += p * math.log(p / middle) + m * math.log(m / middle)
+        divergence += (total + (1.0 - shared_mass) * _LOG2) / 2
+    return min(1.0, divergence / len(distributions) / _LOG2)
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from typing import Any, TypeVar
+
 from src.analyzers.constraint_detector import ConstraintSignal
 from src.analyzers.format_detector import FormatSignal
 from src.analyzers.reasoning_depth_estimator import ReasoningSignal
@@ -9,6 +11,8 @@ from src.analyzers.structure_analyzer import StructureSignal
 from src.analyzers.tone_classifier import ToneSignal
 from src.models.schemas import AnalyzerSignals
 
+SignalsT = TypeVar("SignalsT", bound=AnalyzerSignals)
+
 
 class ScoringEnsemble:
     """Combine independent analyzer outputs into a cohesive prediction."""
@@ -20,20 +24,31 @@ class ScoringEnsemble:
         tone: ToneSignal,
         fmt: FormatSignal,
         reasoning: ReasoningSignal,
-    ) -> AnalyzerSignals:
-        """Merge analyzer outputs and compute confidence score."""
+        include_trace: bool = True,
+        model: type[SignalsT] = AnalyzerSignals,  # type: ignore[assignment]
+        **extra: Any,
+    ) -> SignalsT:
+        """Merge analyzer outputs and compute confidence score.
+
+        Trace strings are only formatted when ``include_trace`` is set. The
+        result is validated once, as ``model`` with any ``extra`` fields.
+        """
 
         confidence = self._confidence(constraints, fmt, reasoning)
-        trace = [
-            structure.trace,
-            constraints.trace,
-            tone.trace,
-            fmt.trace,
-            reasoning.trace,
-            f"confidence={confidence:.2f}",
-        ]
-
-        return AnalyzerSignals(
+        trace = (
+            [
+                structure.trace,
+                constraints.trace,
+                tone.trace,
+                fmt.trace,
+                reasoning.trace,
+                f"confidence={confidence:.2f}",
+            ]
+            if include_trace
+            else []
+        )
+
+        return model(
             inferred_prompt=structure.inferred_prompt,
             prompt_style=structure.prompt_style,
             task_type=structure.task_type,
@@ -41,6 +56,7 @@ class ScoringEnsemble:
             temperature_estimate=tone.temperature,
             reasoning_trace=trace,
             confidence_score=confidence,
+            **extra,
         )
 
     @staticmethod
@@ -50,7 +66,7 @@ class ScoringEnsemble:
         reasoning: ReasoningSignal,
     ) -> float:
         base = 0.45
-        base += 0.12 if constraints.constraints and constraints.constraints[0] != "none-explicit" else -0.05
+        base += 0.12 if constraints.constraints[0] != "none-explicit" else -0.05
         base += 0.1 if "plain_text" not in fmt.format_markers else 0.02
         base += min(reasoning.depth_score * 0.35, 0.25)
         return round(max(0.05, min(base, 0.99)), 2)
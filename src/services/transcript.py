@@ -0,0 +1,80 @@
+"""Conversation-level summary of a per-turn transcript analysis."""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Hashable, Iterable, TypeVar
+
+from src.analyzers.constraint_detector import NONE_EXPLICIT
+from src.analyzers.prompt_injection_detector import InjectionSignal
+from src.models.schemas import (
+    ConstraintDrift,
+    ConversationSummary,
+    ReverseResponse,
+    TranscriptResponse,
+    TranscriptTurnResult,
+    TurnRole,
+)
+
+H = TypeVar("H", bound=Hashable)
+
+
+def summarize_transcript(
+    roles: list[TurnRole],
+    results: list[ReverseResponse | None],
+    injections: list[InjectionSignal | None],
+) -> TranscriptResponse:
+    """Combine per-turn signals into the transcript response.
+
+    Style, task and temperature are the most common values over assistant
+    turns, ties going to the earliest. A style change or constraint drift
+    is reported at the assistant turn where it differs from the previous
+    assistant turn.
+    """
+
+    turns = [
+        TranscriptTurnResult(
+            index=index,
+            role=role,
+            suspected_injection=bool(injection and injection.suspected_injection),
+            injection_patterns=list(injection.matched_patterns) if injection else [],
+            result=result,
+        )
+        for index, (role, result, injection) in enumerate(zip(roles, results, injections))
+    ]
+    analyzed = [(index, result) for index, result in enumerate(results) if result is not None]
+
+    style_changes = []
+    constraint_drift = []
+    persistent: set[str] | None = None
+    previous: ReverseResponse | None = None
+    for index, result in analyzed:
+        constraints = set(result.constraints_detected) - set(NONE_EXPLICIT)
+        persistent = constraints if persistent is None else persistent & constraints
+        if previous is not None:
+            if result.prompt_style != previous.prompt_style:
+                style_changes.append(index)
+            before = set(previous.constraints_detected) - set(NONE_EXPLICIT)
+            if constraints != before:
+                added, removed = sorted(constraints - before), sorted(before - constraints)
+                constraint_drift.append(ConstraintDrift(turn=index, added=added, removed=removed))
+        previous = result
+
+    responses = [result for _, result in analyzed]
+    summary = ConversationSummary(
+        assistant_turns=len(responses),
+        prompt_style=_most_common(result.prompt_style for result in responses),
+        style_stable=not style_changes,
+        style_changes=style_changes,
+        task_type=_most_common(result.task_type for result in responses),
+        temperature_estimate=_most_common(result.temperature_estimate for result in responses),
+        persistent_constraints=sorted(persistent or ()),
+        constraint_drift=constraint_drift,
+        injection_turns=[turn.index for turn in turns if turn.suspected_injection],
+        mean_confidence=round(sum(result.confidence_score for result in responses) / len(responses), 2),
+    )
+    return TranscriptResponse(turns=turns, summary=summary)
+
+
+def _most_common(values: Iterable[H]) -> H:
+    return Counter(values).most_common(1)[0][0]
@@ -0,0 +1,157 @@
+"""Metrics shared between the worker processes started by ``src.serve``."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from src.services.analytics import TDigest
+from src.services.executor import lag_stats
+from src.services.metrics import MetricsRegistry
+
+
+class WorkerMetricsChannel:
+    """Publish this worker's metrics to a shared directory and aggregate every worker's.
+
+    Each worker atomically rewrites ``<pid>.json`` every ``interval_seconds``
+    and whenever ``/metrics`` is served. The launcher points the directory at
+    tmpfs (``/dev/shm``) when it exists, so the channel is shared memory in
+    practice. Files not refreshed for ``stale_seconds`` belong to workers
+    that died and are ignored; the launcher also removes them on restart.
+
+    ``shared`` names per-key state other workers read back with
+    ``collect_shared``: at each publish every callable returns the keys that
+    changed, written to ``<pid>/<name>/<key digest>.json``. Sections listed
+    in ``shared_ttl_seconds`` expire: entries older than that are neither
+    read back nor kept.
+    """
+
+    def __init__(
+        self,
+        directory: Path | str,
+        snapshot: Callable[[], dict[str, Any]],
+        interval_seconds: float = 1.0,
+        stale_seconds: float = 10.0,
+        shared: dict[str, Callable[[], dict[str, Any]]] | None = None,
+        shared_ttl_seconds: dict[str, float] | None = None,
+    ) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot = snapshot
+        self.shared = shared or {}
+        self.shared_ttl_seconds = shared_ttl_seconds or {}
+        self.interval_seconds = interval_seconds
+        self.stale_seconds = stale_seconds
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.remove(os.getpid())
+
+    async def _run(self) -> None:
+        while True:
+            self.publish()
+            await asyncio.sleep(self.interval_seconds)
+
+    def publish(self) -> None:
+        pid = os.getpid()
+        path = self.directory / f"{pid}.json"
+        for name, changed in self.shared.items():
+            section = self.directory / str(pid) / name
+            section.mkdir(parents=True, exist_ok=True)
+            if name in self.shared_ttl_seconds:
+                self._expire(section, time.time() - self.shared_ttl_seconds[name])
+            for key, payload in changed().items():
+                staging = section / f".{_key_file(key)}.tmp"
+                staging.write_text(json.dumps(payload))
+                os.replace(staging, section / f"{_key_file(key)}.json")
+        staging = self.directory / f".{pid}.json.tmp"
+        staging.write_text(json.dumps({"pid": pid, "updated_at": time.time(), **self.snapshot()}))
+        os.replace(staging, path)
+
+    def remove(self, pid: int) -> None:
+        (self.directory / f"{pid}.json").unlink(missing_ok=True)
+        shutil.rmtree(self.directory / str(pid), ignore_errors=True)
+
+    def collect_shared(self, name: str, key: str) -> list[Any]:
+        """Return what every other live worker last published for ``key`` under ``name``."""
+
+        now = time.time()
+        expired = now - self.shared_ttl_seconds[name] if name in self.shared_ttl_seconds else 0.0
+        payloads = []
+        for path in self.directory.glob("*.json"):
+            if path.stem == str(os.getpid()):
+                continue
+            try:
+                if path.stat().st_mtime < now - self.stale_seconds:
+                    continue
+                shared = self.directory / path.stem / name / f"{_key_file(key)}.json"
+                if shared.stat().st_mtime >= expired:
+                    payloads.append(json.loads(shared.read_text()))
+            except (OSError, ValueError):
+                continue  # nothing published for the key, or the worker went away while listing
+        return payloads
+
+    @staticmethod
+    def _expire(section: Path, cutoff: float) -> None:
+        for path in section.glob("*.json"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                continue
+
+    def collect(self) -> list[dict[str, Any]]:
+        """Return the latest snapshot of every live worker."""
+
+        cutoff = time.time() - self.stale_seconds
+        snapshots = []
+        for path in self.directory.glob("*.json"):
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+            if snapshot["updated_at"] >= cutoff:
+                snapshots.append(snapshot)
+        return sorted(snapshots, key=lambda snapshot: snapshot["pid"])
+
+    def aggregate(self) -> dict[str, Any]:
+        """Merge counters and histograms across workers; other sections are listed per worker."""
+
+        snapshots = self.collect()
+        lag_ms = TDigest()
+        runs: dict[str, float] = {}
+        for snapshot in snapshots:
+            lag_ms.merge(TDigest.from_dict(snapshot["event_loop_lag"]))
+            for key, value in snapshot["stats"]["executor"].items():
+                if key.startswith("runs_"):
+                    runs[key] = runs.get(key, 0.0) + value
+        return {
+            "workers": len(snapshots),
+            "endpoints": MetricsRegistry.merged(snapshot["endpoints"] for snapshot in snapshots).snapshot(),
+            "event_loop_lag": lag_stats(lag_ms),
+            "executor": runs,
+            "per_worker": {str(snapshot["pid"]): snapshot["stats"] for snapshot in snapshots},
+        }
+
+
+def _key_file(key: str) -> str:
+    """File name for a shared key; keys are caller-supplied, so never use them as paths."""
+
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
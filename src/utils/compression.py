@@ -0,0 +1,134 @@
+"""Streaming gzip and zstd codecs for HTTP request and response bodies."""
+
+from __future__ import annotations
+
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+# A zstd RLE block turns 4 input bytes into up to 128 KiB of output.
+ZSTD_MAX_RATIO = 32_768
+
+_DECODE_ERRORS: tuple[type[Exception], ...] = (zlib.error,) if zstandard is None else (zlib.error, zstandard.ZstdError)
+
+
+def supported_encodings() -> tuple[str, ...]:
+    """Content codings this process can decode and encode, most preferred first."""
+
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Pick the preferred supported coding allowed by an ``Accept-Encoding`` header, if any."""
+
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    best = max(supported_encodings(), key=lambda encoding: weights.get(encoding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+
+class BodyTooLarge(ValueError):
+    """Raised when a compressed body inflates past its size limit."""
+
+
+class MalformedBody(ValueError):
+    """Raised when a body is not valid data in its declared content coding."""
+
+
+class Inflater:
+    """Incrementally decode a gzip or zstd body without ever producing more than ``max_bytes``.
+
+    gzip output is capped per call with zlib's ``max_length``. zstd has no
+    output cap, so input is fed in slices small enough that even the
+    worst-case expansion of a slice stays within the remaining budget.
+    Compressed bytes count against the limit too, so padding that inflates
+    to nothing cannot be streamed forever.
+    """
+
+    def __init__(self, encoding: str, max_bytes: int) -> None:
+        if encoding not in supported_encodings():
+            raise ValueError(f"unsupported content encoding: {encoding}")
+        self.encoding = encoding
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.produced = 0
+        self._gzip = zlib.decompressobj(wbits=31) if encoding == "gzip" else None
+        self._zstd = (
+            zstandard.ZstdDecompressor().decompressobj(read_across_frames=True) if encoding == "zstd" else None
+        )
+
+    def feed(self, data: bytes) -> bytes:
+        self.received += len(data)
+        if self.received > self.max_bytes:
+            raise BodyTooLarge(f"body exceeds {self.max_bytes} bytes")
+        try:
+            return self._feed_gzip(data) if self._gzip is not None else self._feed_zstd(data)
+        except _DECODE_ERRORS as exc:
+            raise MalformedBody(str(exc)) from exc
+
+    def _feed_gzip(self, data: bytes) -> bytes:
+        parts = []
+        while data:
+            decoder = self._gzip
+            parts.append(self._count(decoder.decompress(data, self.max_bytes - self.produced + 1)))
+            if decoder.eof:  # concatenated gzip members are one body
+                data = decoder.unused_data
+                self._gzip = zlib.decompressobj(wbits=31)
+            else:
+                data = decoder.unconsumed_tail
+        return b"".join(parts)
+
+    def _feed_zstd(self, data: bytes) -> bytes:
+        parts = []
+        view = memoryview(data)
+        while view:
+            step = max(1, (self.max_bytes - self.produced) // ZSTD_MAX_RATIO)
+            parts.append(self._count(self._zstd.decompress(view[:step].tobytes())))
+            view = view[step:]
+        return b"".join(parts)
+
+    def _count(self, chunk: bytes) -> bytes:
+        self.produced += len(chunk)
+        if self.produced > self.max_bytes:
+            raise BodyTooLarge(f"body inflates past {self.max_bytes} bytes")
+        return chunk
+
+
+class Deflater:
+    """Incrementally encode a response body; every ``compress`` call returns decodable output."""
+
+    def __init__(self, encoding: str, gzip_level: int = 6, zstd_level: int = 3) -> None:
+        if encoding not in supported_encodings():
+            raise ValueError(f"unsupported content encoding: {encoding}")
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        else:
+            self._zstd = zstandard.ZstdCompressor(level=zstd_level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress ``data`` and flush it so a streaming client can decode it right away."""
+
+        if self.encoding == "gzip":
+            return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH)
+        return self._zstd.compress(data) + self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "gzip":
+            return self._gzip.compress(data) + self._gzip.flush()
+        return self._zstd.compress(data) + self._zstd.flush()